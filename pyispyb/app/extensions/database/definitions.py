@@ -1,13 +1,17 @@
+from dataclasses import dataclass, field
 import logging
 from typing import Optional, Any
 
 import sqlalchemy
 from sqlalchemy.orm import joinedload
+from sqlalchemy.sql import util as sql_util
 from ispyb import models
 from pyispyb.app.extensions.options.schema import Options
 
 from pyispyb.app.globals import g
 from pyispyb.app.extensions.database.middleware import db
+from pyispyb.app.utils.cache import TTLCache
+from pyispyb.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +56,98 @@ def get_options() -> Options:
     return app.db_options
 
 
+@dataclass
+class AuthorizationContext:
+    """The resolved authorization state of the current person
+
+    Resolved once per request and shared by every `with_authorization` call
+    """
+
+    personId: int
+    permissions: list[str]
+    # (beamLineName, archived) for each beamline the person has group access to
+    beamLines: list[tuple[str, bool]] = field(default_factory=list)
+    permissions_applied: list[str] = field(default_factory=list)
+    # (sessionIds, proposalIds), only resolved when first needed
+    memberships: Optional[tuple[list[int], list[int]]] = None
+
+    @property
+    def sessionIds(self) -> list[int]:
+        return self._get_memberships()[0]
+
+    @property
+    def proposalIds(self) -> list[int]:
+        return self._get_memberships()[1]
+
+    def _get_memberships(self) -> tuple[list[int], list[int]]:
+        if self.memberships is None:
+            self.memberships = _memberships.get_or_set(
+                self.personId, lambda: _get_memberships(self.personId)
+            )
+        return self.memberships
+
+    def get_beamlines(self, includeArchived: bool = False) -> list[str]:
+        return [
+            beamLineName
+            for beamLineName, archived in self.beamLines
+            if (archived and includeArchived) or not includeArchived
+        ]
+
+
+# Session and proposal memberships keyed by personId, shared between requests
+_memberships: TTLCache[tuple[list[int], list[int]]] = TTLCache(
+    ttl=settings.authorization_cache_ttl
+)
+
+
+def _get_memberships(personId: int) -> tuple[list[int], list[int]]:
+    """Get the sessionIds and proposalIds a person is directly registered on"""
+    sessions = db.session.query(models.SessionHasPerson.sessionId).filter(
+        models.SessionHasPerson.personId == personId
+    )
+    sessionIds = [r._asdict()["sessionId"] for r in sessions.all()]
+
+    proposals = db.session.query(models.ProposalHasPerson.proposalId).filter(
+        models.ProposalHasPerson.personId == personId
+    )
+    proposalIds = [r._asdict()["proposalId"] for r in proposals.all()]
+
+    return sessionIds, proposalIds
+
+
+def invalidate_authorization_cache(personId: Optional[int] = None) -> None:
+    """Invalidate cached memberships for a person, or everyone if no personId is given"""
+    _memberships.invalidate(personId)
+
+
+def get_authorization_context() -> AuthorizationContext:
+    """Get the authorization context for the current request
+
+    The beamline groups and memberships are only resolved on first use in a request,
+    memberships are additionally cached across requests if `authorization_cache_ttl` is set
+    """
+    context: Optional[AuthorizationContext] = g.authorization
+    if (
+        context is not None
+        and context.personId == g.personId
+        and context.permissions == g.permissions
+    ):
+        return context
+
+    context = AuthorizationContext(personId=g.personId, permissions=g.permissions)
+
+    # Iterate through users permissions and match them to the relevant groups
+    db_options = get_options()
+    for group in db_options.beamLineGroups:
+        if group.permission in g.permissions:
+            context.permissions_applied.append(group.permission)
+            for beamLine in group.beamLines:
+                context.beamLines.append((beamLine.beamLineName, beamLine.archived))
+
+    g.authorization = context
+    return context
+
+
 def with_authorization(
     query: "sqlalchemy.orm.Query[Any]",
     includeArchived: bool = False,
@@ -67,6 +163,10 @@ def with_authorization(
         * falls back to SessionHasPerson allowing access to entities related to where the
             user is registered on a session
 
+    With `authorization_mode` `materialized` the person's sessionIds and proposalIds are
+    inlined as `IN (...)` lists, with `subquery` they are checked with correlated
+    `EXISTS` subqueries against SessionHasPerson and ProposalHasPerson
+
     Kwargs:
         includeArchived: whether to exclude archived beamlines
         proposalColumn: the column used to join to `models.Proposal`, will force a join with `models.Proposal`
@@ -78,16 +178,7 @@ def with_authorization(
         logger.info("user has `all_proposals`")
         return query
 
-    # Iterate through users permissions and match them to the relevant groups
-    beamLines = []
-    permissions_applied = []
-    db_options = get_options()
-    for group in db_options.beamLineGroups:
-        if group.permission in g.permissions:
-            permissions_applied.append(group.permission)
-            for beamLine in group.beamLines:
-                if (beamLine.archived and includeArchived) or not includeArchived:
-                    beamLines.append(beamLine.beamLineName)
+    context = get_authorization_context()
 
     if proposalColumn:
         query = query.join(
@@ -100,31 +191,78 @@ def with_authorization(
         )
 
     conditions = []
+    beamLines = context.get_beamlines(includeArchived)
     if beamLines:
         logger.info(
-            f"filtered to beamlines `{beamLines}` with permissions `{permissions_applied}`"
+            f"filtered to beamlines `{beamLines}` with permissions `{context.permissions_applied}`"
         )
 
         conditions.append(models.BLSession.beamLineName.in_(beamLines))
 
-    # Sessions
-    sessions = db.session.query(models.SessionHasPerson.sessionId).filter(
-        models.SessionHasPerson.personId == g.personId
-    )
-    sessions = [r._asdict()["sessionId"] for r in sessions.all()]
-    conditions.append(models.BLSession.sessionId.in_(sessions if sessions else []))
+    if settings.authorization_mode == "subquery":
+        conditions.extend(_membership_subqueries(query, context.personId))
+    else:
+        # Sessions
+        conditions.append(
+            models.BLSession.sessionId.in_(
+                context.sessionIds if context.sessionIds else []
+            )
+        )
 
-    # Proposals
-    proposals = db.session.query(models.ProposalHasPerson.proposalId).filter(
-        models.ProposalHasPerson.personId == g.personId
-    )
-    proposals = [r._asdict()["proposalId"] for r in proposals.all()]
-    conditions.append(models.Proposal.proposalId.in_(proposals if proposals else []))
+        # Proposals
+        conditions.append(
+            models.Proposal.proposalId.in_(
+                context.proposalIds if context.proposalIds else []
+            )
+        )
 
     query = query.filter(sqlalchemy.or_(*conditions))
     return query
 
 
+def _membership_subqueries(
+    query: "sqlalchemy.orm.Query[Any]", personId: int
+) -> list["sqlalchemy.sql.Exists"]:
+    """Correlated `EXISTS` conditions for SessionHasPerson and ProposalHasPerson
+
+    The subqueries are explicitly correlated to `BLSession` and `Proposal` in the outer
+    query. If either were missing they would be added to the subquery's own `FROM`
+    making the condition true for every row, so this is an error
+    """
+    statement = query.statement
+    tables = {
+        table
+        for from_ in statement.get_final_froms()
+        for table in sql_util.surface_selectables_only(from_)
+    }
+    missing = [
+        model.__table__.name
+        for model in [models.BLSession, models.Proposal]
+        if model.__table__ not in tables
+    ]
+    if missing:
+        raise RuntimeError(
+            f"Authorization requires {', '.join(missing)} to be joined in the query"
+        )
+
+    return [
+        # Sessions
+        sqlalchemy.exists()
+        .where(
+            models.SessionHasPerson.sessionId == models.BLSession.sessionId,
+            models.SessionHasPerson.personId == personId,
+        )
+        .correlate(models.BLSession),
+        # Proposals
+        sqlalchemy.exists()
+        .where(
+            models.ProposalHasPerson.proposalId == models.Proposal.proposalId,
+            models.ProposalHasPerson.personId == personId,
+        )
+        .correlate(models.Proposal),
+    ]
+
+
 def groups_from_beamlines(beamLines: list[str]) -> list[list]:
     """Get uiGroups from a list of beamlines"""
     db_options = get_options()
@@ -2,10 +2,57 @@
 
 import contextlib
 import contextvars
+from typing import Any, AsyncGenerator, Callable, Generator, Generic, Optional, TypeVar
+
+from pydantic import BaseModel
 import sqlalchemy.orm
-from .session import _session as sqlsession
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ...utils import metrics
+from .session import (
+    _session as sqlsession,
+    _async_session as sqlasyncsession,
+    pool_status,
+)
 
 _session = contextvars.ContextVar("_session", default=None)
+_async_session = contextvars.ContextVar("_async_session", default=None)
+
+T = TypeVar("T")
+S = TypeVar("S")
+
+_stats = {"requests": 0, "sessions": 0}
+
+
+class LazySession(Generic[S]):
+    """Holds the session for a request, it is only created when first accessed"""
+
+    def __init__(self, factory: Callable[[], S]) -> None:
+        self.factory = factory
+        self.session: Optional[S] = None
+
+    def get(self) -> S:
+        if self.session is None:
+            self.session = self.factory()
+        return self.session
+
+
+def _create_async_session() -> AsyncSession:
+    if sqlasyncsession is None:
+        raise Exception(
+            "No async database configured. " "Please, set SQLALCHEMY_ASYNC_DATABASE_URI"
+        )
+    return sqlasyncsession()
+
+
+def _create_session() -> sqlalchemy.orm.Session:
+    _stats["sessions"] += 1
+    return sqlsession()
+
+
+metrics.register("database", lambda: {**_stats, "pool": pool_status()})
 
 
 class Database:
@@ -16,12 +63,63 @@ class Database:
     @property
     def session(cls) -> sqlalchemy.orm.Session:
         try:
-            if _session.get() is None:
+            session = _session.get()
+            if session is None:
                 raise AttributeError
-            return _session.get()
+            if isinstance(session, LazySession):
+                return session.get()
+            return session
         except (AttributeError, LookupError):
             raise Exception("Cant get session." "Please, call Database.set_session()")
 
+    @property
+    def async_session(cls) -> AsyncSession:
+        holder: Optional[LazySession[AsyncSession]] = _async_session.get()
+        if holder is None:
+            raise Exception("Cant get async session." "Please, use get_async_session()")
+        return holder.get()
+
+    @property
+    def has_async(cls) -> bool:
+        return sqlasyncsession is not None
+
+    async def run_sync(
+        self,
+        fn: Callable[..., T],
+        *args,
+        response_model: Optional[type[BaseModel]] = None,
+        **kwargs,
+    ) -> T:
+        """Run synchronous database code from an async route
+
+        If an async database is configured `fn` runs on the request's `AsyncSession` via
+        `AsyncSession.run_sync` so the event loop is not blocked on database I/O, `db.session`
+        refers to its synchronous facade while `fn` runs. Otherwise `fn` runs in the threadpool
+        as a synchronous route would.
+
+        Kwargs:
+            response_model: validate the result against this model before returning so any
+                lazy loaded relationships are loaded while the database is still accessible
+        """
+
+        def run(*args, **kwargs) -> T:
+            result = fn(*args, **kwargs)
+            if response_model is not None:
+                result = response_model.validate(result)
+            return result
+
+        if not self.has_async:
+            return await run_in_threadpool(run, *args, **kwargs)
+
+        def run_with_session(session: sqlalchemy.orm.Session) -> T:
+            token = _session.set(session)
+            try:
+                return run(*args, **kwargs)
+            finally:
+                _session.reset(token)
+
+        return await self.async_session.run_sync(run_with_session)
+
 
 db = Database()
 
@@ -42,3 +140,75 @@ def get_session() -> sqlalchemy.orm.Session:
         # print("DB Finally")
         Database.set_session(None)
         db_session.close()
+
+
+@contextlib.contextmanager
+def get_lazy_session() -> Generator[LazySession[sqlalchemy.orm.Session], Any, None]:
+    """Provide a session that is only created (and a connection checked out of the pool)
+    when `db.session` is first accessed, committed on exit if it was used"""
+    _stats["requests"] += 1
+    holder = LazySession(_create_session)
+    token = _session.set(holder)
+    try:
+        yield holder
+        if holder.session is not None:
+            holder.session.commit()
+    except Exception:  # noqa
+        if holder.session is not None:
+            holder.session.rollback()
+        raise
+    finally:
+        if holder.session is not None:
+            holder.session.close()
+        _session.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def get_async_session() -> AsyncGenerator[LazySession[AsyncSession], Any]:
+    """Provide a lazily created `AsyncSession`, committed on exit if it was used"""
+    holder = LazySession(_create_async_session)
+    token = _async_session.set(holder)
+    try:
+        yield holder
+        if holder.session is not None:
+            await holder.session.commit()
+    except Exception:  # noqa
+        if holder.session is not None:
+            await holder.session.rollback()
+        raise
+    finally:
+        if holder.session is not None:
+            await holder.session.close()
+        _async_session.reset(token)
+
+
+class DatabaseMiddleware:
+    """Provide lazily created database sessions for each request
+
+    Sessions that were used are committed before the response is started so that
+    commit errors are still returned to the client, or rolled back if the request fails.
+
+    This is a plain ASGI middleware rather than an `@app.middleware("http")` so that
+    responses are passed through as is, rather than being re-streamed.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with get_lazy_session() as session:
+            async with get_async_session() as async_session:
+
+                async def send_committed(message: Message) -> None:
+                    if message["type"] == "http.response.start":
+                        if session.session is not None:
+                            session.session.commit()
+                        if async_session.session is not None:
+                            await async_session.session.commit()
+                    await send(message)
+
+                await self.app(scope, receive, send_committed)
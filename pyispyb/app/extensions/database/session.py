@@ -2,8 +2,10 @@ import contextlib
 from typing import Generator, Any
 import os
 import sqlalchemy
+import sqlalchemy.event
 import sqlalchemy.orm
 import sqlalchemy.schema
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
 from pyispyb.config import settings
 
@@ -25,6 +27,65 @@ engine = sqlalchemy.create_engine(
 
 _session = sqlalchemy.orm.sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Pool checkout counters, see `pool_status`
+_pool_stats = {"connects": 0, "checkouts": 0, "checkins": 0, "peak_checked_out": 0}
+
+
+@sqlalchemy.event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record) -> None:
+    _pool_stats["connects"] += 1
+
+
+@sqlalchemy.event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    _pool_stats["checkouts"] += 1
+    _pool_stats["peak_checked_out"] = max(
+        _pool_stats["peak_checked_out"], engine.pool.checkedout()
+    )
+
+
+@sqlalchemy.event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record) -> None:
+    _pool_stats["checkins"] += 1
+
+
+def pool_status() -> dict[str, Any]:
+    """Current state of the connection pool and checkout counters since startup"""
+    pool = engine.pool
+    status = {**_pool_stats}
+    for attr in ["size", "checkedin", "checkedout", "overflow"]:
+        if hasattr(pool, attr):
+            status[attr] = getattr(pool, attr)()
+    status["max_overflow"] = getattr(pool, "_max_overflow", None)
+    return status
+
+
+# Optional asyncio engine, requires an async driver i.e. `mysql+asyncmy://`
+async_engine = (
+    create_async_engine(
+        url=settings.sqlalchemy_async_database_uri,
+        isolation_level="READ UNCOMMITTED",
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_size=os.environ.get("ISPYB_DATABASE_POOL", 10),
+        max_overflow=os.environ.get("ISPYB_DATABASE_OVERFLOW", 20),
+    )
+    if settings.sqlalchemy_async_database_uri
+    else None
+)
+
+_async_session = (
+    sqlalchemy.orm.sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=async_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    if async_engine
+    else None
+)
+
 # Base.metadata.create_all(bind=engine)  # type: ignore
 
 
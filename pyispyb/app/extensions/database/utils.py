@@ -1,20 +1,80 @@
+import base64
+from datetime import datetime
 import enum
+import hashlib
+import json
 import os
 import time
 import logging
 from typing import Optional, Generic, TypeVar, Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, root_validator
 import sqlalchemy.engine
 import sqlalchemy.engine.interfaces
 import sqlalchemy.event
 import sqlalchemy.orm
 import sqlparse
 
+from ...globals import g
+from ...utils.cache import TTLCache
+from ....config import settings
+
 
 logger = logging.getLogger("db")
 
 
+class TotalMode(str, enum.Enum):
+    """How the total of a paged result set is counted"""
+
+    # Count the total on every request
+    exact = "exact"
+    # Reuse a recently counted total for the same query
+    estimate = "estimate"
+    # Do not count the total, only whether there are more results
+    none = "none"
+
+
+# Recently counted totals keyed by query, used for `TotalMode.estimate`
+_totals: TTLCache[int] = TTLCache(ttl=settings.estimated_total_ttl, max_entries=4096)
+
+
+def _query_key(query: "sqlalchemy.orm.Query[Any]") -> str:
+    """A key identifying a query and its parameters
+
+    Datetime parameters are truncated to the minute so queries relative to `now()` can be reused
+    """
+    compiled = query.statement.compile()
+    params = [
+        (
+            key,
+            value.replace(second=0, microsecond=0)
+            if isinstance(value, datetime)
+            else value,
+        )
+        for key, value in sorted(compiled.params.items())
+    ]
+    return hashlib.sha1(f"{compiled}{params}".encode()).hexdigest()
+
+
+def count_total(query: "sqlalchemy.orm.Query[Any]") -> Optional[int]:
+    """Count the total number of results of a query
+
+    Depending on the `TotalMode` requested for the current request the count is
+    either exact, reused from a recent count of the same query, or skipped
+
+    Returns
+        total (int): The total, or None if not counted
+    """
+    total_mode = g.total_mode or TotalMode.exact
+    if total_mode == TotalMode.none:
+        return None
+
+    if total_mode == TotalMode.estimate:
+        return _totals.get_or_set(_query_key(query), query.count)
+
+    return query.count()
+
+
 def order(
     query: "sqlalchemy.orm.Query[Any]",
     sort_map: dict[str, "sqlalchemy.Column[Any]"],
@@ -62,6 +122,9 @@ def page(
 ) -> "sqlalchemy.orm.Query[Any]":
     """Paginate a `Query`
 
+    If the total is not counted exactly one extra row is fetched so `Paged` can tell
+    whether there are more results
+
     Kwargs:
         skip (str): Offset to start at
         limit(str): Number of items to display
@@ -69,19 +132,96 @@ def page(
     Returns
         query (sqlalchemy.orm.Query): The paginated query
     """
+    if g.total_mode not in (None, TotalMode.exact):
+        limit += 1
+
     return query.limit(limit).offset(skip)
 
 
+def has_more(count: int, *, skip: int, limit: int, total: Optional[int]) -> bool:
+    """Whether there are more results after a page of `count` rows fetched by `page`
+
+    Unless the total is counted exactly `page` fetches one extra row, which is used
+    rather than a possibly stale estimated total
+    """
+    if total is None or g.total_mode not in (None, TotalMode.exact):
+        return count > limit
+    return skip + count < total
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor
+
+    Args:
+        values (list): The sort key values, datetimes are encoded as iso format
+
+    Returns
+        cursor (str): The url safe cursor
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps(
+            values,
+            default=lambda value: value.isoformat()
+            if isinstance(value, datetime)
+            else str(value),
+        ).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    """Decode a cursor created by `encode_cursor`
+
+    Raises
+        ValueError: If the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor `{cursor}`") from e
+
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor `{cursor}`")
+
+    return values
+
+
 T = TypeVar("T")
 
 
 class Paged(BaseModel, Generic[T]):
     """Page a model result set"""
 
-    total: int
+    total: Optional[int]
     results: list[T]
     skip: Optional[int]
     limit: Optional[int]
+    nextCursor: Optional[str]
+    hasMore: Optional[bool]
+
+    @root_validator(skip_on_failure=True)
+    def has_more(cls, values: dict[str, Any]) -> dict[str, Any]:
+        """Trim any extra row fetched by `page` and determine if there are more results
+
+        Results passed with an explicit `hasMore` are returned as is, the caller
+        having already consumed any extra row.
+        """
+        if values.get("hasMore") is not None:
+            return values
+
+        results = values["results"]
+        limit = values.get("limit")
+        if limit is not None and len(results) > limit:
+            values["results"] = results[:limit]
+            values["hasMore"] = True
+        else:
+            values["hasMore"] = limit is not None and has_more(
+                len(results),
+                skip=values.get("skip") or 0,
+                limit=limit,
+                total=values.get("total"),
+            )
+
+        return values
 
     @property
     def first(self) -> T:
@@ -8,7 +8,7 @@ from fastapi.openapi.utils import get_openapi
 
 from ..app.extensions.auth.onetime import expire_ontime_tokens_periodically
 from ..app.extensions.database.utils import enable_debug_logging
-from ..app.extensions.database.middleware import get_session
+from ..app.extensions.database.middleware import DatabaseMiddleware
 from ..app.extensions.options.base import setup_options
 from ..app.globals import GlobalsMiddleware
 
@@ -23,12 +23,7 @@ logger = logging.getLogger("ispyb")
 
 app = FastAPI(openapi_url=f"{settings.api_root}/openapi.json")
 app.add_middleware(GlobalsMiddleware)
-
-
-@app.middleware("http")
-async def get_session_as_middleware(request, call_next):
-    with get_session():
-        return await call_next(request)
+app.add_middleware(DatabaseMiddleware)
 
 
 setup_options(app)
@@ -46,6 +41,14 @@ def enable_cors() -> None:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[
+            "X-Image-Width",
+            "X-Image-Height",
+            "X-Image-DType",
+            "X-Image-Byte-Order",
+            "X-Data-Encoding",
+            "X-Sprite-Layout",
+        ],
     )
 
 
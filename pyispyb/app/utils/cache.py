@@ -0,0 +1,290 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """A thread safe key -> value cache where entries expire after `ttl` seconds
+
+    Kwargs:
+        ttl (int): Time to live in seconds, a value <= 0 disables the cache
+        max_entries (int): Maximum number of entries before the oldest are evicted
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: V) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], V]) -> V:
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Remove `key` from the cache, or everything if no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class LRUCache(Generic[V]):
+    """A thread safe key -> value cache bounded by the total size of its values
+
+    The least recently used entries are evicted once `max_bytes` is exceeded
+
+    Kwargs:
+        max_bytes (int): Maximum total size of the cached values, a value <= 0 disables the cache
+        sizeof (callable): Returns the size in bytes of a value
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[V], int]) -> None:
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[int, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def peek(self, key: Hashable) -> Optional[V]:
+        """Get a value without counting a hit or miss or marking it as recently used"""
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def set(self, key: Hashable, value: V) -> None:
+        if not self.enabled:
+            return
+
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[0]
+
+            self._entries[key] = (size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], V]) -> V:
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Remove `key` from the cache, or everything if no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.bytes = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self.bytes -= entry[0]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ArrayDiskCache:
+    """A key -> (metadata, array) cache stored in a directory shared between processes
+
+    Arrays are saved as `.npy` and memory mapped (read only) when read back, their
+    metadata must be json serialisable. When the directory is on a tmpfs (i.e. `/dev/shm`)
+    this behaves as a shared memory cache between workers. The least recently used
+    entries are removed once `max_bytes` is exceeded.
+
+    Kwargs:
+        directory (str): Directory to store entries in, created if it does not exist
+        max_bytes (int): Maximum total size of the stored arrays
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: Hashable) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()  # nosec
+        return os.path.join(self.directory, digest)
+
+    def get(self, key: Hashable) -> Optional[tuple[Any, np.ndarray]]:
+        path = self._path(key)
+        try:
+            with open(f"{path}.json") as f:
+                metadata = json.load(f)
+            array = np.load(f"{path}.npy", mmap_mode="r")
+            os.utime(f"{path}.npy")
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return metadata, array
+
+    def set(self, key: Hashable, value: tuple[Any, np.ndarray]) -> None:
+        metadata, array = value
+        path = self._path(key)
+        try:
+            self._write(f"{path}.npy", "wb", lambda f: np.save(f, array))
+            self._write(
+                f"{path}.json",
+                "w",
+                lambda f: json.dump(metadata, f, default=_json_default),
+            )
+        except OSError:
+            logger.exception(f"Could not write cache entry to `{self.directory}`")
+            return
+
+        self._evict()
+
+    def _write(self, path: str, mode: str, write: Callable[[Any], None]) -> None:
+        """Write to a unique temporary file and move it into place
+
+        Concurrent writers (threads or processes) never share a temporary file, and
+        readers only ever see complete files
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path[:-4]))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for ext in [".npy", ".json"]:
+                try:
+                    os.remove(f"{path}{ext}")
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
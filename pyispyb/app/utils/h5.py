@@ -0,0 +1,138 @@
+import contextlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Generator, Optional
+
+import h5py
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledFile:
+    def __init__(self, path: str, mtime: int) -> None:
+        self.file = h5py.File(path, "r")
+        self.mtime = mtime
+        self.users = 0
+        self.stale = False
+
+    def close(self) -> None:
+        try:
+            self.file.close()
+        except Exception:
+            logger.exception(f"Could not close `{self.file.filename}`")
+
+
+class H5FilePool:
+    """A thread safe pool of read only `h5py.File` handles
+
+    Handles are reopened if the file has been modified since it was opened, the least
+    recently used handles are closed once `max_files` are open. Handles that are in use
+    are only closed once released.
+
+    Kwargs:
+        max_files (int): Maximum number of open handles, a value <= 0 disables pooling
+    """
+
+    def __init__(self, max_files: int) -> None:
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+        self._files: OrderedDict[str, _PooledFile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def open(self, path: str) -> Generator[h5py.File, Any, None]:
+        if self.max_files <= 0:
+            with h5py.File(path, "r") as h5file:
+                yield h5file
+            return
+
+        pooled = self._acquire(path)
+        try:
+            yield pooled.file
+        finally:
+            self._release(pooled)
+
+    def _acquire(self, path: str) -> _PooledFile:
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            pooled = self._files.get(path)
+            if pooled is not None and pooled.mtime != mtime:
+                self._discard(path)
+                pooled = None
+
+            if pooled is None:
+                self.misses += 1
+                pooled = _PooledFile(path, mtime)
+                self._files[path] = pooled
+                while len(self._files) > self.max_files:
+                    self._discard(next(iter(self._files)))
+            else:
+                self.hits += 1
+
+            self._files.move_to_end(path)
+            pooled.users += 1
+            return pooled
+
+    def _release(self, pooled: _PooledFile) -> None:
+        with self._lock:
+            pooled.users -= 1
+            if pooled.stale and pooled.users == 0:
+                pooled.close()
+
+    def _discard(self, path: str) -> None:
+        pooled = self._files.pop(path)
+        pooled.stale = True
+        if pooled.users == 0:
+            pooled.close()
+
+    def clear(self) -> None:
+        """Close all handles"""
+        with self._lock:
+            for path in list(self._files):
+                self._discard(path)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "open": len(self._files),
+            "max_files": self.max_files,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def compress_chunk(array: np.ndarray, compression: Any) -> bytes:
+    """Compress an array as a single HDF5 chunk
+
+    The array is written to an in memory file with the `compression` filter
+    (i.e. `hdf5plugin.Bitshuffle()`) and the raw chunk read back, so the result is
+    identical to a chunk read with `read_direct_chunk` from a file using that filter
+    """
+    with h5py.File(io.BytesIO(), "w") as h5file:
+        dataset = h5file.create_dataset(
+            "data", data=array, chunks=array.shape, **compression
+        )
+        _filter_mask, chunk = dataset.id.read_direct_chunk((0,) * array.ndim)
+    return chunk
+
+
+def read_raw_chunk(
+    dataset: h5py.Dataset, offset: tuple[int, ...], filter_id: int
+) -> Optional[bytes]:
+    """Read a chunk without decompressing it
+
+    Returns None unless the dataset is compressed only with `filter_id` and the chunk
+    at `offset` was stored with it applied
+    """
+    plist = dataset.id.get_create_plist()
+    if plist.get_nfilters() != 1 or plist.get_filter(0)[0] != filter_id:
+        return None
+
+    filter_mask, chunk = dataset.id.read_direct_chunk(offset)
+    if filter_mask != 0:
+        return None
+    return chunk
@@ -0,0 +1,27 @@
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+_collectors: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register(name: str, collector: Callable[[], dict[str, Any]]) -> None:
+    """Register a metrics collector
+
+    Args:
+        name (str): The key the metrics will be reported under
+        collector (callable): Returns a dict of the current metrics
+    """
+    _collectors[name] = collector
+
+
+def collect() -> dict[str, dict[str, Any]]:
+    """Collect metrics from all registered collectors"""
+    metrics = {}
+    for name, collector in _collectors.items():
+        try:
+            metrics[name] = collector()
+        except Exception:
+            logger.exception(f"Could not collect metrics for `{name}`")
+    return metrics
@@ -0,0 +1,212 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import contextvars
+import functools
+import multiprocessing
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import threading
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+from fastapi import HTTPException
+import numpy as np
+
+T = TypeVar("T")
+
+
+class WorkerPool:
+    """A size limited thread pool to run blocking work from async routes
+
+    Work is run with a copy of the caller's context so `db.session` and `g` are
+    available. Requests are rejected with a 503 once `max_queue` calls are waiting.
+
+    Args:
+        name (str): Thread name prefix
+
+    Kwargs:
+        workers (int): Number of threads
+        max_queue (int): Maximum number of waiting calls, a value <= 0 is unlimited
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int = 0) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "run_total": 0.0,
+            "run_max": 0.0,
+        }
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            if self.max_queue > 0 and self._queued >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise HTTPException(status_code=503, detail="Server busy, try again")
+            self._queued += 1
+
+        # Whether the call has left the queue, either started or cancelled
+        dequeued = [False]
+        queued_at = time.perf_counter()
+        context = contextvars.copy_context()
+        call = functools.partial(
+            context.run, self._measure, dequeued, queued_at, fn, *args, **kwargs
+        )
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, call
+            )
+        except asyncio.CancelledError:
+            # A call cancelled while queued (client disconnect, timeout, shutdown)
+            # never reaches `_measure`
+            with self._lock:
+                self._dequeue(dequeued)
+            raise
+
+    def _dequeue(self, dequeued: list[bool]) -> None:
+        """Remove a call from the queued count once, must be called with the lock"""
+        if not dequeued[0]:
+            dequeued[0] = True
+            self._queued -= 1
+
+    def _measure(
+        self,
+        dequeued: list[bool],
+        queued_at: float,
+        fn: Callable[..., T],
+        *args,
+        **kwargs,
+    ) -> T:
+        started_at = time.perf_counter()
+        with self._lock:
+            self._dequeue(dequeued)
+            self._running += 1
+            self._record("wait", started_at - queued_at)
+
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._stats["failed" if failed else "completed"] += 1
+                self._record("run", time.perf_counter() - started_at)
+
+    def _record(self, name: str, duration: float) -> None:
+        self._stats[f"{name}_total"] += duration
+        self._stats[f"{name}_max"] = max(self._stats[f"{name}_max"], duration)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            calls = self._stats["completed"] + self._stats["failed"]
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._stats["completed"],
+                "failed": self._stats["failed"],
+                "rejected": self._stats["rejected"],
+                "wait_mean": self._stats["wait_total"] / calls if calls else 0,
+                "wait_max": self._stats["wait_max"],
+                "run_mean": self._stats["run_total"] / calls if calls else 0,
+                "run_max": self._stats["run_max"],
+            }
+
+
+class ArrayProcessPool:
+    """A process pool for CPU bound functions returning `(metadata, array)`
+
+    Arrays are passed back through shared memory rather than being pickled, metadata
+    is pickled so should be small. Processes are spawned on first use.
+
+    Args:
+        processes (int): Number of processes
+    """
+
+    def __init__(self, processes: int) -> None:
+        self.processes = processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "bytes": 0, "run_total": 0.0, "run_max": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Forking a process with running threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def run(
+        self, fn: Callable[..., tuple[Any, Optional[np.ndarray]]], *args
+    ) -> tuple[Any, Optional[np.ndarray]]:
+        """Run `fn(*args)` in a worker process, `fn` must be importable"""
+        started_at = time.perf_counter()
+        metadata, shared = (
+            self._get_executor().submit(_run_to_shared_memory, fn, *args).result()
+        )
+        array = _read_shared_memory(*shared) if shared else None
+
+        duration = time.perf_counter() - started_at
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["bytes"] += array.nbytes if array is not None else 0
+            self._stats["run_total"] += duration
+            self._stats["run_max"] = max(self._stats["run_max"], duration)
+
+        return metadata, array
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            calls = self._stats["calls"]
+            return {
+                "processes": self.processes,
+                "started": self._executor is not None,
+                "calls": calls,
+                "bytes": self._stats["bytes"],
+                "run_mean": self._stats["run_total"] / calls if calls else 0,
+                "run_max": self._stats["run_max"],
+            }
+
+
+def _run_to_shared_memory(
+    fn: Callable[..., tuple[Any, Optional[np.ndarray]]], *args
+) -> tuple[Any, Optional[tuple[str, tuple[int, ...], str]]]:
+    """Run in the worker process, copies the array into a new shared memory block"""
+    metadata, array = fn(*args)
+    if array is None:
+        return metadata, None
+
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    finally:
+        shm.close()
+    # The caller unlinks the block once read
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return metadata, (shm.name, array.shape, array.dtype.str)
+
+
+def _read_shared_memory(name: str, shape: tuple[int, ...], dtype: str) -> np.ndarray:
+    shm = SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
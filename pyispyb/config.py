@@ -27,6 +27,7 @@ import os
 
 
 from functools import lru_cache
+from typing import Literal
 from pydantic import BaseSettings, BaseModel
 import yaml
 
@@ -54,6 +55,8 @@ class Settings(BaseSettings):
     service_name: str
 
     sqlalchemy_database_uri: str
+    # Optional asyncio database uri used by async routes, i.e. `mysql+asyncmy://`
+    sqlalchemy_async_database_uri: str = None
     query_debug: bool
 
     auth = {}
@@ -70,6 +73,57 @@ class Settings(BaseSettings):
     # Map file paths in the database to a different root directory
     path_map: str = None
 
+    # Cache a person's session and proposal memberships across requests (seconds, 0 to disable)
+    authorization_cache_ttl: int = 0
+    # How session and proposal memberships are applied to queries, either inlined as
+    # `IN (...)` lists (`materialized`) or as correlated `EXISTS` subqueries (`subquery`)
+    authorization_mode: Literal["materialized", "subquery"] = "materialized"
+
+    # How long a counted total is reused for when requested with `total=estimate` (seconds)
+    estimated_total_ttl: int = 300
+
+    # Size of the in-process cache of decoded diffraction images (MB, 0 to disable)
+    image_cache_size: int = 256
+    # Optional directory shared between workers to cache decoded images, i.e. `/dev/shm/pyispyb`
+    image_cache_dir: str = None
+    # Maximum size of `image_cache_dir` (MB)
+    image_cache_dir_size: int = 1024
+    # Header pixel statistics of uncached HDF5 images use every nth pixel in each dimension
+    image_stats_subsample: int = 4
+    # Number of processes to decode images in (0 to decode in the request thread)
+    image_decode_processes: int = 0
+    # Maximum number of images that can be reduced (summed...) at once, and the size
+    # of the cache of reduced images (MB, 0 to disable)
+    image_reduce_max_images: int = 1000
+    image_reduce_cache_size: int = 0
+    # Size of the cache of pixel to bin mappings for radial profiles (MB, 0 to disable)
+    image_radial_cache_size: int = 0
+    # Width and height of image tiles, and the size of each of the caches of image
+    # pyramid levels and encoded tiles (MB, 0 to disable)
+    image_tile_size: int = 256
+    image_tile_cache_size: int = 32
+    # Number of images to prefetch when browsing a data collection sequentially, at
+    # most as many as fit in half of `image_cache_size` (0 to disable)
+    image_prefetch_depth: int = 2
+
+    # Number of HDF5 files to keep open between requests (0 to disable)
+    h5_file_pool_size: int = 32
+    # Size of the cache of HDF5 master file image indexes (MB, 0 to disable)
+    h5_index_cache_size: int = 16
+
+    # Cache the file resolved for a user's h5grove requests (seconds, 0 to disable)
+    h5_path_cache_ttl: int = 60
+
+    # Threads running h5grove database and HDF5 work, and how many requests may wait
+    # for one before being rejected (0 for unlimited)
+    h5grove_workers: int = 4
+    h5grove_max_queue: int = 64
+
+    # Size of the cache of decoded XRF maps (MB, 0 to disable)
+    map_cache_size: int = 32
+    # Size of the cache of rendered XRF map images (MB, 0 to disable)
+    map_image_cache_size: int = 16
+
     class Config:
         env_file = get_env_file()
 
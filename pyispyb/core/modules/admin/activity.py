@@ -3,7 +3,7 @@ from typing import Optional
 from ispyb import models
 
 from ....app.extensions.database.middleware import db
-from ....app.extensions.database.utils import Paged, page
+from ....app.extensions.database.utils import Paged, page, count_total
 from ...schemas.admin.activity import ActionType
 
 
@@ -18,7 +18,7 @@ def get_activity(
     if action_type:
         query = query.filter(models.AdminActivity.action == action_type.value)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
 
     return Paged(total=total, results=query.all(), skip=skip, limit=limit)
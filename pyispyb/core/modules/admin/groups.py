@@ -4,7 +4,7 @@ from sqlalchemy import func, distinct
 from sqlalchemy.orm import joinedload
 from ispyb import models
 
-from ....app.extensions.database.utils import Paged, page, with_metadata
+from ....app.extensions.database.utils import Paged, page, count_total, with_metadata
 from ....app.extensions.database.middleware import db
 from ...schemas.admin import groups as schema
 
@@ -29,7 +29,7 @@ def get_groups(
     if userGroupId:
         query = query.filter(models.UserGroup.userGroupId == userGroupId)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -196,7 +196,7 @@ def get_permissions(
     if search:
         query = query.filter(models.Permission.type.like(f"%{search}%"))
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
 
     return Paged(total=total, results=query.all(), skip=skip, limit=limit)
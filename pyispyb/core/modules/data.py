@@ -1,16 +1,33 @@
+import bisect
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextlib
+import functools
+import gzip
+import io
 import logging
 import math
 import os
-from typing import Optional, Tuple
+import threading
+from typing import Any, Callable, Generator, Iterable, Optional, Tuple, Union
 
+import fabio
 from fabio.cbfimage import CbfImage
 import h5grove
 from h5grove.content import DatasetContent
-from h5grove.utils import get_array_stats
+from h5grove.models import LinkResolution
+from h5grove.utils import NotFoundError, QueryArgumentError, get_array_stats
 import h5py
+import hdf5plugin
 from ispyb import models
 import numpy as np
+from PIL import Image
 
+from ...app.globals import g
+from ...app.utils import metrics
+from ...app.utils.cache import ArrayDiskCache, LRUCache, TTLCache
+from ...app.utils.h5 import H5FilePool, compress_chunk, read_raw_chunk
+from ...app.utils.workers import ArrayProcessPool
 from ...config import settings
 from ...core.modules.events import get_events
 from ...core.modules.processings import get_processing_attachments
@@ -19,91 +36,956 @@ from ..schemas import data as schema
 logger = logging.getLogger(__name__)
 
 
+def _image_size(image: Tuple[dict, np.ndarray]) -> int:
+    # Allow some overhead for the header
+    return image[1].nbytes + 4096
+
+
+_images = LRUCache[Tuple[dict, np.ndarray]](
+    max_bytes=settings.image_cache_size * 1024**2, sizeof=_image_size
+)
+_shared_images = (
+    ArrayDiskCache(
+        settings.image_cache_dir, max_bytes=settings.image_cache_dir_size * 1024**2
+    )
+    if settings.image_cache_dir
+    else None
+)
+
+# Optionally decode images in separate processes so that concurrent requests are
+# not serialised by the GIL
+_decoders = (
+    ArrayProcessPool(processes=settings.image_decode_processes)
+    if settings.image_decode_processes > 0
+    else None
+)
+
+metrics.register(
+    "images",
+    lambda: {
+        "memory": _images.stats(),
+        "headers": _headers.stats(),
+        "reduced": _reduced.stats(),
+        "shared": _shared_images.stats() if _shared_images else None,
+        "decoders": _decoders.stats() if _decoders else None,
+    },
+)
+
+
 def get_image(
     dataCollectionId: int,
     imageNumber: int,
     header: bool = False,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> np.ndarray:
+    """Get an image, or its header
+
+    Kwargs:
+        header (bool): Return the image header rather than its data
+        roi (tuple): Only return the region `(x, y, width, height)` of the image
+    """
+    if header:
+        return get_image_header(dataCollectionId, imageNumber)
+
+    file_path = get_image_path(dataCollectionId, imageNumber)
+    if file_path is None:
+        return None
+
+    return load_image(file_path, imageNumber, roi=roi)
+
+
+_headers = LRUCache[dict](max_bytes=16 * 1024**2, sizeof=lambda header: 4096)
+
+
+def get_image_header(
+    dataCollectionId: int, imageNumber: int, stats: bool = True
+) -> Optional[dict]:
+    """Get an image header without decoding the image where possible
+
+    If the decoded image is cached its header is returned. Otherwise only the header is
+    read, and for HDF5 pixel statistics are computed on a subsample of the image. CBF
+    images are compressed as a whole so are decoded if statistics are requested.
+
+    Kwargs:
+        stats (bool): Include pixel statistics
+    """
+    file_path = get_image_path(dataCollectionId, imageNumber)
+    if file_path is None:
+        return None
+
+    return _get_image_header(file_path, imageNumber, stats)
+
+
+def _get_image_header(file_path: str, imageNumber: int, stats: bool) -> dict:
+    """Get the header of an image from its path, see `get_image_header`"""
+    key = _image_key(file_path, imageNumber)
+    image = _images.get(key)
+    if image is not None:
+        return image[0]
+
+    return _headers.get_or_set(
+        (key, stats), lambda: _read_image_header(file_path, imageNumber, stats)
+    )
+
+
+def _read_image_header(file_path: str, imageNumber: int, stats: bool) -> dict:
+    if _is_hdf5(file_path):
+        return HDF5FormatHandler.read_header(file_path, imageNumber, stats=stats)
+
+    if stats:
+        return _load_image(file_path, imageNumber)[0]
+
+    return CBFFormatHandler.read_header(file_path)
+
+
+def get_image_path(dataCollectionId: int, imageNumber: int) -> Optional[str]:
+    """Get the path of the file containing an image"""
+    template = _get_image_template(dataCollectionId)
+    if template is None:
+        return None
+
+    template, numberOfImages = template
+    if imageNumber > numberOfImages:
+        logger.warning(
+            f"Requested image {imageNumber} which is greater than total {numberOfImages}"
+        )
+        return None
+
+    file_path = _format_image_path(template, imageNumber)
+    if not os.path.exists(file_path):
+        if not _is_hdf5(file_path):
+            logger.warning(
+                f"Requested image {imageNumber} for dataCollection: {dataCollectionId} with path {file_path} does not exist on disk"
+            )
+        return None
+
+    _prefetch_sequential(dataCollectionId, template, imageNumber, numberOfImages)
+    return file_path
+
+
+def _get_image_template(dataCollectionId: int) -> Optional[Tuple[str, int]]:
+    """Get the (path mapped) file template and number of images of a data collection"""
     datacollections = get_events(dataCollectionId=dataCollectionId, skip=0, limit=1)
     try:
         dc: models.DataCollection = datacollections.first["Item"]
     except IndexError:
         return None
 
-    if imageNumber > dc.numberOfImages:
+    template = os.path.join(dc.imageDirectory, dc.fileTemplate)
+    if settings.path_map:
+        template = settings.path_map + template
+
+    ext = get_file_ext(dc.fileTemplate)
+    if ext not in ["h5", "H5", "hdf5", "HDF5", "cbf", "CBF"]:
+        logger.warning(f"Unsupported image format `{ext}` for `{template}`")
+        return None
+
+    return template, dc.numberOfImages
+
+
+def _format_image_path(template: str, imageNumber: int) -> str:
+    """Get the path of an image from the data collection file template"""
+    if _is_hdf5(template):
+        return template
+
+    file_path = template % imageNumber
+    if "%" in file_path:
+        file_path = file_path.format(imageNumber)
+    return file_path
+
+
+def _load_image(
+    file_path: str, imageNumber: int, prefetch: bool = False
+) -> Tuple[dict, np.ndarray]:
+    """Load and decode an image and its header
+
+    Decoded images are cached by path, modification time, and image number so that
+    the image, header, and histogram endpoints only decode a frame once
+    """
+    key = _image_key(file_path, imageNumber)
+    image = _images.get(key)
+    if image is not None:
+        if not prefetch and _prefetched.pop(key, None):
+            _prefetch_stats["hits"] += 1
+        return image
+
+    # Wait for a prefetch already decoding this image
+    pending = _prefetching.get(key)
+    if pending is not None and not prefetch:
+        image = pending.result()
+        if image[1] is not None:
+            if _prefetched.pop(key, None):
+                _prefetch_stats["hits"] += 1
+            return image
+
+    if _shared_images:
+        image = _shared_images.get(key)
+        if image is not None:
+            _images.set(key, image)
+            return image
+
+    if _decoders:
+        image = _decoders.run(_decode_image, file_path, imageNumber)
+    else:
+        image = _decode_image(file_path, imageNumber)
+
+    if image[1] is None:
+        return image
+
+    # Cached arrays are shared between requests
+    image[1].flags.writeable = False
+    _images.set(key, image)
+    if _shared_images:
+        _shared_images.set(key, image)
+
+    return image
+
+
+# Last image requested per user and data collection, to detect sequential browsing
+_last_images = TTLCache[int](ttl=300, max_entries=4096)
+_prefetcher = (
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+    if settings.image_prefetch_depth > 0 and _images.enabled
+    else None
+)
+_prefetching: dict[Tuple[str, int, int], Future] = {}
+_prefetched: OrderedDict[Tuple[str, int, int], bool] = OrderedDict()
+_prefetch_stats = {"scheduled": 0, "skipped": 0, "hits": 0}
+_prefetch_lock = threading.Lock()
+
+metrics.register(
+    "prefetch",
+    lambda: {
+        "enabled": _prefetcher is not None,
+        "depth": settings.image_prefetch_depth,
+        "pending": len(_prefetching),
+        **_prefetch_stats,
+    },
+)
+
+
+def _prefetch_sequential(
+    dataCollectionId: int, template: str, imageNumber: int, numberOfImages: int
+) -> None:
+    """Prefetch the next `image_prefetch_depth` images when browsing sequentially
+
+    Images are browsed sequentially if the previous image requested by the same user
+    for this data collection was `imageNumber - 1` (or `+ 1` when browsing backwards).
+    Prefetched images are limited to half of the image cache, based on the size of
+    the previous image, so they do not evict the images being viewed
+    """
+    if _prefetcher is None:
+        return
+
+    key = (g.personId, dataCollectionId)
+    previous = _last_images.get(key)
+    _last_images.set(key, imageNumber)
+    if previous is None or abs(imageNumber - previous) != 1:
+        return
+
+    depth = _prefetch_depth(_format_image_path(template, previous), previous)
+    if depth < 1:
+        with _prefetch_lock:
+            _prefetch_stats["skipped"] += 1
+        return
+
+    step = imageNumber - previous
+    for offset in range(1, depth + 1):
+        nextImageNumber = imageNumber + step * offset
+        if nextImageNumber < 1 or nextImageNumber > numberOfImages:
+            break
+
+        file_path = _format_image_path(template, nextImageNumber)
+        try:
+            image_key = _image_key(file_path, nextImageNumber)
+        except FileNotFoundError:
+            break
+
+        with _prefetch_lock:
+            if image_key in _prefetching or image_key in _images:
+                continue
+            # Bound the amount of queued work
+            if len(_prefetching) >= depth * 2:
+                _prefetch_stats["skipped"] += 1
+                break
+
+            _prefetch_stats["scheduled"] += 1
+            future = _prefetcher.submit(_prefetch, file_path, nextImageNumber)
+            _prefetching[image_key] = future
+            future.add_done_callback(
+                functools.partial(_prefetch_done, image_key=image_key)
+            )
+
+
+def _prefetch_depth(file_path: str, imageNumber: int) -> int:
+    """Number of images to prefetch, keeping them within half of the image cache
+
+    Frames are assumed to be the size of `imageNumber`, 0 if it is not cached
+    """
+    try:
+        image = _images.peek(_image_key(file_path, imageNumber))
+    except FileNotFoundError:
+        return 0
+
+    if image is None or image[1] is None:
+        return 0
+
+    return min(
+        settings.image_prefetch_depth, _images.max_bytes // 2 // _images.sizeof(image)
+    )
+
+
+def _prefetch(file_path: str, imageNumber: int) -> Tuple[dict, np.ndarray]:
+    try:
+        image = _load_image(file_path, imageNumber, prefetch=True)
+    except Exception:
+        logger.exception(f"Could not prefetch image {imageNumber} from `{file_path}`")
+        return None, None
+
+    if image[1] is not None:
+        with _prefetch_lock:
+            _prefetched[_image_key(file_path, imageNumber)] = True
+            while len(_prefetched) > 1024:
+                _prefetched.popitem(last=False)
+
+    return image
+
+
+def _prefetch_done(future: Future, image_key: Tuple[str, int, int]) -> None:
+    with _prefetch_lock:
+        _prefetching.pop(image_key, None)
+
+
+def _decode_image(file_path: str, imageNumber: int) -> Tuple[dict, np.ndarray]:
+    if _is_hdf5(file_path):
+        return HDF5FormatHandler.preload(path=file_path, imageNumber=imageNumber)
+    return CBFFormatHandler.preload(path=file_path)
+
+
+def _image_key(file_path: str, imageNumber: int) -> Tuple[str, int, int]:
+    return (file_path, os.stat(file_path).st_mtime_ns, imageNumber)
+
+
+def load_image(
+    file_path: str,
+    imageNumber: int,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+) -> np.ndarray:
+    """Load an image, or the region `(x, y, width, height)` of it
+
+    The region is cropped from the decoded image if it is already cached, otherwise
+    only the region is read from HDF5 files
+    """
+    if not roi:
+        return _load_image(file_path, imageNumber)[1]
+
+    x, y, width, height = roi
+    image = _images.get(_image_key(file_path, imageNumber))
+    if image is None and _is_hdf5(file_path):
+        return HDF5FormatHandler.read_region(file_path, imageNumber, roi)
+
+    if image is None:
+        image = _load_image(file_path, imageNumber)
+
+    data = image[1]
+    if data is None:
+        return None
+
+    return data[y : y + height, x : x + width]
+
+
+def transform_image(
+    data: np.ndarray,
+    binning: int = 1,
+    binningMode: schema.BinningMode = schema.BinningMode.max,
+    dtype: schema.ImageDType = schema.ImageDType.float32,
+) -> np.ndarray:
+    """Bin an image and convert it to `dtype`
+
+    Kwargs:
+        binning (int): Pool `binning` x `binning` pixels into one, trailing rows and
+                       columns that do not fill a bin are dropped
+        binningMode (BinningMode): How pixels are pooled
+        dtype (ImageDType): Output type, values are clipped to the range of integer types,
+                            `native` leaves the image in the detector's type
+    """
+    if binning > 1:
+        height = data.shape[0] // binning
+        width = data.shape[1] // binning
+        blocks = data[: height * binning, : width * binning].reshape(
+            height, binning, width, binning
+        )
+        if binningMode == schema.BinningMode.sum:
+            data = blocks.sum(axis=(1, 3), dtype=np.float32)
+        elif binningMode == schema.BinningMode.mean:
+            data = blocks.mean(axis=(1, 3), dtype=np.float32)
+        else:
+            data = blocks.max(axis=(1, 3))
+
+    if dtype == schema.ImageDType.native:
+        return data
+
+    np_dtype = np.dtype(dtype.value)
+    if np_dtype.kind == "u":
+        info = np.iinfo(np_dtype)
+        data = np.clip(data, info.min, info.max)
+
+    return data.astype(np_dtype, copy=False)
+
+
+_COMPRESSION = {
+    schema.DataEncoding.bslz4: hdf5plugin.Bitshuffle(cname="lz4"),
+    schema.DataEncoding.zstd: hdf5plugin.Zstd(),
+}
+
+
+def get_image_chunk(
+    file_path: str, imageNumber: int, encoding: schema.DataEncoding
+) -> Optional[Tuple[bytes, np.dtype, Tuple[int, ...]]]:
+    """Get an image as stored on disk, compressed with `encoding`
+
+    Only possible for HDF5 images stored one per chunk compressed with the same filter
+    as `encoding`, returns None otherwise
+
+    Returns:
+        (chunk, dtype, shape): The raw chunk, and the image type and shape
+    """
+    if encoding not in _COMPRESSION or not _is_hdf5(file_path):
+        return None
+
+    return HDF5FormatHandler.read_chunk(
+        file_path, imageNumber, _COMPRESSION[encoding].filter_id
+    )
+
+
+def negotiate_encoding(
+    encoding: Optional[schema.DataEncoding], accept_encoding: Optional[str]
+) -> schema.DataEncoding:
+    """Choose the response encoding
+
+    An explicitly requested `encoding` is used as is, otherwise the first of `zstd` or
+    `gzip` accepted by the `Accept-Encoding` header
+    """
+    if encoding:
+        return encoding
+
+    accepted = set()
+    for token in (accept_encoding or "").split(","):
+        name, *params = token.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        # q=0 (or 0.0, 0.000...) marks an encoding as not acceptable
+        if quality > 0:
+            accepted.add(name.strip().lower())
+
+    for candidate in [schema.DataEncoding.zstd, schema.DataEncoding.gzip]:
+        if candidate.value in accepted:
+            return candidate
+
+    return schema.DataEncoding.identity
+
+
+def encode_data(
+    data: Union[bytes, np.ndarray], encoding: schema.DataEncoding
+) -> Union[bytes, memoryview]:
+    """Compress `data` with `encoding`
+
+    `bslz4` compresses per element so requires an array, chunks are in the same format
+    as the HDF5 bitshuffle filter (a 12 byte header followed by the LZ4 blocks).
+    Uncompressed arrays are returned as a memoryview of the array rather than copied.
+    """
+    if isinstance(data, np.ndarray):
+        array = np.ascontiguousarray(data)
+        data = memoryview(array).cast("B") if array.size else b""
+    else:
+        array = np.frombuffer(data, dtype=np.uint8)
+
+    if encoding == schema.DataEncoding.identity or array.size == 0:
+        return data
+
+    if encoding == schema.DataEncoding.gzip:
+        # Favour speed over ratio as frames are compressed per request
+        return gzip.compress(data, compresslevel=1)
+
+    return compress_chunk(np.ascontiguousarray(array), _COMPRESSION[encoding])
+
+
+def encoding_headers(encoding: schema.DataEncoding) -> dict[str, str]:
+    """Headers describing the encoding of a response
+
+    `gzip` and `zstd` are standard content codings, `bslz4` is not so is returned as
+    `X-Data-Encoding` and must be decoded by the client
+    """
+    if encoding in [schema.DataEncoding.gzip, schema.DataEncoding.zstd]:
+        return {"Content-Encoding": encoding.value, "Vary": "Accept-Encoding"}
+    if encoding == schema.DataEncoding.bslz4:
+        return {"X-Data-Encoding": encoding.value}
+    return {}
+
+
+_reduced = LRUCache[np.ndarray](
+    max_bytes=settings.image_reduce_cache_size * 1024**2,
+    sizeof=lambda data: data.nbytes,
+)
+
+
+def reduce_images(
+    dataCollectionId: int,
+    start: int,
+    end: int,
+    operation: schema.ReduceOperation,
+) -> Optional[np.ndarray]:
+    """Reduce images `start` to `end` (inclusive) to a single image
+
+    Images are read in blocks so memory use is bounded whatever the number of images,
+    results are cached. Masked pixels (negative, or the maximum value of unsigned
+    types) in any image are masked in the result, set to -1 for `sum` and `mean`.
+    """
+    template = _get_image_template(dataCollectionId)
+    if template is None:
+        return None
+
+    template, numberOfImages = template
+    if end > numberOfImages:
         logger.warning(
-            f"Requested image {imageNumber} which is greater than total {dc.numberOfImages}"
+            f"Requested image {end} which is greater than total {numberOfImages}"
         )
         return None
 
-    file_path = os.path.join(dc.imageDirectory, dc.fileTemplate)
-    if settings.path_map:
-        file_path = settings.path_map + file_path
+    return _reduce_images(template, start, end, operation)
 
-    ext = get_file_ext(dc.fileTemplate)
-    if ext in ["h5", "H5", "hdf5", "HDF5"]:
-        if not os.path.exists(file_path):
-            return None
 
-        _header, data = HDF5FormatHandler.preload(
-            path=file_path, imageNumber=imageNumber
+def _reduce_images(
+    template: str, start: int, end: int, operation: schema.ReduceOperation
+) -> Optional[np.ndarray]:
+    """Reduce images from a file template, see `reduce_images`"""
+    first_path = _format_image_path(template, start)
+    if not os.path.exists(first_path):
+        return None
+
+    key = (*_image_key(first_path, start), end, operation)
+    reduced = _reduced.get(key)
+    if reduced is not None:
+        return reduced
+
+    if _is_hdf5(template):
+        blocks = HDF5FormatHandler.read_frames(template, start, end)
+    else:
+        blocks = CBFFormatHandler.read_frames(template, start, end)
+
+    try:
+        reduced = _reduce_blocks(blocks, operation)
+    except FileNotFoundError:
+        logger.warning(
+            f"Could not read images {start}-{end} from {template}", exc_info=True
         )
+        return None
 
-    elif ext in ["cbf", "CBF"]:
-        file_path = file_path % imageNumber
-        if "%" in file_path:
-            file_path = file_path.format(imageNumber)
+    if reduced is not None:
+        reduced.flags.writeable = False
+        _reduced.set(key, reduced)
+    return reduced
+
+
+def _reduce_blocks(
+    blocks: Iterable[np.ndarray], operation: schema.ReduceOperation
+) -> Optional[np.ndarray]:
+    """Reduce blocks of images `(n, height, width)`, or single images"""
+    result = None
+    masked = None
+    count = 0
+    for block in blocks:
+        if block is None:
+            raise FileNotFoundError("Could not read image")
+        if block.ndim == 2:
+            block = block[np.newaxis]
+
+        if block.dtype.kind == "u":
+            block_masked = (block == np.iinfo(block.dtype).max).any(axis=0)
+        elif block.dtype.kind == "i":
+            block_masked = (block < 0).any(axis=0)
+        else:
+            block_masked = None
+
+        if block_masked is not None:
+            masked = block_masked if masked is None else masked | block_masked
+
+        if operation == schema.ReduceOperation.max:
+            partial = block.max(axis=0)
+            result = partial if result is None else np.maximum(result, partial)
+        else:
+            partial = block.sum(
+                axis=0, dtype=np.int64 if block.dtype.kind in "iu" else np.float64
+            )
+            if result is None:
+                result = partial
+            else:
+                result += partial
 
-        if not os.path.exists(file_path):
-            logger.warning(
-                f"Requested image {imageNumber} for dataCollection: {dataCollectionId} with path {file_path} does not exist on disk"
+        count += block.shape[0]
+
+    if result is None:
+        return None
+
+    if operation == schema.ReduceOperation.mean:
+        result = (result / count).astype(np.float32)
+
+    if masked is not None:
+        result[masked] = np.iinfo(result.dtype).max if result.dtype.kind == "u" else -1
+
+    return result
+
+
+_image_levels = LRUCache[np.ndarray](
+    max_bytes=settings.image_tile_cache_size * 1024**2,
+    sizeof=lambda data: data.nbytes,
+)
+_tiles = LRUCache[Tuple[bytes, np.dtype, Tuple[int, ...]]](
+    max_bytes=settings.image_tile_cache_size * 1024**2,
+    sizeof=lambda tile: len(tile[0]),
+)
+metrics.register(
+    "tiles", lambda: {"levels": _image_levels.stats(), "tiles": _tiles.stats()}
+)
+
+
+def get_image_pyramid(file_path: str, imageNumber: int) -> Optional[dict]:
+    """Get the size and number of levels of the tile pyramid of an image"""
+    data = load_image(file_path, imageNumber)
+    if data is None:
+        return None
+
+    return {
+        "width": data.shape[1],
+        "height": data.shape[0],
+        "tileSize": settings.image_tile_size,
+        "levels": get_pyramid_levels(data.shape),
+    }
+
+
+def get_pyramid_levels(shape: Tuple[int, int]) -> int:
+    """Number of levels of the tile pyramid of an image of `shape`
+
+    Level 0 is the full resolution image, each further level halves its width and
+    height, the last level fits in a single tile
+    """
+    levels = 1
+    while max(shape) > settings.image_tile_size * 2 ** (levels - 1):
+        levels += 1
+    return levels
+
+
+def get_image_level(
+    file_path: str,
+    imageNumber: int,
+    level: int,
+    binningMode: schema.BinningMode = schema.BinningMode.max,
+) -> Optional[np.ndarray]:
+    """Get an image downsampled by `2 ** level`
+
+    Levels are built lazily from the previous level and cached
+    """
+    if level == 0:
+        return load_image(file_path, imageNumber)
+
+    def build() -> Optional[np.ndarray]:
+        data = get_image_level(file_path, imageNumber, level - 1, binningMode)
+        if data is None:
+            return None
+
+        # Pad odd sized images so the last row and column are not dropped
+        if data.shape[0] % 2 or data.shape[1] % 2:
+            data = np.pad(
+                data, ((0, data.shape[0] % 2), (0, data.shape[1] % 2)), mode="edge"
             )
+        data = transform_image(
+            data, binning=2, binningMode=binningMode, dtype=schema.ImageDType.native
+        )
+        data.flags.writeable = False
+        return data
+
+    return _image_levels.get_or_set(
+        (*_image_key(file_path, imageNumber), level, binningMode), build
+    )
+
+
+def get_image_tile(
+    file_path: str,
+    imageNumber: int,
+    level: int,
+    x: int,
+    y: int,
+    binningMode: schema.BinningMode,
+    dtype: schema.ImageDType,
+    format: schema.TileFormat,
+    encoding: schema.DataEncoding,
+) -> Optional[Tuple[bytes, np.dtype, Tuple[int, ...]]]:
+    """Get an encoded tile of the image pyramid
+
+    Tiles are `IMAGE_TILE_SIZE` square except at the right and bottom edges of a level
+
+    Returns:
+        tile (tuple): The encoded tile, its type and shape, or None if the image or
+                      tile does not exist
+    """
+
+    def build() -> Optional[Tuple[bytes, np.dtype, Tuple[int, ...]]]:
+        data = get_image_level(file_path, imageNumber, level, binningMode)
+        if data is None:
             return None
 
-        _header, data = CBFFormatHandler.preload(path=file_path)
+        size = settings.image_tile_size
+        tile = data[y * size : (y + 1) * size, x * size : (x + 1) * size]
+        if tile.size == 0:
+            return None
+
+        tile = transform_image(tile, dtype=dtype)
+        if format == schema.TileFormat.png:
+            return _encode_png(tile), tile.dtype, tile.shape
+        return bytes(encode_data(tile, encoding)), tile.dtype, tile.shape
+
+    return _tiles.get_or_set(
+        (
+            *_image_key(file_path, imageNumber),
+            level,
+            x,
+            y,
+            binningMode,
+            dtype,
+            format,
+            encoding,
+        ),
+        build,
+    )
+
+
+def _encode_png(data: np.ndarray) -> bytes:
+    """Encode a `uint8` or `uint16` image as a greyscale PNG"""
+    # Pillow infers the `L` or `I;16` mode from the type
+    image = Image.fromarray(np.ascontiguousarray(data))
+    png = io.BytesIO()
+    # Favour encoding speed over size
+    image.save(png, "PNG", compress_level=1)
+    return png.getvalue()
 
-    if header:
-        return _header
 
-    return data
+_histograms = LRUCache[dict](
+    max_bytes=16 * 1024**2,
+    sizeof=lambda histogram: 1024 + 16 * len(histogram["bins"]),
+)
 
 
 def get_image_histogram(
     dataCollectionId: int,
     imageNumber: int,
 ) -> schema.ImageHistogram:
-    data = get_image(dataCollectionId, imageNumber)
+    file_path = get_image_path(dataCollectionId, imageNumber)
+    if file_path is None:
+        return None
+
+    def compute() -> Optional[dict]:
+        data = load_image(file_path, imageNumber)
+        if data is None:
+            return None
+
+        hist, bins = _compute_histogram(data)
+        return {
+            "values": hist.tolist(),
+            "bins": bins,
+            "shape": hist.shape,
+            "max": np.max(hist).item() if hist.size > 0 else 0,
+        }
+
+    return _histograms.get_or_set(_image_key(file_path, imageNumber), compute)
+
+
+class RadialGeometry:
+    """Maps each pixel of a detector to its bin of momentum transfer `q`
+
+    Bins are evenly spaced in `q` from 0 to the largest `q` on the detector
+
+    Args:
+        header (dict): The `braggy_hdr` of an image (wavelength in Angstrom, detector
+                       distance and pixel size in m, beam centre in pixels)
+        shape (tuple): Image height and width
+        bins (int): Number of bins
+    """
+
+    def __init__(self, header: dict, shape: Tuple[int, int], bins: int) -> None:
+        height, width = shape
+        y = (np.arange(height, dtype=np.float64) - header["beam_cy"]) * header[
+            "pixel_size_y"
+        ]
+        x = (np.arange(width, dtype=np.float64) - header["beam_cx"]) * header[
+            "pixel_size_x"
+        ]
+        radius = np.hypot(y[:, np.newaxis], x[np.newaxis, :])
+        theta = np.arctan2(radius, header["detector_distance"]) / 2
+        q = 4 * math.pi * np.sin(theta) / header["wavelength"]
+
+        self.q_max = q.max().item()
+        self.bins = bins
+        self.index = np.minimum(
+            (q.ravel() * (bins / self.q_max)).astype(np.uint16), bins - 1
+        )
+        self.counts = np.bincount(self.index, minlength=bins)
+        self.nbytes = self.index.nbytes + self.counts.nbytes
+
+    @property
+    def q(self) -> np.ndarray:
+        """The centre of each bin"""
+        return (np.arange(self.bins) + 0.5) * (self.q_max / self.bins)
+
+    def integrate(self, data: np.ndarray) -> np.ndarray:
+        """Mean intensity per bin, NaN for bins with no unmasked pixels
+
+        Negative pixels and, for unsigned types, pixels with the maximum value are
+        excluded
+        """
+        data = data.ravel()
+        if data.dtype.kind == "u":
+            masked = np.flatnonzero(data == np.iinfo(data.dtype).max)
+        else:
+            masked = np.flatnonzero(~(data >= 0))
+
+        weights = data.astype(np.float64)
+        weights[masked] = 0
+        sums = np.bincount(self.index, weights=weights, minlength=self.bins)
+        counts = self.counts - np.bincount(self.index[masked], minlength=self.bins)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+
+_radial_geometries = LRUCache[RadialGeometry](
+    max_bytes=settings.image_radial_cache_size * 1024**2,
+    sizeof=lambda geometry: geometry.nbytes,
+)
+metrics.register("radial", _radial_geometries.stats)
+
+_RADIAL_PARAMS = [
+    "wavelength",
+    "detector_distance",
+    "beam_cx",
+    "beam_cy",
+    "pixel_size_x",
+    "pixel_size_y",
+]
+
+
+def get_radial_profile(
+    dataCollectionId: int, start: int, end: Optional[int] = None, bins: int = 500
+) -> Optional[dict]:
+    """Azimuthally integrate an image, or the mean of images `start` to `end`
+
+    The pixel to bin mapping is cached per detector geometry so integrating further
+    images with the same geometry costs a single weighted `bincount`
+
+    Returns:
+        dict: `q` (1/Angstrom) and `resolution` (Angstrom) of each bin centre, and the
+              mean `intensity` per bin (None if all its pixels are masked), or None if
+              the images are not found or their header lacks the geometry
+    """
+    # Resolve the images once for both the header and the data
+    template = _get_image_template(dataCollectionId)
+    if template is None:
+        return None
+
+    template, numberOfImages = template
+    if end is None:
+        end = start
+    if end > numberOfImages:
+        logger.warning(
+            f"Requested image {end} which is greater than total {numberOfImages}"
+        )
+        return None
+
+    file_path = _format_image_path(template, start)
+    if not os.path.exists(file_path):
+        return None
+
+    header = _get_image_header(file_path, start, stats=False)
+    if not header:
+        return None
+
+    if end == start:
+        data = load_image(file_path, start)
+    else:
+        data = _reduce_images(template, start, end, schema.ReduceOperation.mean)
     if data is None:
         return None
 
-    hist, bins = _compute_histogram(data)
+    braggy_hdr = header.get("braggy_hdr", {})
+    try:
+        params = {key: float(braggy_hdr[key]) for key in _RADIAL_PARAMS}
+    except (KeyError, TypeError, ValueError):
+        logger.warning(f"Image header is missing geometry: {braggy_hdr}")
+        return None
+
+    if not all(params[key] > 0 for key in _RADIAL_PARAMS[:2] + _RADIAL_PARAMS[4:]):
+        logger.warning(f"Image header has invalid geometry: {braggy_hdr}")
+        return None
 
+    geometry = _radial_geometries.get_or_set(
+        (data.shape, bins, *params.values()),
+        lambda: RadialGeometry(params, data.shape, bins),
+    )
+    intensity = geometry.integrate(data)
+    q = geometry.q
     return {
-        "values": hist.astype(np.float32).tolist(),
-        "bins": bins,
-        "shape": hist.shape,
-        "max": np.max(hist).item() if hist.size > 0 else 0,
+        "q": q.tolist(),
+        "resolution": (2 * math.pi / q).tolist(),
+        "intensity": [
+            None if np.isnan(value) else value for value in intensity.tolist()
+        ],
     }
 
 
 class CBFFormatHandler:
+    @staticmethod
+    def read_header(path: str) -> dict:
+        """Read the image header without decoding the image"""
+        cbf_image = fabio.openheader(path)
+        parsed_ext_hdr, braggy_hdr = CBFFormatHandler._parse_header(cbf_image)
+        return {"parsed_ext_hdr": parsed_ext_hdr, "braggy_hdr": braggy_hdr}
+
     @staticmethod
     def preload(path: str) -> Tuple[dict, np.ndarray, bytes]:
         cbf_image = CbfImage(fname=path)
-        float_data = cbf_image.data.astype(np.float32)
+        data = cbf_image.data
 
-        parsed_ext_hdr, braggy_hdr = CBFFormatHandler._parse_header(
-            cbf_image, float_data
-        )
+        parsed_ext_hdr, braggy_hdr = CBFFormatHandler._parse_header(cbf_image, data)
 
         img_hdr = {}
         img_hdr["parsed_ext_hdr"] = parsed_ext_hdr
         img_hdr["braggy_hdr"] = braggy_hdr
 
-        return img_hdr, float_data.flatten()
+        return img_hdr, data
 
     @staticmethod
-    def _parse_header(cbf_image: CbfImage, np_array: np.ndarray) -> Tuple[dict, dict]:
+    def read_frames(
+        template: str, start: int, end: int
+    ) -> Generator[np.ndarray, Any, None]:
+        """Read images `start` to `end` (inclusive) from the file template
+
+        Decoded images are taken from the image cache if available, images decoded
+        here are not added to it
+        """
+        for imageNumber in range(start, end + 1):
+            path = _format_image_path(template, imageNumber)
+            image = _images.get(_image_key(path, imageNumber))
+            yield image[1] if image is not None else CbfImage(fname=path).data
+
+    @staticmethod
+    def _parse_header(
+        cbf_image: CbfImage, np_array: Optional[np.ndarray] = None
+    ) -> Tuple[dict, dict]:
+        """Parse the CBF header, including pixel statistics if `np_array` is provided"""
         height, width = cbf_image.shape
 
         hdr = cbf_image.header
@@ -136,9 +1018,6 @@ class CBFFormatHandler:
 
             dr = math.sqrt((px_size_x * width) ** 2 + (px_size_y * height) ** 2) / 2
 
-            # Remove invalid values (-1)
-            clean_np_array = np_array[np_array >= 0]
-
             braggy_hdr = {
                 "wavelength": w,
                 "detector_distance": d,
@@ -153,54 +1032,193 @@ class CBFFormatHandler:
                 "img_height": height,
                 "pxxpm": 1 / px_size_x,
                 "pxypm": 1 / px_size_y,
-                **get_array_stats(
-                    clean_np_array if clean_np_array.size > 0 else np_array
-                ),
             }
+
+            if np_array is not None:
+                # Remove invalid values (-1)
+                clean_np_array = np_array[np_array >= 0]
+                braggy_hdr.update(
+                    _get_array_stats(
+                        clean_np_array if clean_np_array.size > 0 else np_array
+                    )
+                )
         except (KeyError, IndexError):
             logging.info("Could not create Braggy header from CBF header")
 
         return parsed_ext_hdr, braggy_hdr
 
 
+class HDF5ImageIndex:
+    """Maps image numbers to the `/entry/data` child dataset containing them
+
+    Args:
+        lows (list): Sorted `image_nr_low` of each child dataset
+        highs (list): `image_nr_high` of each child dataset
+        paths (list): Path of each child dataset
+    """
+
+    def __init__(self, lows: list[int], highs: list[int], paths: list[str]) -> None:
+        self.lows = lows
+        self.highs = highs
+        self.paths = paths
+
+    @classmethod
+    def from_file(cls, h5file: h5py.File) -> "HDF5ImageIndex":
+        entries = []
+        dset_content = h5grove.create_content(h5file, "/entry/data")
+        for child in dset_content.metadata()["children"]:
+            child_path = "/entry/data/" + child["name"]
+            attrs = _get_dataset_attr(h5file, child_path)
+            entries.append(
+                (int(attrs["image_nr_low"]), int(attrs["image_nr_high"]), child_path)
+            )
+
+        entries.sort()
+        return cls(
+            lows=[entry[0] for entry in entries],
+            highs=[entry[1] for entry in entries],
+            paths=[entry[2] for entry in entries],
+        )
+
+    def find(self, imageNumber: int) -> Tuple[Optional[str], Optional[int]]:
+        """Returns the child dataset path and index within it for `imageNumber`"""
+        position = self._locate(imageNumber)
+        if position is not None:
+            return self.paths[position], imageNumber - self.lows[position]
+        return None, None
+
+    def last_image_number(self, imageNumber: int) -> Optional[int]:
+        """Returns the last image number in the child dataset containing `imageNumber`"""
+        position = self._locate(imageNumber)
+        return self.highs[position] if position is not None else None
+
+    def _locate(self, imageNumber: int) -> Optional[int]:
+        position = bisect.bisect_right(self.lows, imageNumber) - 1
+        if position >= 0 and imageNumber <= self.highs[position]:
+            return position
+        return None
+
+    @property
+    def max_image_number(self) -> Optional[int]:
+        return max(self.highs) if self.highs else None
+
+
+_h5files = H5FilePool(max_files=settings.h5_file_pool_size)
+_h5indexes = LRUCache[HDF5ImageIndex](
+    max_bytes=settings.h5_index_cache_size * 1024**2,
+    sizeof=lambda index: 256 + 128 * len(index.paths),
+)
+
+metrics.register(
+    "hdf5",
+    lambda: {"files": _h5files.stats(), "indexes": _h5indexes.stats()},
+)
+
+
 class HDF5FormatHandler:
     @staticmethod
     def preload(
         path: str,
         imageNumber: int,
     ) -> Tuple[dict, np.ndarray, bytes]:
-        h5path, image_index = HDF5FormatHandler._find_path(path, imageNumber)
-        if not h5path:
-            return None, None
-
-        with h5py.File(path, "r") as h5file:
-            data = _get_dataset_data(h5file, h5path, str(image_index))
+        with _h5files.open(path) as h5file:
+            h5path, image_index = HDF5FormatHandler._find_path(
+                h5file, path, imageNumber
+            )
+            if not h5path:
+                return None, None
 
-        np_array = data.astype(np.float32)
-        img_hdr = HDF5FormatHandler._get_hdr(path, np_array)
+            np_array = _get_dataset_data(h5file, h5path, str(image_index))
+            img_hdr = HDF5FormatHandler._get_hdr(h5file, np_array)
 
         return img_hdr, np_array
 
     @staticmethod
-    def _get_hdr(path: str, np_array: np.ndarray) -> dict[str, dict]:
-        with h5py.File(path, "r") as h5file:
-            wavelength = _get_instrument_param(h5file, "beam/incident_wavelength")
-            detector = _get_instrument_param(h5file, "detector/detector_distance")
-
-            pixel_size_x = _get_instrument_param(h5file, "detector/x_pixel_size")
-            pixel_size_y = _get_instrument_param(h5file, "detector/y_pixel_size")
-            width = _get_instrument_param(
-                h5file, "detector/detectorSpecific/x_pixels_in_detector"
+    def read_chunk(
+        path: str, imageNumber: int, filter_id: int
+    ) -> Optional[Tuple[bytes, np.dtype, Tuple[int, ...]]]:
+        """Read an image without decompressing it
+
+        Returns None unless the image is stored as a single chunk compressed only
+        with `filter_id`
+        """
+        with _h5files.open(path) as h5file:
+            h5path, image_index = HDF5FormatHandler._find_path(
+                h5file, path, imageNumber
             )
-            height = _get_instrument_param(
-                h5file, "detector/detectorSpecific/y_pixels_in_detector"
+            if not h5path:
+                return None
+
+            dataset = h5file[h5path]
+            shape = dataset.shape[1:]
+            if dataset.ndim != 3 or dataset.chunks != (1, *shape):
+                return None
+
+            chunk = read_raw_chunk(dataset, (image_index, 0, 0), filter_id)
+            if chunk is None:
+                return None
+
+            return chunk, dataset.dtype, shape
+
+    @staticmethod
+    def read_region(
+        path: str, imageNumber: int, roi: Tuple[int, int, int, int]
+    ) -> np.ndarray:
+        """Read only the region `(x, y, width, height)` of an image"""
+        x, y, width, height = roi
+        with _h5files.open(path) as h5file:
+            h5path, image_index = HDF5FormatHandler._find_path(
+                h5file, path, imageNumber
             )
+            if not h5path:
+                return None
 
-            beam_cx = _get_instrument_param(h5file, "detector/beam_center_x")
-            beam_cy = _get_instrument_param(h5file, "detector/beam_center_y")
+            data = _get_dataset_data(
+                h5file, h5path, f"{image_index},{y}:{y + height},{x}:{x + width}"
+            )
 
-        # Remove invalid values (SATURATION VALUES)
-        clean_np_array = np_array[np_array != np.max(np_array)]
+        return data
+
+    @staticmethod
+    def read_header(path: str, imageNumber: int, stats: bool = True) -> dict:
+        """Read the image header without decoding the full image
+
+        Pixel statistics are computed on a subsample of every `image_stats_subsample`
+        pixels in each dimension
+        """
+        with _h5files.open(path) as h5file:
+            np_array = None
+            if stats:
+                h5path, image_index = HDF5FormatHandler._find_path(
+                    h5file, path, imageNumber
+                )
+                if not h5path:
+                    return None
+
+                step = settings.image_stats_subsample
+                np_array = h5file[h5path][image_index, ::step, ::step]
+
+            return HDF5FormatHandler._get_hdr(h5file, np_array)
+
+    @staticmethod
+    def _get_hdr(
+        h5file: h5py.File, np_array: Optional[np.ndarray] = None
+    ) -> dict[str, dict]:
+        """Read the header, including pixel statistics if `np_array` is provided"""
+        wavelength = _get_instrument_param(h5file, "beam/incident_wavelength")
+        detector = _get_instrument_param(h5file, "detector/detector_distance")
+
+        pixel_size_x = _get_instrument_param(h5file, "detector/x_pixel_size")
+        pixel_size_y = _get_instrument_param(h5file, "detector/y_pixel_size")
+        width = _get_instrument_param(
+            h5file, "detector/detectorSpecific/x_pixels_in_detector"
+        )
+        height = _get_instrument_param(
+            h5file, "detector/detectorSpecific/y_pixels_in_detector"
+        )
+
+        beam_cx = _get_instrument_param(h5file, "detector/beam_center_x")
+        beam_cy = _get_instrument_param(h5file, "detector/beam_center_y")
 
         braggy_hdr = {
             "wavelength": wavelength,
@@ -216,31 +1234,72 @@ class HDF5FormatHandler:
             "img_height": height,
             "pxxpm": 1 / pixel_size_x,
             "pxypm": 1 / pixel_size_y,
-            **get_array_stats(clean_np_array if clean_np_array.size > 0 else np_array),
         }
 
+        if np_array is not None:
+            # Remove invalid values (SATURATION VALUES)
+            clean_np_array = np_array[np_array != np.max(np_array)]
+            braggy_hdr.update(
+                _get_array_stats(
+                    clean_np_array if clean_np_array.size > 0 else np_array
+                )
+            )
+
         return {"braggy_hdr": braggy_hdr}
 
     @staticmethod
-    def _find_path(path: str, imageNumber: int) -> Tuple[str, int]:
-        """Lookup correct entry for requested imageNumber"""
-        with h5py.File(path, "r") as h5file:
-            dset_content = h5grove.create_content(h5file, "/entry/data")
-            for child in dset_content.metadata()["children"]:
-                child_path = "/entry/data/" + child["name"]
-                image_nr_low = _get_dataset_attr(h5file, child_path)["image_nr_low"]
-                image_nr_high = _get_dataset_attr(h5file, child_path)["image_nr_high"]
-
-                if imageNumber >= image_nr_low and imageNumber <= image_nr_high:
-                    image_index = imageNumber - image_nr_low.item()
-                    logger.info(
-                        f"Found imageNumber `{imageNumber}` in `{path}` with path `{child_path}` index `{image_index}`"
+    def _get_index(h5file: h5py.File, path: str) -> HDF5ImageIndex:
+        """The image index of each master file is cached by path and modification time"""
+        return _h5indexes.get_or_set(
+            (path, os.stat(path).st_mtime_ns),
+            lambda: HDF5ImageIndex.from_file(h5file),
+        )
+
+    @staticmethod
+    def read_frames(
+        path: str, start: int, end: int, max_bytes: int = 64 * 1024**2
+    ) -> Generator[np.ndarray, Any, None]:
+        """Read images `start` to `end` (inclusive) as blocks of consecutive images
+
+        Each block is read as a single hyperslab and is at most `max_bytes`
+        """
+        with _h5files.open(path) as h5file:
+            index = HDF5FormatHandler._get_index(h5file, path)
+            imageNumber = start
+            while imageNumber <= end:
+                child_path, image_index = index.find(imageNumber)
+                if not child_path:
+                    raise FileNotFoundError(
+                        f"Could not find imageNumber `{imageNumber}` in `{path}`"
                     )
 
-                    return child_path, image_index
+                dataset = h5file[child_path]
+                frame_bytes = max(
+                    dataset.dtype.itemsize * math.prod(dataset.shape[1:]), 1
+                )
+                count = min(
+                    end - imageNumber + 1,
+                    index.last_image_number(imageNumber) - imageNumber + 1,
+                    max(max_bytes // frame_bytes, 1),
+                )
+                yield dataset[image_index : image_index + count]
+                imageNumber += count
+
+    @staticmethod
+    def _find_path(
+        h5file: h5py.File, path: str, imageNumber: int
+    ) -> Tuple[Optional[str], Optional[int]]:
+        """Lookup correct entry for requested imageNumber"""
+        index = HDF5FormatHandler._get_index(h5file, path)
+        child_path, image_index = index.find(imageNumber)
+        if child_path:
+            logger.info(
+                f"Found imageNumber `{imageNumber}` in `{path}` with path `{child_path}` index `{image_index}`"
+            )
+            return child_path, image_index
 
         logger.warning(
-            f"Could not find requested imageNumber `{imageNumber}` in `{path}` (max imageNumber `{image_nr_high}`)"
+            f"Could not find requested imageNumber `{imageNumber}` in `{path}` (max imageNumber `{index.max_image_number}`)"
         )
         return None, None
 
@@ -265,21 +1324,73 @@ def _get_instrument_param(h5file: h5py.File, param_path: str):
     return data.item()
 
 
-def _compute_histogram(data: np.ndarray) -> Tuple[np.ndarray, list]:
-    std = 3 * np.std(data)
-    mean = np.mean(data)
-    clean_data = data[data < mean + std]
+def _get_array_stats(np_array: np.ndarray) -> dict:
+    """h5grove array statistics, always as floats whatever the image type"""
+    return {
+        key: float(value) if value is not None else None
+        for key, value in get_array_stats(np_array).items()
+    }
 
-    if clean_data.size == 0:
-        return np.ndarray([]), []
 
-    hist, bins = np.histogram(
-        clean_data.flatten(),
-        bins=np.arange(np.min(clean_data), np.max(clean_data), 1)
-        if np.max(clean_data) <= 300
-        else 300,
-    )
-    return hist, bins.tolist()
+def _compute_histogram(
+    data: np.ndarray,
+    sample_step: int = 4,
+    max_bins: int = 300,
+    block_rows: int = 256,
+) -> Tuple[np.ndarray, list]:
+    """Histogram of an image excluding outliers
+
+    Outliers (values above mean + 3 std) and the histogram range are estimated from a
+    strided sample of the image. Counts are then accumulated in one pass over blocks of
+    rows in the image's native type so only block sized temporaries are allocated.
+    Integer images with a range of at most `max_bins` values have one bin per value,
+    otherwise `max_bins` equal width bins are used.
+
+    Returns:
+        (counts, edges): The counts per bin and the bin edges
+    """
+    if data.ndim == 1:
+        data = data.reshape(1, -1)
+
+    sample = data[::sample_step, ::sample_step]
+    if sample.size == 0:
+        return np.array([], dtype=np.int64), []
+
+    cutoff = sample.mean(dtype=np.float64) + 3 * sample.std(dtype=np.float64)
+    clean_sample = sample[sample < cutoff]
+    if clean_sample.size == 0:
+        return np.array([], dtype=np.int64), []
+
+    low, high = clean_sample.min().item(), clean_sample.max().item()
+    unit_bins = data.dtype.kind in "iu" and high - low < max_bins
+    if unit_bins:
+        bins = high - low + 1
+        edges = np.arange(low, high + 2)
+        scale = 1
+    else:
+        bins = max_bins
+        edges = np.linspace(low, high, bins + 1)
+        scale = bins / (high - low) if high > low else 0
+
+    counts = np.zeros(bins, dtype=np.int64)
+    for start in range(0, data.shape[0], block_rows):
+        block = data[start : start + block_rows]
+        selected = block[(block >= low) & (block <= high)]
+        if unit_bins:
+            indexes = (selected - low).astype(np.intp, copy=False)
+        else:
+            indexes = ((selected - low) * scale).astype(np.intp)
+            np.minimum(indexes, bins - 1, out=indexes)
+            # Correct rounding at the bin edges as `np.histogram` does
+            indexes -= selected < edges[indexes]
+            indexes += (selected >= edges[indexes + 1]) & (indexes < bins - 1)
+        counts += np.bincount(indexes, minlength=bins)
+
+    return counts, edges.tolist()
+
+
+def _is_hdf5(file_path: str) -> bool:
+    return get_file_ext(file_path) in ["h5", "H5", "hdf5", "HDF5"]
 
 
 def get_file_ext(file_name: str):
@@ -319,9 +1430,49 @@ def get_h5_file(
     return None
 
 
+_h5_paths = TTLCache[str](ttl=settings.h5_path_cache_ttl, max_entries=4096)
+metrics.register("h5_paths", _h5_paths.stats)
+
+
 def get_h5_path_mapped(**kwargs) -> str:
+    """Find the relevant hdf5 file from the parameters, mapped with `path_map`
+
+    Resolved files are cached per user (and permissions) for `h5_path_cache_ttl`
+    seconds as viewers make many requests for the same file
+    """
+    key = (
+        g.personId,
+        tuple(sorted(g.permissions or [])),
+        tuple(sorted(kwargs.items())),
+    )
+    return _h5_paths.get_or_set(key, lambda: _get_h5_path_mapped(**kwargs))
+
+
+def _get_h5_path_mapped(**kwargs) -> str:
     file_path = get_h5_file(**kwargs)
     if file_path:
         if settings.path_map:
             return settings.path_map + file_path
         return file_path
+
+
+@contextlib.contextmanager
+def get_h5_content(
+    file_path: str,
+    path: Optional[str],
+    create_error: Callable[[int, str], Exception],
+    resolve_links: LinkResolution = LinkResolution.ONLY_VALID,
+) -> Generator[Any, Any, None]:
+    """h5grove `get_content_from_file` using the pool of open files"""
+    if not os.path.exists(file_path):
+        raise create_error(404, "File not found")
+    if not os.access(file_path, os.R_OK):
+        raise create_error(403, "Cannot read file: Permission denied")
+
+    with _h5files.open(file_path) as h5file:
+        try:
+            yield h5grove.create_content(h5file, path, resolve_links)
+        except NotFoundError as e:
+            raise create_error(404, str(e))
+        except QueryArgumentError as e:
+            raise create_error(422, str(e))
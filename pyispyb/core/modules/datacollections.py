@@ -8,7 +8,13 @@ from ispyb import models
 from ...app.extensions.database.definitions import (
     with_authorization,
 )
-from ...app.extensions.database.utils import Paged, page, with_metadata
+from ...app.extensions.database.utils import (
+    Paged,
+    page,
+    count_total,
+    has_more,
+    with_metadata,
+)
 from ...app.extensions.database.middleware import db
 from .events import get_events
 from ..schemas import datacollections as schema
@@ -166,7 +172,7 @@ def get_datacollection_attachments(
 
     query = with_authorization(query, joinBLSession=False)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -208,11 +214,15 @@ def get_per_image_analysis(
         )
 
     query = with_authorization(query, joinBLSession=False)
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
-    total = query.count()
+    rows = query.all()
+    # The rows are collapsed into a single result, so consume any extra row
+    # fetched by `page` here
+    hasMore = has_more(len(rows), skip=skip, limit=limit, total=total)
 
     results = {"dataCollectionId": dataCollectionId}
-    for row in [r._asdict() for r in query.all()]:
+    for row in [r._asdict() for r in rows[:limit]]:
         for key in [
             "imageNumber",
             "totalIntegratedSignal",
@@ -224,7 +234,9 @@ def get_per_image_analysis(
             if row[key] is not None:
                 results[key].append(row[key])
 
-    return Paged(total=total, results=[results], skip=skip, limit=limit)
+    return Paged(
+        total=total, results=[results], skip=skip, limit=limit, hasMore=hasMore
+    )
 
 
 def get_workflow_steps(
@@ -249,7 +261,7 @@ def get_workflow_steps(
 
     query = with_authorization(query, joinBLSession=False)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = query.all()
 
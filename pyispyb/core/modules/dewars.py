@@ -5,7 +5,13 @@ from sqlalchemy.orm import joinedload
 from ispyb import models
 
 from ...app.extensions.database.definitions import with_authorization
-from ...app.extensions.database.utils import Paged, page, update_model, with_metadata
+from ...app.extensions.database.utils import (
+    Paged,
+    page,
+    count_total,
+    update_model,
+    with_metadata,
+)
 from ...app.extensions.database.middleware import db
 from ..schemas import dewars as schema
 
@@ -46,7 +52,7 @@ def get_dewars(
     if withAuthorization:
         query = with_authorization(query)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
+from datetime import datetime
 import enum
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Union
 import os
 from fastapi import HTTPException
 
@@ -15,7 +16,14 @@ from ...app.extensions.database.definitions import (
     _session,
     _proposal,
 )
-from ...app.extensions.database.utils import Paged, page
+from ...app.extensions.database.utils import (
+    Paged,
+    page,
+    count_total,
+    encode_cursor,
+    decode_cursor,
+    has_more,
+)
 from ...app.extensions.database.middleware import db
 from ..schemas import events as schema
 from ...config import settings
@@ -86,6 +94,56 @@ def with_sample(
     return query
 
 
+def _decode_event_cursor(cursor: str) -> tuple[Optional[datetime], str, int]:
+    """Decode a `(startTime, type, id)` events cursor"""
+    try:
+        startTime, type, id = decode_cursor(cursor)
+        return (
+            datetime.fromisoformat(startTime) if startTime is not None else None,
+            str(type),
+            int(id),
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_cursor(
+    query: "sqlalchemy.orm.Query[Any]",
+    type: str,
+    startTime: "sqlalchemy.Column[Any]",
+    id: "sqlalchemy.Column[Any]",
+    cursor: tuple[Optional[datetime], str, int],
+    aggregate: bool = False,
+) -> "sqlalchemy.orm.Query[Any]":
+    """Filter a single event type to rows after the cursor
+
+    Events are ordered by `startTime DESC, type DESC, id DESC` (null `startTime`s last), as
+    `type` is constant for each query the comparison on it can be resolved here
+
+    Kwargs:
+        aggregate: whether `startTime` and `id` are aggregates and need filtering in `HAVING`
+    """
+    cursor_startTime, cursor_type, cursor_id = cursor
+    if cursor_startTime is None:
+        if type > cursor_type:
+            condition = sqlalchemy.false()
+        elif type == cursor_type:
+            condition = sqlalchemy.and_(startTime.is_(None), id < cursor_id)
+        else:
+            condition = startTime.is_(None)
+    else:
+        conditions = [startTime < cursor_startTime, startTime.is_(None)]
+        if type == cursor_type:
+            conditions.append(
+                sqlalchemy.and_(startTime == cursor_startTime, id < cursor_id)
+            )
+        elif type < cursor_type:
+            conditions.append(startTime == cursor_startTime)
+        condition = or_(*conditions)
+
+    return query.having(condition) if aggregate else query.filter(condition)
+
+
 class EventStatus(str, enum.Enum):
     success = "success"
     failed = "failed"
@@ -108,7 +166,18 @@ def get_events(
     proteinId: Optional[int] = None,
     status: Optional[EventStatus] = None,
     eventType: Optional[str] = None,
+    cursor: Optional[str] = None,
+    checkSnapshots: bool = True,
 ) -> Paged[schema.Event]:
+    """Get a list of events
+
+    Pages either with `skip` or with a `cursor` from a previous page's `nextCursor`,
+    the total is not counted when paging by cursor
+
+    Kwargs:
+        checkSnapshots: check whether data collection snapshots exist on disk, if
+            False the snapshot statuses are left empty for `check_snapshots`
+    """
     queries = {}
 
     _dataCollectionId = models.DataCollection.dataCollectionId
@@ -436,19 +505,63 @@ def get_events(
         for key, query_filter in filters.items():
             queries[key] = query_filter
 
+    # Seek each query to the cursor so only the next page of each needs sorting
+    if cursor:
+        position = _decode_event_cursor(cursor)
+        sort_columns = {
+            "dc": (startTime, _dataCollectionId),
+            "robot": (
+                models.RobotAction.startTimestamp,
+                models.RobotAction.robotActionId,
+            ),
+            "xrf": (
+                models.XFEFluorescenceSpectrum.startTime,
+                models.XFEFluorescenceSpectrum.xfeFluorescenceSpectrumId,
+            ),
+            "es": (models.EnergyScan.startTime, models.EnergyScan.energyScanId),
+        }
+        for key, (startColumn, idColumn) in sort_columns.items():
+            queries[key] = (
+                _after_cursor(
+                    queries[key],
+                    key,
+                    startColumn,
+                    idColumn,
+                    position,
+                    aggregate=key == "dc" and dataCollectionGroupId is None,
+                )
+                .order_by(sqlalchemy.desc("startTime"), sqlalchemy.desc("id"))
+                .limit(limit + 1)
+            )
+
     # Now union the four queries
     query: sqlalchemy.orm.Query[Any] = queries["dc"].union(
         queries["robot"], queries["xrf"], queries["es"]
     )
 
-    total = query.count()
-    query = query.order_by(sqlalchemy.desc("startTime"))
-    query = page(query, skip=skip, limit=limit)
+    total = None if cursor else count_total(query)
+    query = query.order_by(
+        sqlalchemy.desc("startTime"), sqlalchemy.desc("type"), sqlalchemy.desc("id")
+    )
+    if cursor:
+        query = query.limit(limit + 1)
+    else:
+        query = page(query, skip=skip, limit=limit)
 
     # Results contains an index of type / id
     results = query.all()
     results = [r._asdict() for r in results]
 
+    hasMore = has_more(len(results), skip=skip, limit=limit, total=total)
+    results = results[:limit]
+    nextCursor = (
+        encode_cursor(
+            [results[-1]["startTime"], results[-1]["type"], results[-1]["id"]]
+        )
+        if hasMore and results
+        else None
+    )
+
     # Build a  list of ids to load based on type, i.e. a list of `dataCollectionId`s
     entity_ids: dict[str, list[int]] = {}
     for result in results:
@@ -491,13 +604,52 @@ def get_events(
                     result["Item"] = entity_type_map[entity_type_name][result["id"]]
 
                     if entity_type_name == "dc":
-                        _check_snapshots(result["Item"])
+                        if checkSnapshots:
+                            _check_snapshots(result["Item"])
+                        else:
+                            result["Item"]._metadata["snapshots"] = {}
 
-    return Paged(total=total, results=results, skip=skip, limit=limit)
+    return Paged(
+        total=total,
+        results=results,
+        skip=skip,
+        limit=limit,
+        nextCursor=nextCursor,
+        hasMore=hasMore,
+    )
 
 
-def _check_snapshots(datacollection: models.DataCollection) -> models.DataCollection:
-    snapshot_statuses = {}
+def get_snapshot_paths(
+    events: Paged[schema.Event],
+) -> dict[int, dict[Union[int, str], Optional[str]]]:
+    """Get the snapshot paths of each data collection event, by `dataCollectionId`
+
+    Only reads the loaded data collections, so can run on the database session
+    while the filesystem checks in `check_snapshots` run elsewhere
+    """
+    return {
+        result["id"]: _snapshot_paths(result["Item"])
+        for result in events.results
+        if result["type"] == "dc" and "Item" in result
+    }
+
+
+def check_snapshots(
+    events: Paged[schema.Event],
+    paths: dict[int, dict[Union[int, str], Optional[str]]],
+) -> Paged[schema.Event]:
+    """Check whether the snapshots from `get_snapshot_paths` exist on disk"""
+    for event in events.results:
+        if event.type == "dc" and event.id in paths:
+            event.Item.metadata.snapshots = _snapshot_statuses(paths[event.id])
+
+    return events
+
+
+def _snapshot_paths(
+    datacollection: models.DataCollection,
+) -> dict[Union[int, str], Optional[str]]:
+    paths = {}
     for i, snapshot in enumerate(
         [
             "xtalSnapshotFullPath1",
@@ -507,22 +659,24 @@ def _check_snapshots(datacollection: models.DataCollection) -> models.DataCollec
         ]
     ):
         snapshot_path = getattr(datacollection, snapshot)
-        if snapshot_path:
-            if settings.path_map:
-                snapshot_path = settings.path_map + snapshot_path
-            snapshot_statuses[i + 1] = (
-                os.path.exists(snapshot_path) if snapshot_path is not None else False
-            )
-        else:
-            snapshot_statuses[i + 1] = False
+        if snapshot_path and settings.path_map:
+            snapshot_path = settings.path_map + snapshot_path
+        paths[i + 1] = snapshot_path or None
 
-    datacollection._metadata["snapshots"] = snapshot_statuses
+    paths["analysis"] = getattr(datacollection, "imageQualityIndicatorsPlotPath", None)
+    return paths
 
-    analysis = False
-    if hasattr(datacollection, "imageQualityIndicatorsPlotPath"):
-        if datacollection.imageQualityIndicatorsPlotPath:
-            analysis = os.path.exists(datacollection.imageQualityIndicatorsPlotPath)
-    datacollection._metadata["snapshots"]["analysis"] = analysis
+
+def _snapshot_statuses(
+    paths: dict[Union[int, str], Optional[str]]
+) -> dict[Union[int, str], bool]:
+    return {key: os.path.exists(path) if path else False for key, path in paths.items()}
+
+
+def _check_snapshots(datacollection: models.DataCollection) -> models.DataCollection:
+    datacollection._metadata["snapshots"] = _snapshot_statuses(
+        _snapshot_paths(datacollection)
+    )
 
     # diffraction_row: models.Image = (
     #     db.session.query(models.Image)
@@ -4,7 +4,7 @@ from sqlalchemy.orm import joinedload
 from ispyb import models
 
 from ...app.extensions.database.definitions import with_authorization
-from ...app.extensions.database.utils import Paged, page, update_model
+from ...app.extensions.database.utils import Paged, page, count_total, update_model
 from ...app.extensions.database.middleware import db
 from ..schemas import labcontacts as schema
 from .proposals import get_proposals
@@ -40,7 +40,7 @@ def get_labcontacts(
     if withAuthorization:
         query = with_authorization(query)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
 
     return Paged(total=total, results=query.all(), skip=skip, limit=limit)
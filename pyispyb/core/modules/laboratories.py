@@ -1,6 +1,6 @@
 from typing import Optional
 from ispyb import models
-from pyispyb.app.extensions.database.utils import Paged, page
+from pyispyb.app.extensions.database.utils import Paged, page, count_total
 from pyispyb.app.extensions.database.middleware import db
 from pyispyb.core.schemas import laboratories as schema
 
@@ -31,7 +31,7 @@ def get_laboratories(
     if laboratoryExtPk:
         query = query.filter(models.Laboratory.laboratoryExtPk == laboratoryExtPk)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
 
     return Paged(total=total, results=query.all(), skip=skip, limit=limit)
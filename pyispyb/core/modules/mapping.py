@@ -1,18 +1,24 @@
+import functools
+import hashlib
 import io
 import gzip
 import json
+import math
+from typing import Any, Optional
+import warnings
 
-import matplotlib as mpl
 import matplotlib.cm as cm
 import numpy as np
 from PIL import Image
 from sqlalchemy import func, or_
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import defer, joinedload
 from ispyb import models
 
 from ...config import settings
+from ...app.utils import metrics
+from ...app.utils.cache import LRUCache
 from ...app.extensions.database.definitions import with_authorization
-from ...app.extensions.database.utils import Paged, page, with_metadata
+from ...app.extensions.database.utils import Paged, page, count_total, with_metadata
 from ...app.extensions.database.middleware import db
 from ..schemas import mapping as schema
 
@@ -21,12 +27,23 @@ def get_maps(
     skip: int,
     limit: int,
     xrfFluorescenceMappingId: int = None,
+    xrfFluorescenceMappingIds: list[int] = None,
     dataCollectionId: int = None,
     dataCollectionGroupId: int = None,
     blSampleId: int = None,
     blSubSampleId: int = None,
     withAuthorization: bool = True,
+    withData: bool = False,
+    withDataHash: bool = False,
 ) -> Paged[models.XRFFluorescenceMapping]:
+    """Get a list of maps
+
+    Kwargs:
+        withData (bool): Load the map `data`, otherwise it is deferred and only loaded
+                         if accessed
+        withDataHash (bool): Include the md5 of the map `data`, computed by the
+                             database, as `dataHash` in the map metadata
+    """
     metadata = {
         "url": func.concat(
             f"{settings.api_root}/mapping/",
@@ -36,6 +53,8 @@ def get_maps(
         "blSampleId": models.DataCollectionGroup.blSampleId,
         "dataCollectionId": models.DataCollection.dataCollectionId,
     }
+    if withDataHash:
+        metadata["dataHash"] = func.md5(models.XRFFluorescenceMapping.data)
 
     query = (
         db.session.query(models.XRFFluorescenceMapping, *metadata.values())
@@ -51,12 +70,22 @@ def get_maps(
         .order_by(models.XRFFluorescenceMapping.xrfFluorescenceMappingId)
     )
 
+    if not withData:
+        query = query.options(defer(models.XRFFluorescenceMapping.data))
+
     if xrfFluorescenceMappingId:
         query = query.filter(
             models.XRFFluorescenceMapping.xrfFluorescenceMappingId
             == xrfFluorescenceMappingId
         )
 
+    if xrfFluorescenceMappingIds:
+        query = query.filter(
+            models.XRFFluorescenceMapping.xrfFluorescenceMappingId.in_(
+                xrfFluorescenceMappingIds
+            )
+        )
+
     if dataCollectionId:
         query = query.filter(models.DataCollection.dataCollectionId == dataCollectionId)
 
@@ -80,7 +109,7 @@ def get_maps(
     if withAuthorization:
         query = with_authorization(query, joinBLSession=False)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -116,13 +145,73 @@ def get_map_rois(
     if withAuthorization:
         query = with_authorization(query)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = query.all()
 
     return Paged(total=total, results=results, skip=skip, limit=limit)
 
 
+_maps = LRUCache[np.ndarray](
+    max_bytes=settings.map_cache_size * 1024**2, sizeof=lambda data: data.nbytes
+)
+_histograms = LRUCache[dict](
+    max_bytes=4 * 1024**2, sizeof=lambda histogram: 1024 + 24 * len(histogram["bins"])
+)
+metrics.register(
+    "maps", lambda: {"data": _maps.stats(), "histograms": _histograms.stats()}
+)
+
+
+def _map_key(map_: schema.Map) -> tuple[Any, ...]:
+    """Cache key of a map, its id, a hash of its data, and its shape
+
+    Uses the `dataHash` from `get_maps(withDataHash=True)` if available so the data
+    itself does not need to be loaded, otherwise the data is hashed
+    """
+    data_hash = getattr(map_, "_metadata", {}).get("dataHash")
+    if data_hash is None:
+        data = map_.data
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = json.dumps(data).encode()
+        data_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    return (
+        map_.xrfFluorescenceMappingId,
+        data_hash,
+        map_.dataFormat,
+        map_.GridInfo.steps_x,
+        map_.GridInfo.steps_y,
+        map_.GridInfo.orientation,
+        map_.GridInfo.snaked,
+    )
+
+
+def get_map_data(map_: schema.Map) -> np.ndarray:
+    """Get the shaped map data
+
+    Maps are decoded once and cached, the returned array is read only
+    """
+
+    def decode() -> np.ndarray:
+        data = shape_map(map_)
+        data.flags.writeable = False
+        return data
+
+    return _maps.get_or_set(_map_key(map_), decode)
+
+
+def get_map_pixel(map_: schema.Map, x: int, y: int) -> Optional[float]:
+    """Get the value of a map pixel, or None if outside of the map"""
+    if x is None or y is None:
+        return None
+
+    data = get_map_data(map_)
+    if 0 <= y < data.shape[0] and 0 <= x < data.shape[1]:
+        return data[y, x].item()
+    return None
+
+
 def shape_map(map_: schema.Map) -> np.ndarray:
     """Shapes a 1d map array into the correct 2d image
 
@@ -132,11 +221,7 @@ def shape_map(map_: schema.Map) -> np.ndarray:
     Returns:
         data (ndarray): The XRF map data
     """
-    if map_.dataFormat == "json+gzip":
-        data = gunzip_json(map_.data)
-        data = np.array(data)
-    else:
-        data = np.array(map_.data)
+    data = decode_map_data(map_.data, map_.dataFormat)
 
     # TODO: Catch raise
     if map_.GridInfo.orientation == "vertical":
@@ -148,54 +233,298 @@ def shape_map(map_: schema.Map) -> np.ndarray:
 
     # For snaked collection every other row is reversed
     if map_.GridInfo.snaked:
+        if not data.flags.writeable:
+            data = data.copy()
         data[1::2, :] = data[1::2, ::-1]
 
     return data
 
 
-def generate_map_image(map_: schema.Map, image_format: str = "PNG") -> io.BytesIO:
-    """Generates a PIL Image from an XRF map
+# Binary `dataFormat`s and their (little endian) types. Suffixed with `+gzip` the
+# bytes are shuffled (all first bytes of each value, then second...) then gzipped.
+# `hdf5plugin.Zstd` is only available as an HDF5 filter (see `compress_chunk`), and
+# other clients of the database can decode gzip with their standard library
+BINARY_FORMATS = {
+    "float32": np.dtype("<f4"),
+    "float64": np.dtype("<f8"),
+    "int32": np.dtype("<i4"),
+}
+
+
+def decode_map_data(data: Any, dataFormat: str) -> np.ndarray:
+    """Decode map data stored as `dataFormat`
+
+    Uncompressed binary formats are read without copying so the array is read only
+    """
+    if dataFormat == "json+gzip":
+        return np.array(gunzip_json(data))
+
+    binary_format, _, compression = (dataFormat or "").partition("+")
+    if binary_format in BINARY_FORMATS and compression in ["", "gzip"]:
+        if not data:
+            return np.array([], dtype=BINARY_FORMATS[binary_format])
+        dtype = BINARY_FORMATS[binary_format]
+        if compression == "gzip":
+            shuffled = np.frombuffer(gzip.decompress(data), dtype=np.uint8)
+            return shuffled.reshape(dtype.itemsize, -1).T.copy().view(dtype).ravel()
+        return np.frombuffer(data, dtype=dtype)
+
+    return np.array(data)
+
+
+def encode_map_data(data: np.ndarray, dataFormat: str) -> bytes:
+    """Encode a 1d map array as a binary `dataFormat`, i.e. `float32+gzip`"""
+    binary_format, _, compression = dataFormat.partition("+")
+    if binary_format not in BINARY_FORMATS or compression not in ["", "gzip"]:
+        raise ValueError(f"Unsupported binary map format `{dataFormat}`")
+
+    array = np.ascontiguousarray(data, dtype=BINARY_FORMATS[binary_format])
+    if compression == "gzip":
+        shuffled = array.view(np.uint8).reshape(-1, array.itemsize).T.tobytes()
+        return gzip.compress(shuffled, compresslevel=6)
+    return array.tobytes()
+
+
+_images = LRUCache[bytes](
+    max_bytes=settings.map_image_cache_size * 1024**2, sizeof=len
+)
+metrics.register("map_images", _images.stats)
+
+
+@functools.lru_cache(maxsize=32)
+def get_colourmap_lut(colourMap: Optional[str]) -> np.ndarray:
+    """A 256 entry RGBA lookup table for a matplotlib colour map, `viridis` if unknown"""
+    if not colourMap or not hasattr(cm, colourMap):
+        colourMap = "viridis"
+
+    lut = getattr(cm, colourMap)(np.linspace(0, 1, 256), bytes=True)
+    lut.flags.writeable = False
+    return lut
+
+
+def colourise(
+    data: np.ndarray,
+    lut: np.ndarray,
+    vmin: Optional[float] = None,
+    vmax: Optional[float] = None,
+    opacity: Optional[float] = None,
+) -> np.ndarray:
+    """Map data to RGBA through a colour map lookup table
+
+    Values are scaled linearly from `vmin` to `vmax` (the data range if not set) and
+    clipped. -1 placeholder and NaN values are converted to a transparent pixel, the
+    alpha of other pixels is scaled by `opacity`
+    """
+    invalid = (data == -1) | np.isnan(data)
+    if vmin is None or vmax is None:
+        valid = data[~invalid] if invalid.any() else data
+        vmin = (valid.min() if valid.size else 0) if vmin is None else vmin
+        vmax = (valid.max() if valid.size else 0) if vmax is None else vmax
+
+    scale = 256 / (vmax - vmin) if vmax > vmin else 0
+    with np.errstate(invalid="ignore"):
+        index = np.clip(np.nan_to_num((data - vmin) * scale), 0, 255)
+    rgba = lut.take(index.astype(np.uint8), axis=0)
+
+    if opacity is not None:
+        rgba[..., 3] = (rgba[..., 3] * min(max(opacity, 0), 1)).astype(np.uint8)
+    rgba[invalid] = [255, 255, 255, 0]
+    return rgba
+
+
+def encode_image(rgba: np.ndarray, image_format: schema.MapImageFormat) -> bytes:
+    """Encode an RGBA image, favouring encoding speed over size"""
+    image = Image.fromarray(rgba, "RGBA")
+    img_io = io.BytesIO()
+    if image_format == schema.MapImageFormat.webp:
+        image.save(img_io, "WEBP", lossless=True, method=0)
+    else:
+        image.save(img_io, "PNG", compress_level=1)
+    return img_io.getvalue()
+
+
+def _image_key(
+    map_: schema.Map,
+    image_format: schema.MapImageFormat,
+    colourMap: Optional[str],
+    vmin: Optional[float],
+    vmax: Optional[float],
+    opacity: Optional[float],
+) -> tuple[Any, ...]:
+    return (
+        _map_key(map_),
+        colourMap or map_.colourMap,
+        map_.min if vmin is None else vmin,
+        map_.max if vmax is None else vmax,
+        opacity,
+        image_format,
+    )
+
 
-    -1 placeholder values are converted to a transparent pixel
+def get_map_image_etag(
+    map_: schema.Map,
+    image_format: schema.MapImageFormat = schema.MapImageFormat.png,
+    colourMap: Optional[str] = None,
+    vmin: Optional[float] = None,
+    vmax: Optional[float] = None,
+    opacity: Optional[float] = None,
+) -> str:
+    """ETag of a map image, changes with the map data or any of the image parameters"""
+    key = _image_key(map_, image_format, colourMap, vmin, vmax, opacity)
+    return f'"{hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()}"'
+
+
+def generate_map_image(
+    map_: schema.Map,
+    image_format: schema.MapImageFormat = schema.MapImageFormat.png,
+    colourMap: Optional[str] = None,
+    vmin: Optional[float] = None,
+    vmax: Optional[float] = None,
+    opacity: Optional[float] = None,
+) -> bytes:
+    """Generates an image from an XRF map
+
+    -1 placeholder values are converted to a transparent pixel. `colourMap`, `vmin`,
+    and `vmax` default to those of the map. Rendered images are cached
 
     Returns:
-        image (io.Bytes): Bytes of PIL Image
+        image (bytes): The encoded image
     """
-    data = shape_map(map_)
-    norm = mpl.colors.Normalize(vmin=map_.min, vmax=map_.max)
+    key = _image_key(map_, image_format, colourMap, vmin, vmax, opacity)
 
-    colourmap = map_.colourMap or "viridis"
-    if not hasattr(cm, colourmap):
-        colourmap = "viridis"
+    def render() -> bytes:
+        rgba = colourise(
+            get_map_data(map_), get_colourmap_lut(key[1]), key[2], key[3], opacity
+        )
+        return encode_image(rgba, image_format)
 
-    cmap = getattr(cm, colourmap or "viridis")
+    return _images.get_or_set(key, render)
 
-    m = cm.ScalarMappable(norm=norm, cmap=cmap)
-    img_data = m.to_rgba(data, bytes=True)
 
-    mask = data == -1
-    img_data[mask, :] = [255, 255, 255, 0]
+def get_sprite_layout(maps: list[schema.Map]) -> list[dict[str, int]]:
+    """Position of each map in a sprite sheet
+
+    Maps are placed left to right, top to bottom, in a square grid of cells the size
+    of the largest map
+    """
+    shapes = [get_map_data(map_).shape for map_ in maps]
+    columns = math.ceil(math.sqrt(len(maps)))
+    cell_height = max(shape[0] for shape in shapes)
+    cell_width = max(shape[1] for shape in shapes)
+    return [
+        {
+            "xrfFluorescenceMappingId": map_.xrfFluorescenceMappingId,
+            "x": (position % columns) * cell_width,
+            "y": (position // columns) * cell_height,
+            "width": shape[1],
+            "height": shape[0],
+        }
+        for position, (map_, shape) in enumerate(zip(maps, shapes))
+    ]
+
+
+def generate_map_sprite(
+    maps: list[schema.Map],
+    image_format: schema.MapImageFormat = schema.MapImageFormat.png,
+) -> bytes:
+    """Render maps with their own colour map and range into a single image
+
+    Maps are positioned as given by `get_sprite_layout`, the sprite sheet is cached
+    """
+
+    def render() -> bytes:
+        layout = get_sprite_layout(maps)
+        height = max(position["y"] + position["height"] for position in layout)
+        width = max(position["x"] + position["width"] for position in layout)
+        sprite = np.zeros((height, width, 4), dtype=np.uint8)
+        for map_, position in zip(maps, layout):
+            sprite[
+                position["y"] : position["y"] + position["height"],
+                position["x"] : position["x"] + position["width"],
+            ] = colourise(
+                get_map_data(map_),
+                get_colourmap_lut(map_.colourMap),
+                map_.min,
+                map_.max,
+            )
+        return encode_image(sprite, image_format)
+
+    key = (
+        "sprite",
+        tuple(_image_key(map_, image_format, None, None, None, None) for map_ in maps),
+    )
+    return _images.get_or_set(key, render)
 
-    image = Image.fromarray(img_data, "RGBA")
-    img_io = io.BytesIO()
-    image.save(img_io, image_format, quality=100)
-    img_io.seek(0)
 
-    return img_io
+def generate_map_composite(
+    maps: list[schema.Map],
+    image_format: schema.MapImageFormat = schema.MapImageFormat.png,
+) -> bytes:
+    """Render up to three maps of the same shape as the red, green, and blue channels
+
+    Each map is scaled over its own range, pixels that are -1 placeholders in all maps
+    are transparent. The composite is cached
+    """
+
+    def render() -> bytes:
+        data = np.stack([get_map_data(map_) for map_ in maps]).astype(np.float32)
+        invalid = (data == -1) | np.isnan(data)
+        valid = np.where(invalid, np.nan, data)
+
+        # Fill in the range of each map from its data if not set
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            data_min = np.nanmin(valid, axis=(1, 2))
+            data_max = np.nanmax(valid, axis=(1, 2))
+        vmin = np.array(
+            [m.min if m.min is not None else v for m, v in zip(maps, data_min)]
+        )
+        vmax = np.array(
+            [m.max if m.max is not None else v for m, v in zip(maps, data_max)]
+        )
+        vmin, vmax = (
+            np.nan_to_num(vmin)[:, None, None],
+            np.nan_to_num(vmax)[:, None, None],
+        )
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scaled = np.where(vmax > vmin, (valid - vmin) * (255 / (vmax - vmin)), 0)
+        channels = np.clip(np.nan_to_num(scaled), 0, 255).astype(np.uint8)
+
+        rgba = np.zeros(data.shape[1:] + (4,), dtype=np.uint8)
+        rgba[..., : len(maps)] = np.moveaxis(channels, 0, -1)
+        rgba[..., 3] = np.where(invalid.all(axis=0), 0, 255)
+        return encode_image(rgba, image_format)
+
+    if len(maps) > 3:
+        raise ValueError("At most three maps can be composited")
+    if len({get_map_data(map_).shape for map_ in maps}) > 1:
+        raise ValueError("Composited maps must have the same shape")
+
+    key = (
+        "composite",
+        tuple(_image_key(map_, image_format, None, None, None, None) for map_ in maps),
+    )
+    return _images.get_or_set(key, render)
 
 
 def generate_histogram(map_):
     """Generates a histogram of map data
 
+    Histograms are cached with the map data
+
     Args:
         map_(dict): An XRF map from the metadata handler
 
     Returns:
         data: (dict(list)): The histogram, bins, and widths
     """
-    data = shape_map(map_)
-    ndata = np.array(data)
-    rdata = np.where(ndata == -1, 0, ndata)
+    return _histograms.get_or_set(_map_key(map_), lambda: _compute_histogram(map_))
+
+
+def _compute_histogram(map_) -> dict:
+    data = get_map_data(map_)
+    rdata = np.where(data == -1, 0, data)
 
     try:
         hist, bins = np.histogram(rdata, bins=50)
@@ -6,7 +6,7 @@ from ispyb import models
 
 from pyispyb.dependencies import has_permission
 
-from ...app.extensions.database.utils import Paged, page, with_metadata
+from ...app.extensions.database.utils import Paged, page, count_total, with_metadata
 from ...app.extensions.database.middleware import db
 from ...core.modules.utils import encode_external_id
 from ...app.extensions.database.definitions import with_authorization
@@ -109,7 +109,7 @@ def get_persons(
                 )
                 query = with_authorization(query)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -4,7 +4,7 @@ from sqlalchemy.orm import contains_eager
 from ispyb import models
 
 from ...config import settings
-from ...app.extensions.database.utils import Paged, page, with_metadata
+from ...app.extensions.database.utils import Paged, page, count_total, with_metadata
 from ...app.extensions.database.definitions import (
     with_authorization,
 )
@@ -280,9 +280,8 @@ def get_processing_messages(
         .union_all(queries["processing"])
         .group_by(models.AutoProcProgramMessage.autoProcProgramMessageId)
     )
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
-
-    total = query.count()
     return Paged(total=total, results=query.all(), skip=skip, limit=limit)
 
 
@@ -356,9 +355,10 @@ def get_screening_results(
 
     query = with_authorization(query, joinBLSession=False)
 
-    total = query.count()
+    total = count_total(query)
     results = query.all()
-    return Paged(total=total, results=results, skip=skip, limit=limit)
+    # All results are returned, there are never more
+    return Paged(total=total, results=results, skip=skip, limit=limit, hasMore=False)
 
 
 def get_processing_results(
@@ -408,8 +408,8 @@ def get_processing_results(
 
     query = with_authorization(query, joinBLSession=False)
 
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
-    total = query.count()
     results = with_metadata(query.all(), list(metadata.keys()))
 
     messages = get_processing_messages(
@@ -476,13 +476,13 @@ def get_processing_attachments(
             .join(models.Proposal)
         )
         queries[key] = with_authorization(queries[key], joinBLSession=False)
-        queries[key] = page(queries[key], skip=skip, limit=limit)
 
     if hasattr(models, "ProcessingJob"):
         query_all = queries["api"].union_all(queries["pj"])
     else:
         query_all = queries["api"]
-    total = query_all.count()
+    total = count_total(query_all)
+    query_all = page(query_all, skip=skip, limit=limit)
     results = with_metadata(query_all.all(), list(metadata.keys()))
 
     return Paged(total=total, results=results, skip=skip, limit=limit)
@@ -580,9 +580,9 @@ def get_autointegration_results(
 
     query = with_authorization(query, joinBLSession=False)
 
-    query = page(query, skip=skip, limit=limit)
     query = query.distinct()
-    total = query.count()
+    total = count_total(query)
+    query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
     messages = get_processing_messages(
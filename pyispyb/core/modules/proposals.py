@@ -4,7 +4,7 @@ from sqlalchemy import or_, func, distinct
 from sqlalchemy.orm import joinedload
 from ispyb import models
 
-from ...app.extensions.database.utils import Paged, page, with_metadata
+from ...app.extensions.database.utils import Paged, page, count_total, with_metadata
 from ...app.extensions.database.middleware import db
 from ...app.extensions.database.definitions import (
     groups_from_beamlines,
@@ -59,7 +59,7 @@ def get_proposals(
     if withAuthorization:
         query = with_authorization(query, joinBLSession=False)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -91,7 +91,7 @@ def get_proposalHasPerson(
         query = query.filter(models.ProposalHasPerson.proposalId == proposalId)
 
     query_distinct = query.distinct()
-    total = query_distinct.count()
+    total = count_total(query_distinct)
     query = page(query_distinct, skip=skip, limit=limit)
 
     return Paged(total=total, results=query.all(), skip=skip, limit=limit)
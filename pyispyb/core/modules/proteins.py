@@ -5,7 +5,13 @@ from sqlalchemy.orm import joinedload, contains_eager
 from ispyb import models
 
 
-from ...app.extensions.database.utils import Paged, page, with_metadata, order
+from ...app.extensions.database.utils import (
+    Paged,
+    page,
+    count_total,
+    with_metadata,
+    order,
+)
 from ...app.extensions.database.middleware import db
 from ...app.extensions.database.definitions import with_authorization
 from ...core.modules.utils import encode_external_id
@@ -88,7 +94,7 @@ def get_proteins(
     if sort_order:
         query = order(query, ORDER_BY_MAP, sort_order)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
 
     results = with_metadata(query.all(), list(metadata.keys()))
@@ -11,6 +11,7 @@ from ...app.extensions.database.middleware import db
 from ...app.extensions.database.utils import (
     Paged,
     page,
+    count_total,
     with_metadata,
     order,
     update_model,
@@ -227,7 +228,7 @@ def get_samples(
             {"order_by": "blSampleId", "order": "desc"},
         )
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -372,7 +373,7 @@ def get_subsamples(
 
     query = order(query, SUBSAMPLE_ORDER_BY_MAP, sort_order)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -417,7 +418,7 @@ def get_sample_images(
 
     query = with_authorization(query, proposalColumn=models.Shipping.proposalId)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -10,7 +10,7 @@ from ...app.extensions.database.definitions import (
     groups_from_beamlines,
     with_authorization,
 )
-from ...app.extensions.database.utils import Paged, page, with_metadata
+from ...app.extensions.database.utils import Paged, page, count_total, with_metadata
 from ...app.extensions.database.middleware import db
 from ...core.modules.utils import encode_external_id
 
@@ -125,7 +125,7 @@ def get_sessions(
     if withAuthorization:
         query = with_authorization(query, joinBLSession=False)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
@@ -204,7 +204,7 @@ def get_sessionHasPerson(
         query = query.filter(models.SessionHasPerson.sessionId == sessionId)
 
     query_distinct = query.distinct()
-    total = query_distinct.count()
+    total = count_total(query_distinct)
 
     query = page(query_distinct, skip=skip, limit=limit)
 
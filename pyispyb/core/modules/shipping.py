@@ -6,7 +6,13 @@ from sqlalchemy.orm import joinedload
 from ispyb import models
 
 from ...app.extensions.database.definitions import with_authorization
-from ...app.extensions.database.utils import Paged, page, update_model, with_metadata
+from ...app.extensions.database.utils import (
+    Paged,
+    page,
+    count_total,
+    update_model,
+    with_metadata,
+)
 from ...app.extensions.database.middleware import db
 from ..schemas import shipping as schema
 
@@ -42,7 +48,7 @@ def get_shippings(
     if withAuthorization:
         query = with_authorization(query)
 
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     results = with_metadata(query.all(), list(metadata.keys()))
 
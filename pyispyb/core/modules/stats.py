@@ -11,7 +11,7 @@ from sqlalchemy import func, and_, or_, text, extract, distinct, Date, cast
 
 from ...config import settings
 from ...core.modules.utils import get_last_line, to_energy
-from ...app.extensions.database.utils import Paged, page
+from ...app.extensions.database.utils import Paged, page, count_total
 from ...app.extensions.database.definitions import (
     beamlines_from_group,
     with_authorization,
@@ -907,6 +907,6 @@ def get_runs(skip: int, limit: int) -> Paged[schema.VRun]:
         return Paged(total=0, results=[], skip=skip, limit=limit)
 
     query = db.session.query(models.VRun).order_by(models.VRun.startDate.desc())
-    total = query.count()
+    total = count_total(query)
     query = page(query, skip=skip, limit=limit)
     return Paged(total=total, results=query.all(), skip=skip, limit=limit)
@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 from sqlalchemy.orm import Session, joinedload
 from ispyb import models
 from pyispyb.app.extensions.database.session import engine
+from pyispyb.app.extensions.database.definitions import invalidate_authorization_cache
 from ..modules.persons import get_persons
 from ..schemas import userportalsync as schema
 from pyispyb.app.utils import timed
@@ -60,6 +61,9 @@ def sync_proposal(proposal: schema.UserPortalProposalSync) -> float:
         # Session commit is only applied once at the end of the whole process to commit all changes
         # https://stackoverflow.com/questions/65699977/fastapi-sqlalchemy-how-to-manage-transaction-session-and-multiple-commits
         session.commit()
+        # Session and proposal memberships may have changed, this only clears the
+        # cache of this worker
+        invalidate_authorization_cache()
     except Exception as e:
         logger.debug(f"sync_proposal exception: {e}")
         session.rollback()
@@ -0,0 +1,15 @@
+from typing import Any
+
+from fastapi import Depends
+
+from ....app.utils import metrics
+from ....dependencies import permission
+from .base import router
+
+
+@router.get("/metrics", response_model=dict[str, dict[str, Any]])
+def get_metrics(
+    depends=Depends(permission("view_metrics")),
+) -> dict[str, dict[str, Any]]:
+    """Get runtime metrics, i.e. database pool usage and cache statistics"""
+    return metrics.collect()
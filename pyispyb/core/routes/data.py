@@ -1,51 +1,294 @@
 import logging
-from typing import Optional
+from typing import Any, Optional, Union
 
-from fastapi import Depends, HTTPException, Response, Query
-from h5grove.content import (
-    DatasetContent,
-    ResolvedEntityContent,
-    get_content_from_file,
-)
+from fastapi import Depends, Header, HTTPException, Response, Query
+from h5grove.content import DatasetContent, ResolvedEntityContent
 from h5grove.encoders import encode
 from h5grove.models import LinkResolution
 from h5grove.utils import parse_link_resolution_arg
+import numpy as np
 from pydantic import conint
 
 from ... import filters
 from ...app.base import AuthenticatedAPIRouter
+from ...app.utils import metrics
+from ...app.utils.workers import WorkerPool
+from ...config import settings
 from ..modules import data as crud
 from ..schemas import data as schema
 
 logger = logging.getLogger(__name__)
 router = AuthenticatedAPIRouter(prefix="/data", tags=["Data"])
 
+# h5grove routes are async, their blocking database and HDF5 work is run in a
+# dedicated pool so that slow file reads do not stall the event loop
+h5grove_workers = WorkerPool(
+    "h5grove",
+    workers=settings.h5grove_workers,
+    max_queue=settings.h5grove_max_queue,
+)
+metrics.register("h5grove", h5grove_workers.stats)
+
 
 @router.get("/images")
 def get_image(
     imageNumber: conint(gt=0),
     dataCollectionId: int = Depends(filters.dataCollectionId),
+    binning: conint(ge=1, le=16) = Query(
+        1, description="Pool `binning` x `binning` pixels into one"
+    ),
+    binningMode: schema.BinningMode = Query(
+        schema.BinningMode.max, description="How binned pixels are pooled"
+    ),
+    roi: Optional[str] = Query(
+        None,
+        description="Only return a region of interest `x,y,width,height`",
+        regex=r"^\d+,\d+,\d+,\d+$",
+    ),
+    dtype: schema.ImageDType = Query(
+        schema.ImageDType.float32,
+        description="Output type, `native` for the detector's type without conversion. "
+        "Values are clipped to the range of integer types",
+    ),
+    encoding: Optional[schema.DataEncoding] = Query(
+        None, description="Compression, defaults to negotiating from `Accept-Encoding`"
+    ),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
 ):
-    """Get raw image data"""
-    image = crud.get_image(
-        dataCollectionId=dataCollectionId,
-        imageNumber=imageNumber,
+    """Get raw image data
+
+    The image shape and type are returned in the `X-Image-Width`, `X-Image-Height`,
+    and `X-Image-DType` headers
+    """
+    file_path = crud.get_image_path(
+        dataCollectionId=dataCollectionId, imageNumber=imageNumber
+    )
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    encoding = crud.negotiate_encoding(encoding, accept_encoding)
+
+    # Send compressed chunks as stored on disk if no conversion is needed
+    if binning == 1 and not roi:
+        chunk = crud.get_image_chunk(file_path, imageNumber, encoding)
+        if chunk is not None and (
+            dtype == schema.ImageDType.native or chunk[1] == np.dtype(dtype.value)
+        ):
+            content, image_dtype, shape = chunk
+            return _image_response(content, image_dtype, shape, encoding)
+
+    image = crud.load_image(
+        file_path,
+        imageNumber,
+        roi=tuple(int(value) for value in roi.split(",")) if roi else None,
     )
 
     if image is None:
         raise HTTPException(status_code=404, detail="Image not found")
 
-    return Response(image.tobytes(), media_type="application/octet-stream")
+    if image.size == 0:
+        raise HTTPException(
+            status_code=400, detail="Region of interest is outside the image"
+        )
+
+    image = crud.transform_image(
+        image, binning=binning, binningMode=binningMode, dtype=dtype
+    )
+
+    return _image_response(
+        crud.encode_data(image, encoding), image.dtype, image.shape, encoding
+    )
+
+
+@router.get("/images/reduce")
+def get_reduced_image(
+    start: conint(gt=0) = Query(description="First image number"),
+    end: conint(gt=0) = Query(description="Last image number (inclusive)"),
+    operation: schema.ReduceOperation = Query(
+        schema.ReduceOperation.sum, description="How images are combined"
+    ),
+    dataCollectionId: int = Depends(filters.dataCollectionId),
+    binning: conint(ge=1, le=16) = Query(
+        1, description="Pool `binning` x `binning` pixels into one"
+    ),
+    binningMode: schema.BinningMode = Query(
+        schema.BinningMode.max, description="How binned pixels are pooled"
+    ),
+    dtype: schema.ImageDType = Query(
+        schema.ImageDType.float32,
+        description="Output type, `native` for the type of the reduction "
+        "(`int64` sums of integer images, `float32` means)",
+    ),
+    encoding: Optional[schema.DataEncoding] = Query(
+        None, description="Compression, defaults to negotiating from `Accept-Encoding`"
+    ),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+):
+    """Get the sum, mean, or maximum of a range of images
+
+    Masked pixels in any of the images are masked in the result
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="`end` must be >= `start`")
+
+    if end - start + 1 > settings.image_reduce_max_images:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Can reduce at most {settings.image_reduce_max_images} images",
+        )
+
+    image = crud.reduce_images(
+        dataCollectionId=dataCollectionId,
+        start=start,
+        end=end,
+        operation=operation,
+    )
+    if image is None:
+        raise HTTPException(status_code=404, detail="Images not found")
+
+    image = crud.transform_image(
+        image, binning=binning, binningMode=binningMode, dtype=dtype
+    )
+
+    encoding = crud.negotiate_encoding(encoding, accept_encoding)
+    return _image_response(
+        crud.encode_data(image, encoding), image.dtype, image.shape, encoding
+    )
+
+
+class BufferResponse(Response):
+    """A response accepting any bytes like content, i.e. a memoryview of an array"""
+
+    def render(self, content: Any) -> Union[bytes, memoryview]:
+        if isinstance(content, memoryview):
+            return content
+        return super().render(content)
+
+
+def _image_response(
+    content: Union[bytes, memoryview],
+    dtype: np.dtype,
+    shape: tuple[int, ...],
+    encoding: schema.DataEncoding,
+) -> Response:
+    return BufferResponse(
+        content,
+        media_type="application/octet-stream",
+        headers={
+            "X-Image-Width": str(shape[-1]),
+            "X-Image-Height": str(shape[0]),
+            "X-Image-DType": dtype.name,
+            "X-Image-Byte-Order": "big" if dtype.byteorder == ">" else "little",
+            **crud.encoding_headers(encoding),
+        },
+    )
+
+
+@router.get("/images/pyramid", response_model=schema.ImagePyramid)
+def get_image_pyramid(
+    imageNumber: conint(gt=0),
+    dataCollectionId: int = Depends(filters.dataCollectionId),
+):
+    """Get the size and number of levels of the tile pyramid of an image"""
+    file_path = crud.get_image_path(
+        dataCollectionId=dataCollectionId, imageNumber=imageNumber
+    )
+    pyramid = crud.get_image_pyramid(file_path, imageNumber) if file_path else None
+    if pyramid is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    return pyramid
+
+
+@router.get("/images/tile")
+def get_image_tile(
+    imageNumber: conint(gt=0),
+    level: conint(ge=0) = Query(
+        description="Pyramid level, 0 is full resolution and each level halves it"
+    ),
+    x: conint(ge=0) = Query(description="Tile column"),
+    y: conint(ge=0) = Query(description="Tile row"),
+    dataCollectionId: int = Depends(filters.dataCollectionId),
+    binningMode: schema.BinningMode = Query(
+        schema.BinningMode.max, description="How pixels are pooled between levels"
+    ),
+    format: schema.TileFormat = Query(
+        schema.TileFormat.binary,
+        description="`png` requires `dtype` `uint8` or `uint16`",
+    ),
+    dtype: schema.ImageDType = Query(
+        schema.ImageDType.float32,
+        description="Output type, `native` for the detector's type without conversion. "
+        "Values are clipped to the range of integer types",
+    ),
+    encoding: Optional[schema.DataEncoding] = Query(
+        None, description="Compression of `binary` tiles"
+    ),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+):
+    """Get a tile of the image pyramid
+
+    Tiles are `tileSize` pixels square, except at the right and bottom edges. Binary
+    tiles return their shape and type in the same headers as `/data/images`
+    """
+    if format == schema.TileFormat.png and dtype not in [
+        schema.ImageDType.uint8,
+        schema.ImageDType.uint16,
+    ]:
+        raise HTTPException(
+            status_code=400, detail="`png` tiles must be `uint8` or `uint16`"
+        )
+
+    file_path = crud.get_image_path(
+        dataCollectionId=dataCollectionId, imageNumber=imageNumber
+    )
+    pyramid = crud.get_image_pyramid(file_path, imageNumber) if file_path else None
+    if pyramid is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    if level >= pyramid["levels"]:
+        raise HTTPException(
+            status_code=404, detail=f"Image only has {pyramid['levels']} levels"
+        )
+
+    encoding = (
+        crud.negotiate_encoding(encoding, accept_encoding)
+        if format == schema.TileFormat.binary
+        else schema.DataEncoding.identity
+    )
+    tile = crud.get_image_tile(
+        file_path,
+        imageNumber,
+        level=level,
+        x=x,
+        y=y,
+        binningMode=binningMode,
+        dtype=dtype,
+        format=format,
+        encoding=encoding,
+    )
+    if tile is None:
+        raise HTTPException(status_code=404, detail="Tile not found")
+
+    content, tile_dtype, shape = tile
+    if format == schema.TileFormat.png:
+        return Response(content, media_type="image/png")
+    return _image_response(content, tile_dtype, shape, encoding)
 
 
 @router.get("/images/header")
 def get_image_header(
     imageNumber: int,
     dataCollectionId: int = Depends(filters.dataCollectionId),
+    stats: bool = Query(True, description="Include pixel statistics"),
 ):
-    """Get image header"""
-    header = crud.get_image(
-        dataCollectionId=dataCollectionId, imageNumber=imageNumber, header=True
+    """Get image header
+
+    Pixel statistics of HDF5 images are computed on a subsample of the image unless
+    it has already been decoded
+    """
+    header = crud.get_image_header(
+        dataCollectionId=dataCollectionId, imageNumber=imageNumber, stats=stats
     )
 
     if not header:
@@ -71,6 +314,43 @@ def get_image_histogram(
     return histogram
 
 
+@router.get("/images/radial", response_model=schema.RadialProfile)
+def get_radial_profile(
+    imageNumber: conint(gt=0),
+    dataCollectionId: int = Depends(filters.dataCollectionId),
+    endImageNumber: Optional[conint(gt=0)] = Query(
+        None, description="Integrate the mean of images `imageNumber` to this image"
+    ),
+    bins: conint(ge=10, le=5000) = Query(500, description="Number of `q` bins"),
+):
+    """Get the azimuthally integrated intensity of an image
+
+    Masked pixels are excluded, the detector geometry is taken from the image header
+    """
+    if endImageNumber is not None:
+        if endImageNumber < imageNumber:
+            raise HTTPException(
+                status_code=400, detail="`endImageNumber` must be >= `imageNumber`"
+            )
+        if endImageNumber - imageNumber + 1 > settings.image_reduce_max_images:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Can integrate at most {settings.image_reduce_max_images} images",
+            )
+
+    profile = crud.get_radial_profile(
+        dataCollectionId=dataCollectionId,
+        start=imageNumber,
+        end=endImageNumber,
+        bins=bins,
+    )
+
+    if not profile:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    return profile
+
+
 class H5GroveException(Exception):
     def __init__(self, status_code: int, message: str) -> None:
         self.status_code = status_code
@@ -81,6 +361,13 @@ def create_error(status_code, message):
     return H5GroveException(status_code, message)
 
 
+def _get_h5_file(**kwargs) -> str:
+    file = crud.get_h5_path_mapped(**kwargs)
+    if file is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return file
+
+
 @router.get("/h5grove/attr/")
 async def get_attr(
     path: str = "/",
@@ -92,22 +379,24 @@ async def get_attr(
     robotActionId: Optional[int] = Query(None, title="RobotAction id"),
 ):
     """h5grove `/attr/` endpoint handler"""
-    file = crud.get_h5_path_mapped(
-        dataCollectionId=dataCollectionId,
-        autoProcProgramAttachmentId=autoProcProgramAttachmentId,
-        robotActionId=robotActionId,
-    )
-    if file is None:
-        raise HTTPException(status_code=404, detail="File not found")
 
-    with get_content_from_file(file, path, create_error) as content:
-        if not isinstance(content, ResolvedEntityContent):
-            raise HTTPException(status_code=500, detail="Wrong file type")
-        h5grove_response = encode(content.attributes(attr_keys), "json")
-        return Response(
-            content=h5grove_response.content, headers=h5grove_response.headers
+    def run() -> Response:
+        file = _get_h5_file(
+            dataCollectionId=dataCollectionId,
+            autoProcProgramAttachmentId=autoProcProgramAttachmentId,
+            robotActionId=robotActionId,
         )
 
+        with crud.get_h5_content(file, path, create_error) as content:
+            if not isinstance(content, ResolvedEntityContent):
+                raise HTTPException(status_code=500, detail="Wrong file type")
+            h5grove_response = encode(content.attributes(attr_keys), "json")
+            return Response(
+                content=h5grove_response.content, headers=h5grove_response.headers
+            )
+
+    return await h5grove_workers.run(run)
+
 
 @router.get("/h5grove/data/")
 async def get_data(
@@ -116,30 +405,55 @@ async def get_data(
     format: str = "json",
     flatten: bool = False,
     selection=None,
+    encoding: Optional[schema.DataEncoding] = Query(
+        None, description="Compression, defaults to negotiating from `Accept-Encoding`"
+    ),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
     dataCollectionId: Optional[int] = Depends(filters.dataCollectionId),
     autoProcProgramAttachmentId: Optional[int] = Query(
         None, title="AutoProcProgramAttachment id"
     ),
     robotActionId: Optional[int] = Query(None, title="RobotAction id"),
 ):
-    """h5grove `/data/` endpoint handler"""
-    file = crud.get_h5_path_mapped(
-        dataCollectionId=dataCollectionId,
-        autoProcProgramAttachmentId=autoProcProgramAttachmentId,
-        robotActionId=robotActionId,
-    )
-    if file is None:
-        raise HTTPException(status_code=404, detail="File not found")
+    """h5grove `/data/` endpoint handler
 
-    with get_content_from_file(file, path, create_error) as content:
-        if not isinstance(content, DatasetContent):
-            raise HTTPException(status_code=500, detail="Wrong file type")
-        data = content.data(selection, flatten, dtype)
-        h5grove_response = encode(data, format)
-        return Response(
-            content=h5grove_response.content, headers=h5grove_response.headers
+    `bslz4` encoding is only available with `format=bin`
+    """
+    encoding = crud.negotiate_encoding(encoding, accept_encoding)
+    if encoding == schema.DataEncoding.bslz4 and format != "bin":
+        raise HTTPException(
+            status_code=400, detail="`bslz4` encoding requires `format=bin`"
         )
 
+    def run() -> Response:
+        file = _get_h5_file(
+            dataCollectionId=dataCollectionId,
+            autoProcProgramAttachmentId=autoProcProgramAttachmentId,
+            robotActionId=robotActionId,
+        )
+
+        with crud.get_h5_content(file, path, create_error) as content:
+            if not isinstance(content, DatasetContent):
+                raise HTTPException(status_code=500, detail="Wrong file type")
+            data = content.data(selection, flatten, dtype)
+            h5grove_response = encode(data, format)
+            headers = {
+                key: value
+                for key, value in h5grove_response.headers.items()
+                if key != "Content-Length"
+            }
+            return Response(
+                content=crud.encode_data(
+                    np.asarray(data)
+                    if encoding == schema.DataEncoding.bslz4
+                    else h5grove_response.content,
+                    encoding,
+                ),
+                headers={**headers, **crud.encoding_headers(encoding)},
+            )
+
+    return await h5grove_workers.run(run)
+
 
 @router.get("/h5grove/meta/")
 async def get_meta(
@@ -152,24 +466,26 @@ async def get_meta(
     robotActionId: Optional[int] = Query(None, title="RobotAction id"),
 ):
     """h5grove `/meta/` endpoint handler"""
-    file = crud.get_h5_path_mapped(
-        dataCollectionId=dataCollectionId,
-        autoProcProgramAttachmentId=autoProcProgramAttachmentId,
-        robotActionId=robotActionId,
-    )
-    if file is None:
-        raise HTTPException(status_code=404, detail="File not found")
-
     resolve_links = parse_link_resolution_arg(
         resolve_links,
         fallback=LinkResolution.ONLY_VALID,
     )
-    with get_content_from_file(file, path, create_error, resolve_links) as content:
-        h5grove_response = encode(content.metadata(), "json")
-        return Response(
-            content=h5grove_response.content, headers=h5grove_response.headers
+
+    def run() -> Response:
+        file = _get_h5_file(
+            dataCollectionId=dataCollectionId,
+            autoProcProgramAttachmentId=autoProcProgramAttachmentId,
+            robotActionId=robotActionId,
         )
 
+        with crud.get_h5_content(file, path, create_error, resolve_links) as content:
+            h5grove_response = encode(content.metadata(), "json")
+            return Response(
+                content=h5grove_response.content, headers=h5grove_response.headers
+            )
+
+    return await h5grove_workers.run(run)
+
 
 @router.get("/h5grove/stats/")
 async def get_stats(
@@ -182,18 +498,20 @@ async def get_stats(
     robotActionId: Optional[int] = Query(None, title="RobotAction id"),
 ):
     """h5grove `/stats/` endpoint handler"""
-    file = crud.get_h5_path_mapped(
-        dataCollectionId=dataCollectionId,
-        autoProcProgramAttachmentId=autoProcProgramAttachmentId,
-        robotActionId=robotActionId,
-    )
-    if file is None:
-        raise HTTPException(status_code=404, detail="File not found")
 
-    with get_content_from_file(file, path, create_error) as content:
-        if not isinstance(content, DatasetContent):
-            raise HTTPException(status_code=500, detail="Wrong file type")
-        h5grove_response = encode(content.data_stats(selection), "json")
-        return Response(
-            content=h5grove_response.content, headers=h5grove_response.headers
+    def run() -> Response:
+        file = _get_h5_file(
+            dataCollectionId=dataCollectionId,
+            autoProcProgramAttachmentId=autoProcProgramAttachmentId,
+            robotActionId=robotActionId,
         )
+
+        with crud.get_h5_content(file, path, create_error) as content:
+            if not isinstance(content, DatasetContent):
+                raise HTTPException(status_code=500, detail="Wrong file type")
+            h5grove_response = encode(content.data_stats(selection), "json")
+            return Response(
+                content=h5grove_response.content, headers=h5grove_response.headers
+            )
+
+    return await h5grove_workers.run(run)
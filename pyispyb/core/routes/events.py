@@ -1,6 +1,8 @@
 from typing import Optional
-from fastapi import Depends
+from fastapi import Depends, Query
+from starlette.concurrency import run_in_threadpool
 
+from ...app.extensions.database.middleware import db
 from ...app.extensions.database.utils import Paged
 from ...dependencies import pagination
 from ... import filters
@@ -11,14 +13,26 @@ from ..schemas import events as schema
 from ..schemas.utils import paginated
 
 router = AuthenticatedAPIRouter(prefix="/events", tags=["Events"])
+PaginatedEvent = paginated(schema.Event)
+PaginatedEventType = paginated(schema.EventType)
+
+
+def _get_events(**kwargs) -> tuple[PaginatedEvent, dict]:
+    """Get events without checking snapshots on disk
+
+    Returns the validated events along with their snapshot paths so the filesystem
+    checks can run outside of `db.run_sync`, which may be on the event loop
+    """
+    events = crud.get_events(checkSnapshots=False, **kwargs)
+    return PaginatedEvent.validate(events), crud.get_snapshot_paths(events)
 
 
 @router.get(
     "",
-    response_model=paginated(schema.Event),
+    response_model=PaginatedEvent,
     responses={404: {"description": "Entity not found"}},
 )
-def get_events(
+async def get_events(
     page: dict[str, int] = Depends(pagination),
     session: str = Depends(filters.session),
     sessionId: int = Depends(filters.sessionId),
@@ -32,9 +46,14 @@ def get_events(
     proteinId: int = Depends(filters.proteinId),
     status: crud.EventStatus = None,
     eventType: Optional[str] = None,
+    cursor: Optional[str] = Query(
+        None,
+        description="Cursor from a previous page's `nextCursor`, replaces `skip` and does not count the total",
+    ),
 ) -> Paged[schema.Event]:
     """Get a list of events"""
-    return crud.get_events(
+    events, snapshot_paths = await db.run_sync(
+        _get_events,
         session=session,
         sessionId=sessionId,
         proposal=proposal,
@@ -47,22 +66,26 @@ def get_events(
         proteinId=proteinId,
         status=status,
         eventType=eventType,
+        cursor=cursor,
         **page
     )
+    return await run_in_threadpool(crud.check_snapshots, events, snapshot_paths)
 
 
 @router.get(
     "/types",
-    response_model=paginated(schema.EventType),
+    response_model=PaginatedEventType,
 )
-def get_event_types(
+async def get_event_types(
     session: str = Depends(filters.session),
     sessionId: int = Depends(filters.sessionId),
     blSampleId: int = Depends(filters.blSampleId),
     proteinId: int = Depends(filters.proteinId),
 ) -> Paged[schema.EventType]:
     """Get a list of event types"""
-    return crud.get_event_types(
+    return await db.run_sync(
+        crud.get_event_types,
+        response_model=PaginatedEventType,
         session=session,
         sessionId=sessionId,
         blSampleId=blSampleId,
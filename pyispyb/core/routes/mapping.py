@@ -1,8 +1,8 @@
+import json
 import logging
 from typing import Optional
 
-from fastapi import Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi import Depends, Header, HTTPException, Query, Response
 from ispyb import models
 
 from ...dependencies import pagination
@@ -18,6 +18,8 @@ from ..schemas.utils import paginated
 logger = logging.getLogger(__name__)
 router = AuthenticatedAPIRouter(prefix="/mapping", tags=["Mapping"])
 
+MAX_BATCH_MAPS = 100
+
 
 @router.get("/rois", response_model=paginated(schema.MapROI))
 def get_map_rois(
@@ -31,7 +33,7 @@ def get_map_rois(
     return crud.get_map_rois(
         blSampleId=blSampleId,
         xrfFluorescenceMappingROIId=xrfFluorescenceMappingROIId,
-        **page
+        **page,
     )
 
 
@@ -51,17 +53,79 @@ def get_maps(
         dataCollectionId=dataCollectionId,
         dataCollectionGroupId=dataCollectionGroupId,
         xrfFluorescenceMappingId=xrfFluorescenceMappingId,
-        **page
+        **page,
     )
 
 
+@router.get("/batch")
+def get_map_batch(
+    xrfFluorescenceMappingIds: Optional[list[int]] = Query(
+        None, description="Maps to render, in order"
+    ),
+    blSubSampleId: int = Depends(filters.blSubSampleId),
+    mode: schema.MapBatchMode = Query(
+        schema.MapBatchMode.sprite, description="How maps are combined"
+    ),
+    format: schema.MapImageFormat = Query(
+        schema.MapImageFormat.png, description="Image format"
+    ),
+):
+    """Render several maps as a single image
+
+    Maps are selected by id, or all maps of a sub sample. In `sprite` mode each map is
+    rendered with its own colour map and range, and its position is described by the
+    `X-Sprite-Layout` header (a JSON list of `xrfFluorescenceMappingId`, `x`, `y`,
+    `width`, and `height`). In `composite` mode up to three maps of the same shape are
+    rendered as the red, green, and blue channels of one image
+    """
+    if not xrfFluorescenceMappingIds and not blSubSampleId:
+        raise HTTPException(
+            status_code=400,
+            detail="Either `xrfFluorescenceMappingIds` or `blSubSampleId` is required",
+        )
+
+    maps = crud.get_maps(
+        xrfFluorescenceMappingIds=xrfFluorescenceMappingIds,
+        blSubSampleId=blSubSampleId,
+        skip=0,
+        limit=MAX_BATCH_MAPS + 1,
+        withDataHash=True,
+    ).results
+    if xrfFluorescenceMappingIds:
+        order = {mapId: i for i, mapId in enumerate(xrfFluorescenceMappingIds)}
+        maps = sorted(maps, key=lambda map_: order[map_.xrfFluorescenceMappingId])
+
+    if not maps:
+        raise HTTPException(status_code=404, detail="Maps not found")
+
+    if len(maps) > MAX_BATCH_MAPS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_MAPS} maps can be rendered"
+        )
+
+    headers = {}
+    if mode == schema.MapBatchMode.composite:
+        try:
+            image = crud.generate_map_composite(maps, format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        image = crud.generate_map_sprite(maps, format)
+        headers["X-Sprite-Layout"] = json.dumps(crud.get_sprite_layout(maps))
+
+    return Response(image, media_type=f"image/{format.value}", headers=headers)
+
+
 @router.get("/histogram/{xrfFluorescenceMappingId}", response_model=schema.MapHistogram)
 def get_map_histogram(
     xrfFluorescenceMappingId: int,
 ):
     """Get a map histogram"""
     maps = crud.get_maps(
-        xrfFluorescenceMappingId=xrfFluorescenceMappingId, skip=0, limit=1
+        xrfFluorescenceMappingId=xrfFluorescenceMappingId,
+        skip=0,
+        limit=1,
+        withDataHash=True,
     )
     try:
         map_ = maps.first
@@ -79,37 +143,79 @@ def get_map_pixel_value(
 ):
     """Get a map histogram"""
     maps = crud.get_maps(
-        xrfFluorescenceMappingId=xrfFluorescenceMappingId, skip=0, limit=1
+        xrfFluorescenceMappingId=xrfFluorescenceMappingId,
+        skip=0,
+        limit=1,
+        withDataHash=True,
     )
     try:
         map_ = maps.first
     except IndexError:
         raise HTTPException(status_code=404, detail="Map not found")
 
-    data = crud.shape_map(map_)
+    value = crud.get_map_pixel(map_, x, y)
+    if value is None:
+        raise HTTPException(status_code=404, detail="Pixel is outside of the map")
 
-    if y < len(data):
-        if x < len(data[y]):
-            return {
-                "xrfFluorescenceMappingId": map_.xrfFluorescenceMappingId,
-                "x": x,
-                "y": y,
-                "value": data[y][x],
-            }
+    return {
+        "xrfFluorescenceMappingId": map_.xrfFluorescenceMappingId,
+        "x": x,
+        "y": y,
+        "value": value,
+    }
 
 
 @router.get("/{xrfFluorescenceMappingId}")
 def get_map(
     xrfFluorescenceMappingId: int,
+    format: schema.MapImageFormat = Query(
+        schema.MapImageFormat.png, description="Image format"
+    ),
+    colourMap: Optional[str] = Query(
+        None, description="Matplotlib colour map, defaults to the map's colour map"
+    ),
+    min: Optional[float] = Query(
+        None, description="Value mapped to the start of the colour map"
+    ),
+    max: Optional[float] = Query(
+        None, description="Value mapped to the end of the colour map"
+    ),
+    opacity: Optional[float] = Query(
+        None, ge=0, le=1, description="Scale the alpha of the image"
+    ),
+    if_none_match: Optional[str] = Header(None, include_in_schema=False),
 ):
-    """Get a map in image format"""
+    """Get a map in image format
+
+    Images are returned with an `ETag`, pass it as `If-None-Match` to only receive
+    the image if it has changed
+    """
     maps = crud.get_maps(
-        xrfFluorescenceMappingId=xrfFluorescenceMappingId, skip=0, limit=1
+        xrfFluorescenceMappingId=xrfFluorescenceMappingId,
+        skip=0,
+        limit=1,
+        withDataHash=True,
     )
     try:
         map_ = maps.first
     except IndexError:
         raise HTTPException(status_code=404, detail="Map not found")
 
-    image = crud.generate_map_image(map_)
-    return StreamingResponse(image, media_type="image/png")
+    options = {
+        "image_format": format,
+        "colourMap": colourMap,
+        "vmin": min,
+        "vmax": max,
+        "opacity": opacity,
+    }
+    headers = {
+        "ETag": crud.get_map_image_etag(map_, **options),
+        "Cache-Control": "private, no-cache",
+    }
+    if if_none_match and headers["ETag"] in [
+        etag.strip() for etag in if_none_match.split(",")
+    ]:
+        return Response(status_code=304, headers=headers)
+
+    image = crud.generate_map_image(map_, **options)
+    return Response(image, media_type=f"image/{format.value}", headers=headers)
@@ -8,6 +8,7 @@ from ispyb import models
 
 from ...config import settings
 from ...dependencies import pagination, order_by_factory
+from ...app.extensions.database.middleware import db
 from ...app.extensions.database.utils import Paged
 from ... import filters
 from ...app.base import AuthenticatedAPIRouter
@@ -17,6 +18,7 @@ from ..schemas.utils import paginated
 
 logger = logging.getLogger(__name__)
 router = AuthenticatedAPIRouter(prefix="/samples", tags=["Samples"])
+PaginatedSample = paginated(schema.Sample)
 
 
 @router.get("/sub", response_model=paginated(schema.SubSample))
@@ -102,8 +104,8 @@ def get_sample_image(
         raise HTTPException(status_code=404, detail="Sample image not found")
 
 
-@router.get("", response_model=paginated(schema.Sample))
-def get_samples(
+@router.get("", response_model=PaginatedSample)
+async def get_samples(
     page: dict[str, int] = Depends(pagination),
     search: str = Depends(filters.search),
     proteinId: int = Depends(filters.proteinId),
@@ -116,7 +118,9 @@ def get_samples(
     ),
 ) -> Paged[models.BLSample]:
     """Get a list of samples"""
-    return crud.get_samples(
+    return await db.run_sync(
+        crud.get_samples,
+        response_model=PaginatedSample,
         search=search,
         proteinId=proteinId,
         proposal=proposal,
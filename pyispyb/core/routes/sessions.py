@@ -4,6 +4,7 @@ from fastapi import Depends, HTTPException, Query
 from ispyb import models
 
 from pyispyb.dependencies import pagination
+from pyispyb.app.extensions.database.middleware import db
 from pyispyb.app.extensions.database.utils import Paged
 from pyispyb import filters
 from pyispyb.app.base import AuthenticatedAPIRouter
@@ -18,7 +19,7 @@ PaginatedSession = paginated(schema.Session)
 
 
 @router.get("", response_model=PaginatedSession)
-def get_sessions(
+async def get_sessions(
     proposal: str = Depends(filters.proposal),
     beamLineName: str = Depends(filters.beamLineName),
     beamLineGroup: Optional[str] = Query(
@@ -37,7 +38,9 @@ def get_sessions(
     page: dict[str, int] = Depends(pagination),
 ) -> Paged[models.BLSession]:
     """Get a list of sessions"""
-    return crud.get_sessions(
+    return await db.run_sync(
+        crud.get_sessions,
+        response_model=PaginatedSession,
         proposal=proposal,
         beamLineName=beamLineName,
         beamLineGroup=beamLineGroup,
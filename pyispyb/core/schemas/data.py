@@ -1,3 +1,6 @@
+import enum
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -10,3 +13,47 @@ class ImageHistogram(BaseModel):
     bins: list[int]
     shape: tuple
     max: float
+
+
+class RadialProfile(BaseModel):
+    q: list[float]
+    resolution: list[float]
+    intensity: list[Optional[float]]
+
+
+class ImagePyramid(BaseModel):
+    width: int
+    height: int
+    tileSize: int
+    levels: int
+
+
+class BinningMode(str, enum.Enum):
+    max = "max"
+    sum = "sum"
+    mean = "mean"
+
+
+class ImageDType(str, enum.Enum):
+    native = "native"
+    float32 = "float32"
+    uint16 = "uint16"
+    uint8 = "uint8"
+
+
+class DataEncoding(str, enum.Enum):
+    identity = "identity"
+    gzip = "gzip"
+    zstd = "zstd"
+    bslz4 = "bslz4"
+
+
+class ReduceOperation(str, enum.Enum):
+    sum = "sum"
+    mean = "mean"
+    max = "max"
+
+
+class TileFormat(str, enum.Enum):
+    binary = "binary"
+    png = "png"
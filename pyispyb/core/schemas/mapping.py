@@ -1,3 +1,4 @@
+import enum
 from typing import Optional
 from pydantic import BaseModel, Field
 
@@ -60,3 +61,13 @@ class MapPixelValue(BaseModel):
     x: int
     y: int
     value: float
+
+
+class MapImageFormat(str, enum.Enum):
+    png = "png"
+    webp = "webp"
+
+
+class MapBatchMode(str, enum.Enum):
+    sprite = "sprite"
+    composite = "composite"
@@ -1,15 +1,23 @@
 from typing import Optional
 
-from pydantic import BaseModel, create_model
+from pydantic import BaseModel, Field, create_model
 from pydantic.main import ModelMetaclass
 
 
 def paginated(model: ModelMetaclass) -> ModelMetaclass:
     class PaginatedModel(BaseModel):
-        total: int
+        total: Optional[int] = Field(
+            description="Total number of results, if it was counted"
+        )
         results: list[model]  # type: ignore
         skip: int
         limit: int
+        nextCursor: Optional[str] = Field(
+            description="Cursor to fetch the next page on endpoints supporting cursors"
+        )
+        hasMore: Optional[bool] = Field(
+            description="Whether there are more results after this page"
+        )
 
     cls_name = f"Paginated<{model.__name__}>"
     PaginatedModel.__name__ = cls_name
@@ -6,6 +6,7 @@ from fastapi import HTTPException, Query
 from pydantic import conint
 
 from .app.globals import g
+from .app.extensions.database.utils import TotalMode
 
 
 logger = logging.getLogger(__name__)
@@ -16,10 +17,15 @@ class Order(str, enum.Enum):
     desc = "desc"
 
 
-def pagination(
+async def pagination(
     skip: Optional[conint(ge=0)] = Query(0, description="Results to skip"),
     limit: Optional[conint(gt=0)] = Query(25, description="Number of results to show"),
+    total: TotalMode = Query(
+        TotalMode.exact,
+        description="Count the total `exact`ly, reuse a recent count (`estimate`), or skip counting it (`none`)",
+    ),
 ) -> dict[str, int]:
+    g.total_mode = total
     return {"skip": skip, "limit": limit}
 
 
@@ -0,0 +1,123 @@
+"""Compare `materialized` and `subquery` authorization modes
+
+Creates a temporary person registered on 10, 1k and 10k sessions, then times
+authorized session and event listings in each `authorization_mode` and reports
+the size of the statements sent to the database. Everything is rolled back at
+the end so this can be run against a test database:
+
+    ISPYB_ENVIRONMENT=test python scripts/benchmark_authorization.py
+"""
+from argparse import ArgumentParser
+import statistics
+import time
+from typing import Any
+
+import sqlalchemy.event
+from ispyb import models
+
+from pyispyb.app.extensions.database.middleware import Database
+from pyispyb.app.extensions.database.session import _session, engine
+from pyispyb.app.globals import g
+from pyispyb.config import settings
+from pyispyb.core.modules.events import get_events
+from pyispyb.core.modules.sessions import get_sessions
+
+MODES = ["materialized", "subquery"]
+
+
+def create_memberships(session, memberships: int) -> int:
+    """Create a person registered on `memberships` sessions, returns the personId"""
+    proposal = session.query(models.Proposal).first()
+    if not proposal:
+        raise RuntimeError("At least one `Proposal` is required to run the benchmark")
+
+    person = models.Person(login=f"bench_auth_{memberships}")
+    session.add(person)
+    session.flush()
+
+    blsessions = [
+        models.BLSession(
+            proposalId=proposal.proposalId,
+            beamLineName="BENCH",
+            visit_number=100000 + i,
+        )
+        for i in range(memberships)
+    ]
+    session.add_all(blsessions)
+    session.flush()
+
+    session.bulk_insert_mappings(
+        models.SessionHasPerson,
+        [
+            {"sessionId": blsession.sessionId, "personId": person.personId}
+            for blsession in blsessions
+        ],
+    )
+    session.flush()
+
+    return person.personId
+
+
+def run(memberships: list[int], repeat: int) -> None:
+    statements = {"count": 0, "bytes": 0}
+
+    @sqlalchemy.event.listens_for(engine, "before_cursor_execute")
+    def measure(conn, cursor, statement: str, parameters: Any, context, executemany):
+        statements["count"] += 1
+        statements["bytes"] += len(statement) + len(str(parameters or ""))
+
+    benchmarks = {
+        "sessions": lambda: get_sessions(skip=0, limit=25),
+        "events": lambda: get_events(skip=0, limit=25),
+    }
+
+    print(
+        f"{'memberships':>12} {'mode':>13} {'query':>9} {'mean (ms)':>10} {'stdev (ms)':>11} {'statements':>11} {'bytes/request':>14}"
+    )
+    session = _session()
+    Database.set_session(session)
+    try:
+        for count in memberships:
+            g.personId = create_memberships(session, count)
+            g.permissions = []
+
+            for mode in MODES:
+                settings.authorization_mode = mode
+                for name, benchmark in benchmarks.items():
+                    timings = []
+                    statements["count"] = 0
+                    statements["bytes"] = 0
+                    for _ in range(repeat):
+                        # Resolve authorization as a new request would
+                        g.authorization = None
+                        start = time.perf_counter()
+                        benchmark()
+                        timings.append((time.perf_counter() - start) * 1000)
+
+                    print(
+                        f"{count:>12} {mode:>13} {name:>9} {statistics.mean(timings):>10.2f} "
+                        f"{statistics.stdev(timings) if len(timings) > 1 else 0:>11.2f} "
+                        f"{statements['count'] / repeat:>11.1f} {int(statements['bytes'] / repeat):>14}"
+                    )
+    finally:
+        session.rollback()
+        session.close()
+        Database.set_session(None)
+        sqlalchemy.event.remove(engine, "before_cursor_execute", measure)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark authorization modes")
+    parser.add_argument(
+        "-m",
+        "--memberships",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[10, 1000, 10000],
+        help="Comma separated list of session memberships to test",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=10, help="Repetitions per measurement"
+    )
+    args = parser.parse_args()
+
+    run(args.memberships, args.repeat)
@@ -0,0 +1,91 @@
+"""Benchmark image histograms
+
+Compares the previous float32 histogram with the single pass histogram over
+synthetic Eiger and Pilatus sized frames, reporting the time taken and the peak
+memory allocated while computing each histogram:
+
+    ISPYB_ENVIRONMENT=test python scripts/benchmark_histogram.py
+"""
+from argparse import ArgumentParser
+import statistics
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+
+from pyispyb.core.modules.data import _compute_histogram
+
+DETECTORS = {
+    # name: (height, width, dtype, saturation value)
+    "Eiger2 16M": (4371, 4150, np.uint32, np.iinfo(np.uint32).max),
+    "Eiger2 4M": (2162, 2068, np.uint32, np.iinfo(np.uint32).max),
+    "Pilatus 6M": (2527, 2463, np.int32, -1),
+}
+
+
+def make_frame(height: int, width: int, dtype: type, masked: int) -> np.ndarray:
+    """A frame of Poisson background with some bright spots and masked module gaps"""
+    rng = np.random.default_rng(0)
+    frame = rng.poisson(2, size=(height, width)).astype(dtype)
+    spots = rng.integers(0, frame.size, size=frame.size // 1000)
+    frame.flat[spots] = rng.integers(100, 50000, size=spots.size).astype(dtype)
+    frame[:, 1028:1040] = masked
+    frame[512:550, :] = masked
+    return frame
+
+
+def float32_histogram(data: np.ndarray) -> tuple[np.ndarray, list]:
+    """The histogram as previously computed on float32 frames"""
+    data = data.astype(np.float32)
+    std = 3 * np.std(data)
+    mean = np.mean(data)
+    clean_data = data[data < mean + std]
+
+    if clean_data.size == 0:
+        return np.ndarray([]), []
+
+    hist, bins = np.histogram(
+        clean_data.flatten(),
+        bins=np.arange(np.min(clean_data), np.max(clean_data), 1)
+        if np.max(clean_data) <= 300
+        else 300,
+    )
+    return hist, bins.tolist()
+
+
+def measure(fn: Callable, frame: np.ndarray, repeat: int) -> tuple[float, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.mean(timings), peak / 1024**2
+
+
+def run(repeat: int) -> None:
+    print(f"{'detector':>12} {'method':>12} {'mean (ms)':>10} {'peak (MB)':>10}")
+    for name, (height, width, dtype, masked) in DETECTORS.items():
+        frame = make_frame(height, width, dtype, masked)
+        for method, fn in [
+            ("float32", float32_histogram),
+            ("single pass", _compute_histogram),
+        ]:
+            mean, peak = measure(fn, frame, repeat)
+            print(f"{name:>12} {method:>12} {mean:>10.1f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark image histograms")
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="Repetitions per measurement"
+    )
+    args = parser.parse_args()
+
+    run(args.repeat)
@@ -0,0 +1,81 @@
+"""Compare listing maps with and without their data
+
+Lists maps as `/mapping` does, with the `data` column deferred, and as it did
+previously, loading the `data` of every map. Reports the time taken and the
+number of bytes the database sent for each query (from the MySQL / MariaDB
+`Bytes_sent` session status):
+
+    ISPYB_ENVIRONMENT=test python scripts/benchmark_maps.py
+    ISPYB_ENVIRONMENT=test python scripts/benchmark_maps.py --blSubSampleId 2
+"""
+from argparse import ArgumentParser
+import statistics
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from pyispyb.app.extensions.database.middleware import Database
+from pyispyb.app.extensions.database.session import _session
+from pyispyb.core.modules.mapping import get_maps
+
+
+def bytes_sent(session) -> int:
+    return int(
+        session.execute(text("SHOW SESSION STATUS LIKE 'Bytes_sent'")).first()[1]
+    )
+
+
+def run(limit: int, repeat: int, filters: dict[str, Optional[int]]) -> None:
+    session = _session()
+    Database.set_session(session)
+    try:
+        print(f"{'data':>9} {'maps':>5} {'mean (ms)':>10} {'bytes/query':>12}")
+        for withData in [True, False]:
+            timings = []
+            sent = []
+            for _ in range(repeat):
+                # Do not reuse maps already loaded in the session
+                session.expunge_all()
+                before = bytes_sent(session)
+                start = time.perf_counter()
+                maps = get_maps(
+                    skip=0,
+                    limit=limit,
+                    withAuthorization=False,
+                    withData=withData,
+                    **filters,
+                )
+                timings.append((time.perf_counter() - start) * 1000)
+                # Includes the small, constant, result of the first status query
+                sent.append(bytes_sent(session) - before)
+
+            print(
+                f"{'loaded' if withData else 'deferred':>9} {len(maps.results):>5} "
+                f"{statistics.mean(timings):>10.2f} {int(statistics.mean(sent)):>12}"
+            )
+    finally:
+        session.rollback()
+        session.close()
+        Database.set_session(None)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark listing maps")
+    parser.add_argument(
+        "-l", "--limit", type=int, default=100, help="Number of maps to list"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="Repetitions per measurement"
+    )
+    parser.add_argument("--blSampleId", type=int, help="Only list maps for a sample")
+    parser.add_argument(
+        "--blSubSampleId", type=int, help="Only list maps for a sub sample"
+    )
+    args = parser.parse_args()
+
+    run(
+        args.limit,
+        args.repeat,
+        {"blSampleId": args.blSampleId, "blSubSampleId": args.blSubSampleId},
+    )
@@ -0,0 +1,164 @@
+"""Convert XRF maps to a binary `dataFormat`
+
+Decodes each `json+gzip` map, re-encodes it in a binary format (default
+`float32+gzip`) and reports the stored size and decode time of each format. Maps
+are only updated with `--commit`, and only if they convert without loss of
+precision:
+
+    ISPYB_ENVIRONMENT=test python scripts/migrate_maps.py
+    ISPYB_ENVIRONMENT=test python scripts/migrate_maps.py --commit
+
+WARNING: `--commit` rewrites `data` and `dataFormat` in the ISPyB database, which
+is shared with other applications. Any that only read `json+gzip` maps will no
+longer be able to read converted maps, check they support the new format and back
+up the `XRFFluorescenceMapping` table first.
+
+Without a database the formats can be compared on a synthetic map:
+
+    ISPYB_ENVIRONMENT=test python scripts/migrate_maps.py --synthetic 1000000
+"""
+from argparse import ArgumentParser
+import gzip
+import json
+import statistics
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from ispyb import models
+
+from pyispyb.app.extensions.database.session import _session
+from pyispyb.core.modules.mapping import (
+    BINARY_FORMATS,
+    decode_map_data,
+    encode_map_data,
+)
+
+
+def measure(fn: Callable[[], np.ndarray], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(timings)
+
+
+def compare(data: bytes, dataFormat: str, repeat: int) -> Optional[dict]:
+    """Convert a `json+gzip` map, returns None if the conversion would lose precision"""
+    original = decode_map_data(data, "json+gzip")
+    converted = encode_map_data(original, dataFormat)
+    if not np.array_equal(original, decode_map_data(converted, dataFormat)):
+        return None
+
+    return {
+        "data": converted,
+        "json_bytes": len(data),
+        "binary_bytes": len(converted),
+        "json_ms": measure(lambda: decode_map_data(data, "json+gzip"), repeat),
+        "binary_ms": measure(lambda: decode_map_data(converted, dataFormat), repeat),
+    }
+
+
+def report(results: list[dict], skipped: int, dataFormat: str) -> None:
+    if not results:
+        print(f"No maps converted, {skipped} skipped")
+        return
+
+    json_bytes = sum(result["json_bytes"] for result in results)
+    binary_bytes = sum(result["binary_bytes"] for result in results)
+    json_ms = sum(result["json_ms"] for result in results)
+    binary_ms = sum(result["binary_ms"] for result in results)
+
+    print(f"{len(results)} maps converted, {skipped} skipped")
+    print(f"{'format':>13} {'size (MB)':>10} {'decode (ms)':>12}")
+    print(f"{'json+gzip':>13} {json_bytes / 1024**2:>10.2f} {json_ms:>12.1f}")
+    print(f"{dataFormat:>13} {binary_bytes / 1024**2:>10.2f} {binary_ms:>12.1f}")
+    print(
+        f"{'gain':>13} {json_bytes / binary_bytes:>9.1f}x {json_ms / binary_ms:>11.1f}x"
+    )
+
+
+def run_synthetic(points: int, dataFormat: str, repeat: int) -> None:
+    rng = np.random.default_rng(0)
+    values = rng.poisson(200, size=points)
+    values[rng.integers(0, points, size=points // 100)] = -1
+    data = gzip.compress(json.dumps(values.tolist()).encode())
+
+    result = compare(data, dataFormat, repeat)
+    report([result] if result else [], 0 if result else 1, dataFormat)
+
+
+def run(dataFormat: str, repeat: int, commit: bool, limit: Optional[int]) -> None:
+    session = _session()
+    try:
+        query = (
+            session.query(models.XRFFluorescenceMapping)
+            .filter(models.XRFFluorescenceMapping.dataFormat == "json+gzip")
+            .order_by(models.XRFFluorescenceMapping.xrfFluorescenceMappingId)
+        )
+        if limit:
+            query = query.limit(limit)
+
+        results = []
+        skipped = 0
+        for map_ in query.yield_per(100):
+            result = compare(map_.data, dataFormat, repeat)
+            if result is None:
+                print(
+                    f"Skipping map {map_.xrfFluorescenceMappingId}, `{dataFormat}` would lose precision"
+                )
+                skipped += 1
+                continue
+
+            results.append(result)
+            if commit:
+                map_.data = result.pop("data")
+                map_.dataFormat = dataFormat
+            else:
+                result.pop("data")
+
+        report(results, skipped, dataFormat)
+        if commit:
+            session.commit()
+            print("Maps updated")
+    finally:
+        session.rollback()
+        session.close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Convert XRF maps to a binary dataFormat")
+    parser.add_argument(
+        "-f",
+        "--format",
+        default="float32+gzip",
+        choices=[
+            f"{name}{compression}"
+            for name in BINARY_FORMATS
+            for compression in ["", "+gzip"]
+        ],
+        help="Binary dataFormat to convert to",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="Repetitions per measurement"
+    )
+    parser.add_argument("-l", "--limit", type=int, help="Only convert this many maps")
+    parser.add_argument(
+        "--commit",
+        action="store_true",
+        help="Update the maps in the shared ISPyB database. WARNING: other "
+        "applications that only read json+gzip maps will not be able to read them",
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="POINTS",
+        help="Benchmark a synthetic map of this many points rather than the database",
+    )
+    args = parser.parse_args()
+
+    if args.synthetic:
+        run_synthetic(args.synthetic, args.format, args.repeat)
+    else:
+        run(args.format, args.repeat, args.commit, args.limit)
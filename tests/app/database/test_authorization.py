@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+from ispyb import models
+import pytest
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session
+
+from pyispyb.app.extensions.database import definitions
+from pyispyb.app.globals import g
+from pyispyb.app.utils.cache import TTLCache
+from pyispyb.config import settings
+
+
+@pytest.fixture
+def authorization(monkeypatch):
+    """Resolve authorization without a database, counting membership lookups"""
+    calls = {"options": 0, "memberships": 0}
+
+    def get_options():
+        calls["options"] += 1
+        return SimpleNamespace(
+            beamLineGroups=[
+                SimpleNamespace(
+                    permission="bl_admin",
+                    beamLines=[
+                        SimpleNamespace(beamLineName="BL01", archived=False),
+                        SimpleNamespace(beamLineName="BL02", archived=True),
+                    ],
+                )
+            ]
+        )
+
+    def get_memberships(personId):
+        calls["memberships"] += 1
+        return [personId * 10], [personId * 100]
+
+    monkeypatch.setattr(definitions, "get_options", get_options)
+    monkeypatch.setattr(definitions, "_get_memberships", get_memberships)
+    monkeypatch.setattr(definitions, "_memberships", TTLCache(ttl=60))
+
+    g.personId = 1
+    g.permissions = ["bl_admin"]
+    g.authorization = None
+    yield calls
+
+    g.personId = None
+    g.permissions = None
+    g.authorization = None
+
+
+def test_context_reused_within_request(authorization):
+    context = definitions.get_authorization_context()
+    assert definitions.get_authorization_context() is context
+    assert authorization["options"] == 1
+
+    assert context.get_beamlines() == ["BL01", "BL02"]
+    assert context.get_beamlines(includeArchived=True) == ["BL02"]
+    assert context.permissions_applied == ["bl_admin"]
+
+
+def test_context_resolved_again_for_new_person(authorization):
+    context = definitions.get_authorization_context()
+
+    g.personId = 2
+    other = definitions.get_authorization_context()
+    assert other is not context
+    assert other.personId == 2
+
+    g.permissions = []
+    assert definitions.get_authorization_context().get_beamlines() == []
+    assert authorization["options"] == 3
+
+
+def test_memberships_resolved_lazily(authorization):
+    context = definitions.get_authorization_context()
+    assert authorization["memberships"] == 0
+
+    assert context.sessionIds == [10]
+    assert context.proposalIds == [100]
+    assert authorization["memberships"] == 1
+
+
+def test_memberships_cached_between_requests(authorization):
+    assert definitions.get_authorization_context().sessionIds == [10]
+
+    # A new request
+    g.authorization = None
+    assert definitions.get_authorization_context().sessionIds == [10]
+    assert authorization["memberships"] == 1
+
+    definitions.invalidate_authorization_cache(1)
+    g.authorization = None
+    assert definitions.get_authorization_context().sessionIds == [10]
+    assert authorization["memberships"] == 2
+
+
+def test_memberships_not_cached_without_ttl(authorization, monkeypatch):
+    monkeypatch.setattr(definitions, "_memberships", TTLCache(ttl=0))
+
+    for _ in range(2):
+        g.authorization = None
+        assert definitions.get_authorization_context().proposalIds == [100]
+    assert authorization["memberships"] == 2
+
+
+@pytest.fixture
+def subquery_mode(authorization, monkeypatch):
+    monkeypatch.setattr(settings, "authorization_mode", "subquery")
+    g.permissions = []
+
+
+def compile_where(query) -> str:
+    return str(query.statement.compile(dialect=mysql.dialect())).split("WHERE", 1)[1]
+
+
+def test_subqueries_correlated_to_outer_query(subquery_mode):
+    query = (
+        Session()
+        .query(models.DataCollection)
+        .join(models.DataCollectionGroup)
+        .join(models.BLSession)
+        .join(models.Proposal)
+    )
+    where = compile_where(definitions.with_authorization(query, joinBLSession=False))
+
+    assert "FROM `Session_has_Person` \nWHERE" in where
+    assert "FROM `ProposalHasPerson` \nWHERE" in where
+    assert "`Session_has_Person`.`sessionId` = `BLSession`.`sessionId`" in where
+    assert "`ProposalHasPerson`.`proposalId` = `Proposal`.`proposalId`" in where
+
+
+def test_subqueries_joined_blsession(subquery_mode):
+    query = definitions.with_authorization(Session().query(models.Proposal))
+    where = compile_where(query)
+
+    assert "FROM `Session_has_Person` \nWHERE" in where
+    assert "FROM `ProposalHasPerson` \nWHERE" in where
+
+
+@pytest.mark.parametrize(
+    "model,joinBLSession", [(models.BLSession, False), (models.Proposal, False)]
+)
+def test_subqueries_require_outer_tables(subquery_mode, model, joinBLSession):
+    with pytest.raises(RuntimeError):
+        definitions.with_authorization(
+            Session().query(model), joinBLSession=joinBLSession
+        )
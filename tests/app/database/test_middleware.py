@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError
+import pytest
+
+from pyispyb.app.extensions.database import middleware
+from pyispyb.app.extensions.database.middleware import LazySession, db
+
+
+class Item(BaseModel):
+    id: int
+    name: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+
+class FakeAsyncSession:
+    """Runs `run_sync` callables with a stand in synchronous session"""
+
+    def __init__(self):
+        self.sync_session = SimpleNamespace(name="sync")
+        self.calls = 0
+
+    async def run_sync(self, fn):
+        self.calls += 1
+        return fn(self.sync_session)
+
+
+def test_run_sync_threadpool(monkeypatch):
+    """Without an async database `fn` runs in the threadpool"""
+    monkeypatch.setattr(middleware, "sqlasyncsession", None)
+
+    def get_item(id, name=None):
+        return {"id": id, "name": name, "thread": threading.get_ident()}
+
+    result = asyncio.run(db.run_sync(get_item, 1, name="one"))
+    assert result["id"] == 1
+    assert result["name"] == "one"
+    assert result["thread"] != threading.get_ident()
+
+
+def test_run_sync_threadpool_response_model(monkeypatch):
+    monkeypatch.setattr(middleware, "sqlasyncsession", None)
+
+    result = asyncio.run(
+        db.run_sync(
+            lambda: SimpleNamespace(id=1, name="one", extra=True), response_model=Item
+        )
+    )
+    assert result == Item(id=1, name="one")
+
+    with pytest.raises(ValidationError):
+        asyncio.run(db.run_sync(lambda: {"id": "one"}, response_model=Item))
+
+
+def test_run_sync_async_session(monkeypatch):
+    """With an async database `fn` runs on the async session's synchronous facade"""
+    monkeypatch.setattr(middleware, "sqlasyncsession", object())
+    async_session = FakeAsyncSession()
+
+    def get_item():
+        return SimpleNamespace(id=1, name=db.session.name)
+
+    async def run():
+        middleware._async_session.set(LazySession(lambda: async_session))
+        result = await db.run_sync(get_item, response_model=Item)
+        assert middleware._session.get() is None
+        return result
+
+    assert asyncio.run(run()) == Item(id=1, name="sync")
+    assert async_session.calls == 1
@@ -0,0 +1,54 @@
+import pytest
+
+from pyispyb.app.extensions.database.utils import Paged, TotalMode, has_more
+from pyispyb.app.globals import g
+
+
+@pytest.fixture
+def total_mode():
+    yield
+    g.total_mode = None
+
+
+def test_paged_trims_extra_row():
+    paged = Paged(total=None, results=[1, 2, 3], skip=0, limit=2)
+    assert paged.results == [1, 2]
+    assert paged.hasMore is True
+
+
+@pytest.mark.parametrize(
+    "total, skip, expected",
+    [(None, 0, False), (2, 0, False), (3, 0, True), (3, 1, False)],
+)
+def test_paged_has_more_from_total(total, skip, expected):
+    paged = Paged(total=total, results=[1, 2], skip=skip, limit=2)
+    assert paged.hasMore is expected
+
+
+def test_paged_explicit_has_more():
+    """Results with an explicit `hasMore` are not trimmed"""
+    paged = Paged(total=None, results=[1, 2, 3], skip=0, limit=2, hasMore=False)
+    assert paged.results == [1, 2, 3]
+    assert paged.hasMore is False
+
+    paged = Paged(total=None, results=[{"imageNumber": [1, 2]}], limit=2, hasMore=True)
+    assert paged.hasMore is True
+
+
+@pytest.mark.parametrize("mode", [TotalMode.estimate, TotalMode.none])
+@pytest.mark.parametrize("total", [None, 0, 2, 3, 100])
+def test_paged_has_more_estimate(total_mode, mode, total):
+    """Unless counted exactly only the extra row fetched by `page` is used"""
+    g.total_mode = mode
+    assert Paged(total=total, results=[1, 2], skip=0, limit=2).hasMore is False
+    assert Paged(total=total, results=[1, 2, 3], skip=0, limit=2).hasMore is True
+    assert has_more(2, skip=0, limit=2, total=total) is False
+    assert has_more(3, skip=0, limit=2, total=total) is True
+
+
+def test_has_more_exact(total_mode):
+    g.total_mode = TotalMode.exact
+    assert has_more(2, skip=0, limit=2, total=3) is True
+    assert has_more(2, skip=1, limit=2, total=3) is False
+    # Pages fetched by cursor are not counted
+    assert has_more(3, skip=0, limit=2, total=None) is True
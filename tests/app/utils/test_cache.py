@@ -0,0 +1,192 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+import pytest
+
+from pyispyb.app.utils import cache
+from pyispyb.app.utils.cache import ArrayDiskCache, LRUCache, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_ttl_cache_expires(clock):
+    ttl = TTLCache[str](ttl=10)
+    ttl.set("a", "value")
+    assert ttl.get("a") == "value"
+
+    clock[0] = 11
+    assert ttl.get("a") is None
+    assert ttl.stats() == {"enabled": True, "entries": 0, "hits": 1, "misses": 1}
+
+
+def test_ttl_cache_max_entries(clock):
+    ttl = TTLCache[int](ttl=10, max_entries=2)
+    ttl.set("a", 1)
+    ttl.set("b", 2)
+    # Reading `a` makes `b` the oldest entry
+    assert ttl.get("a") == 1
+    ttl.set("c", 3)
+
+    assert ttl.get("b") is None
+    assert ttl.get("a") == 1
+    assert ttl.get("c") == 3
+
+
+def test_ttl_cache_get_or_set_and_invalidate(clock):
+    ttl = TTLCache[int](ttl=10)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return len(calls)
+
+    assert ttl.get_or_set("a", factory) == 1
+    assert ttl.get_or_set("a", factory) == 1
+
+    ttl.invalidate("a")
+    assert ttl.get_or_set("a", factory) == 2
+
+    ttl.set("b", 3)
+    ttl.invalidate()
+    assert ttl.stats()["entries"] == 0
+
+
+def test_ttl_cache_disabled():
+    ttl = TTLCache[int](ttl=0)
+    ttl.set("a", 1)
+    assert ttl.get("a") is None
+    assert ttl.get_or_set("a", lambda: 2) == 2
+    assert ttl.stats()["enabled"] is False
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache[bytes](max_bytes=10, sizeof=len)
+    lru.set("a", b"aaaa")
+    lru.set("b", b"bbbb")
+    assert lru.get("a") == b"aaaa"
+    lru.set("c", b"cccc")
+
+    assert "b" not in lru
+    assert lru.get("a") == b"aaaa"
+    assert lru.get("c") == b"cccc"
+    assert lru.stats()["bytes"] == 8
+    assert lru.stats()["evictions"] == 1
+
+
+def test_lru_cache_peek():
+    lru = LRUCache[bytes](max_bytes=10, sizeof=len)
+    lru.set("a", b"aaaa")
+    lru.set("b", b"bbbb")
+
+    # Not counted, and `a` remains the least recently used
+    assert lru.peek("a") == b"aaaa"
+    assert lru.peek("c") is None
+    lru.set("c", b"cccc")
+    assert "a" not in lru
+    assert lru.stats()["hits"] == 0
+    assert lru.stats()["misses"] == 0
+
+
+def test_lru_cache_replace_and_oversized():
+    lru = LRUCache[bytes](max_bytes=10, sizeof=len)
+    lru.set("a", b"aaaa")
+    lru.set("a", b"aa")
+    assert lru.bytes == 2
+
+    # Larger than the whole cache, not stored and nothing evicted
+    lru.set("b", b"b" * 11)
+    assert "b" not in lru
+    assert lru.get("a") == b"aa"
+
+
+def test_lru_cache_get_or_set_skips_none():
+    lru = LRUCache[bytes](max_bytes=10, sizeof=len)
+    assert lru.get_or_set("a", lambda: None) is None
+    assert "a" not in lru
+
+    assert lru.get_or_set("a", lambda: b"a") == b"a"
+    assert lru.get_or_set("a", lambda: b"b") == b"a"
+
+
+def test_lru_cache_invalidate():
+    lru = LRUCache[bytes](max_bytes=10, sizeof=len)
+    lru.set("a", b"aaaa")
+    lru.set("b", b"bb")
+
+    lru.invalidate("a")
+    assert lru.bytes == 2
+    lru.invalidate()
+    assert lru.bytes == 0
+    assert lru.get("b") is None
+
+
+def test_lru_cache_disabled():
+    lru = LRUCache[bytes](max_bytes=0, sizeof=len)
+    lru.set("a", b"a")
+    assert lru.get("a") is None
+    assert lru.stats()["enabled"] is False
+
+
+def test_array_disk_cache_round_trip(tmp_path):
+    disk = ArrayDiskCache(str(tmp_path / "cache"), max_bytes=1024**2)
+    array = np.arange(12, dtype=np.uint16).reshape(3, 4)
+    disk.set(("image", 1), ({"max": np.uint16(11), "shape": [3, 4]}, array))
+
+    metadata, cached = disk.get(("image", 1))
+    assert metadata == {"max": 11, "shape": [3, 4]}
+    np.testing.assert_array_equal(cached, array)
+    assert isinstance(cached, np.memmap)
+    assert not cached.flags.writeable
+
+    assert disk.get(("image", 2)) is None
+    assert disk.stats()["hits"] == 1
+    assert disk.stats()["misses"] == 1
+
+
+def test_array_disk_cache_evicts_oldest(tmp_path):
+    array = np.zeros(1024, dtype=np.uint8)
+    # Room for two entries including their `.npy` headers
+    disk = ArrayDiskCache(str(tmp_path), max_bytes=2 * 1024 + 256)
+    for key in range(3):
+        disk.set(key, ({}, array))
+        # Distinct modification times
+        path = f"{disk._path(key)}.npy"
+        os.utime(path, (key, key))
+
+    disk.set(3, ({}, array))
+    assert disk.get(0) is None
+    assert disk.get(1) is None
+    assert disk.get(2) is not None
+    assert disk.get(3) is not None
+
+
+def test_array_disk_cache_concurrent_writes(tmp_path):
+    """Threads writing the same key each use their own temporary file"""
+    disk = ArrayDiskCache(str(tmp_path), max_bytes=1024**2)
+    arrays = [np.full(4096, value, dtype=np.uint32) for value in range(16)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda array: disk.set("key", ({}, array)), arrays * 4))
+
+    _, cached = disk.get("key")
+    assert len(set(cached.tolist())) == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_array_disk_cache_write_error(tmp_path, monkeypatch):
+    disk = ArrayDiskCache(str(tmp_path), max_bytes=1024**2)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(cache.np, "save", fail)
+    disk.set("key", ({}, np.zeros(4)))
+
+    assert disk.get("key") is None
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+
+from fastapi import HTTPException
+import pytest
+
+from pyispyb.app.globals import g
+from pyispyb.app.utils.workers import WorkerPool
+
+
+async def wait_for(condition, timeout: float = 5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise TimeoutError()
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool("test", workers=1, max_queue=2)
+    yield pool
+    pool._executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def release():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+async def block(pool: WorkerPool, release: threading.Event) -> asyncio.Task:
+    """Occupy the only worker until `release` is set"""
+    task = asyncio.create_task(pool.run(release.wait, 5))
+    await wait_for(lambda: pool.stats()["running"] == 1)
+    return task
+
+
+def test_run(pool):
+    async def run():
+        g.total_mode = "estimate"
+        try:
+            return await pool.run(lambda a, b=0: (a + b, g.total_mode), 1, b=2)
+        finally:
+            g.total_mode = None
+
+    assert asyncio.run(run()) == (3, "estimate")
+
+
+def test_stats(pool):
+    def fail():
+        raise ValueError()
+
+    async def run():
+        await pool.run(lambda: None)
+        with pytest.raises(ValueError):
+            await pool.run(fail)
+
+    asyncio.run(run())
+    stats = pool.stats()
+    assert stats["workers"] == 1
+    assert stats["max_queue"] == 2
+    assert stats["queued"] == 0
+    assert stats["running"] == 0
+    assert stats["completed"] == 1
+    assert stats["failed"] == 1
+    assert stats["rejected"] == 0
+    assert stats["run_max"] >= stats["run_mean"] >= 0
+
+
+def test_reject_when_queue_full(pool, release):
+    async def run():
+        blocked = await block(pool, release)
+        queued = [asyncio.create_task(pool.run(lambda i=i: i)) for i in range(2)]
+        await wait_for(lambda: pool.stats()["queued"] == 2)
+
+        with pytest.raises(HTTPException) as e:
+            await pool.run(lambda: None)
+        assert e.value.status_code == 503
+        assert pool.stats()["rejected"] == 1
+
+        release.set()
+        assert await blocked
+        return await asyncio.gather(*queued)
+
+    assert asyncio.run(run()) == [0, 1]
+    stats = pool.stats()
+    assert stats["queued"] == 0
+    assert stats["completed"] == 3
+    assert stats["wait_max"] > 0
+
+
+def test_cancel_queued(pool, release):
+    """Cancelled calls that never started do not stay counted as queued"""
+    calls = []
+
+    async def run():
+        blocked = await block(pool, release)
+        for _ in range(pool.max_queue + 1):
+            queued = asyncio.create_task(pool.run(calls.append, 1))
+            await wait_for(lambda: pool.stats()["queued"] == 1)
+            queued.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await queued
+            assert pool.stats()["queued"] == 0
+
+        release.set()
+        await blocked
+        return await pool.run(lambda: "accepted")
+
+    assert asyncio.run(run()) == "accepted"
+    assert calls == []
+    stats = pool.stats()
+    assert stats["queued"] == 0
+    assert stats["rejected"] == 0
+
+
+def test_cancel_running(pool, release):
+    """A call cancelled once started is counted by the worker"""
+
+    async def run():
+        blocked = await block(pool, release)
+        blocked.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await blocked
+        release.set()
+        await wait_for(lambda: pool.stats()["completed"] == 1)
+
+    asyncio.run(run())
+    stats = pool.stats()
+    assert stats["queued"] == 0
+    assert stats["running"] == 0
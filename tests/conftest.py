@@ -45,6 +45,16 @@ def auth_client(client: TestClient):
     yield auth
 
 
+@pytest.fixture(params=["materialized", "subquery"])
+def authorization_mode(request):
+    """Run a test with each `authorization_mode`"""
+    old_authorization_mode = settings.authorization_mode
+    settings.authorization_mode = request.param
+
+    yield request.param
+    settings.authorization_mode = old_authorization_mode
+
+
 @pytest.fixture
 def short_session():
     old_token_exp_time = settings.token_exp_time
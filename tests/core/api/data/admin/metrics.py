@@ -0,0 +1,27 @@
+from tests.core.api.utils.apitest import ApiTestElem, ApiTestExpected, ApiTestInput
+
+
+test_data_admin_metrics = [
+    ApiTestElem(
+        name="get metrics no permission",
+        input=ApiTestInput(
+            permissions=[],
+            login="abcd",
+            route="/admin/metrics",
+        ),
+        expected=ApiTestExpected(
+            code=403,
+        ),
+    ),
+    ApiTestElem(
+        name="get metrics",
+        input=ApiTestInput(
+            permissions=["view_metrics"],
+            login="abcd",
+            route="/admin/metrics",
+        ),
+        expected=ApiTestExpected(
+            code=200,
+        ),
+    ),
+]
@@ -105,3 +105,36 @@ test_workflows = [
         ),
     ),
 ]
+
+test_per_image_analysis = [
+    ApiTestElem(
+        name="List per image analysis",
+        input=ApiTestInput(
+            login="abcd",
+            route="/datacollections/quality?dataCollectionId=1",
+        ),
+        expected=ApiTestExpected(
+            code=200,
+        ),
+    ),
+    ApiTestElem(
+        name="List per image analysis (estimated total)",
+        input=ApiTestInput(
+            login="abcd",
+            route="/datacollections/quality?dataCollectionId=1&total=estimate",
+        ),
+        expected=ApiTestExpected(
+            code=200,
+        ),
+    ),
+    ApiTestElem(
+        name="List per image analysis (no total)",
+        input=ApiTestInput(
+            login="abcd",
+            route="/datacollections/quality?dataCollectionId=1&total=none",
+        ),
+        expected=ApiTestExpected(
+            code=200,
+        ),
+    ),
+]
@@ -13,6 +13,17 @@ test_data_events = [
             code=200,
         ),
     ),
+    ApiTestElem(
+        name="list events invalid cursor",
+        input=ApiTestInput(
+            permissions=[],
+            login="abcd",
+            route="/events?cursor=notacursor",
+        ),
+        expected=ApiTestExpected(
+            code=400,
+        ),
+    ),
     ApiTestElem(
         name="get event types",
         input=ApiTestInput(
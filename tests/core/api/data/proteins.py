@@ -35,4 +35,52 @@ test_data_proteins_list = [
             code=200,
         ),
     ),
+    ApiTestElem(
+        name="List proteins (estimated total)",
+        input=ApiTestInput(
+            login="abcd",
+            route="/proteins?total=estimate",
+        ),
+        expected=ApiTestExpected(
+            code=200,
+        ),
+    ),
+    ApiTestElem(
+        name="List proteins (no total)",
+        input=ApiTestInput(
+            login="abcd",
+            route="/proteins?total=none",
+        ),
+        expected=ApiTestExpected(
+            code=200,
+        ),
+    ),
+    ApiTestElem(
+        name="List proteins (no total, past the last page)",
+        input=ApiTestInput(
+            login="abcd",
+            route="/proteins?total=none&skip=100000",
+        ),
+        expected=ApiTestExpected(
+            code=200,
+            res={
+                "total": None,
+                "results": [],
+                "skip": 100000,
+                "limit": 25,
+                "nextCursor": None,
+                "hasMore": False,
+            },
+        ),
+    ),
+    ApiTestElem(
+        name="List proteins (invalid total)",
+        input=ApiTestInput(
+            login="abcd",
+            route="/proteins?total=guess",
+        ),
+        expected=ApiTestExpected(
+            code=422,
+        ),
+    ),
 ]
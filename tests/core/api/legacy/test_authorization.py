@@ -13,13 +13,19 @@ from tests.core.api.data.legacy.authorization import (
 
 @pytest.mark.parametrize("test_elem", test_data_session, ids=get_elem_name)
 def test_authorization_session(
-    auth_client: AuthClient, test_elem: ApiTestElem, app: ASGIApp
+    auth_client: AuthClient,
+    test_elem: ApiTestElem,
+    app: ASGIApp,
+    authorization_mode: str,
 ):
     run_test(auth_client, test_elem, app)
 
 
 @pytest.mark.parametrize("test_elem", test_data_proposal, ids=get_elem_name)
 def test_authorization_proposal(
-    auth_client: AuthClient, test_elem: ApiTestElem, app: ASGIApp
+    auth_client: AuthClient,
+    test_elem: ApiTestElem,
+    app: ASGIApp,
+    authorization_mode: str,
 ):
     run_test(auth_client, test_elem, app)
@@ -8,6 +8,7 @@ from tests.core.api.utils.apitest import get_elem_name, run_test, ApiTestElem
 from tests.core.api.data.datacollections import (
     test_data_dc_attachments,
     test_dc_images,
+    test_per_image_analysis,
     test_workflows,
 )
 
@@ -25,3 +26,10 @@ def test_dc_images(auth_client: AuthClient, test_elem: ApiTestElem, app: ASGIApp
 @pytest.mark.parametrize("test_elem", test_workflows, ids=get_elem_name)
 def test_workflows(auth_client: AuthClient, test_elem: ApiTestElem, app: ASGIApp):
     run_test(auth_client, test_elem, app)
+
+
+@pytest.mark.parametrize("test_elem", test_per_image_analysis, ids=get_elem_name)
+def test_per_image_analysis(
+    auth_client: AuthClient, test_elem: ApiTestElem, app: ASGIApp
+):
+    run_test(auth_client, test_elem, app)
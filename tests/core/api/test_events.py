@@ -1,14 +1,95 @@
+from urllib.parse import quote
+
 import pytest
 
 from starlette.types import ASGIApp
 
+from pyispyb.app.extensions.database import utils
 from tests.conftest import AuthClient
 from tests.core.api.utils.apitest import get_elem_name, run_test, ApiTestElem
+from tests.core.api.utils.permissions import mock_permissions
 from tests.core.api.data.events import (
     test_data_events,
 )
 
 
 @pytest.mark.parametrize("test_elem", test_data_events, ids=get_elem_name)
-def test_proposal_list(auth_client: AuthClient, test_elem: ApiTestElem, app: ASGIApp):
+def test_proposal_list(
+    auth_client: AuthClient,
+    test_elem: ApiTestElem,
+    app: ASGIApp,
+    authorization_mode: str,
+):
     run_test(auth_client, test_elem, app)
+
+
+def _event_key(event: dict) -> tuple:
+    return event["startTime"], event["type"], event["id"]
+
+
+@pytest.mark.parametrize("limit", [1, 3])
+def test_events_cursor_matches_skip(
+    auth_client: AuthClient, app: ASGIApp, authorization_mode: str, limit: int
+):
+    """Following `nextCursor` returns the same contiguous pages as `skip`
+
+    With `limit=1` every pair of consecutive events is a page boundary, including
+    events with the same `startTime`
+    """
+    with mock_permissions(["all_proposals"], app):
+        auth_client.login("efgh", "password")
+
+        expected = auth_client.get("/events?limit=40").json()["results"]
+        assert len(expected) > limit
+
+        by_cursor = []
+        cursor = None
+        for skip in range(0, len(expected), limit):
+            route = f"/events?limit={limit}"
+            if skip:
+                assert cursor, f"No nextCursor after {skip} events"
+                route += f"&cursor={quote(cursor)}"
+            page = auth_client.get(route).json()
+            if skip:
+                assert page["total"] is None
+
+            by_skip = auth_client.get(f"/events?limit={limit}&skip={skip}").json()
+            assert [_event_key(event) for event in page["results"]] == [
+                _event_key(event) for event in by_skip["results"]
+            ]
+
+            by_cursor.extend(page["results"])
+            cursor = page["nextCursor"]
+
+        assert [_event_key(event) for event in by_cursor[: len(expected)]] == [
+            _event_key(event) for event in expected
+        ]
+
+
+@pytest.mark.parametrize("stale", [-5, 5])
+def test_events_has_more_estimate(
+    auth_client: AuthClient,
+    app: ASGIApp,
+    authorization_mode: str,
+    monkeypatch,
+    stale: int,
+):
+    """With `total=estimate` a stale estimate does not change `hasMore`"""
+    with mock_permissions(["all_proposals"], app):
+        auth_client.login("efgh", "password")
+
+        exact = auth_client.get("/events?limit=1").json()["total"]
+        assert exact >= 2
+
+        # Estimates too low or too high, as if the events changed since counted
+        monkeypatch.setattr(
+            utils._totals,
+            "get_or_set",
+            lambda key, count: max(count() + stale, 0),
+        )
+
+        for skip in sorted({0, exact - 1, exact}):
+            page = auth_client.get(f"/events?limit=1&skip={skip}&total=estimate").json()
+            assert len(page["results"]) == (1 if skip < exact else 0)
+            assert page["hasMore"] == (skip + 1 < exact)
+            assert (page["nextCursor"] is not None) == (skip + 1 < exact)
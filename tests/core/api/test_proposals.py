@@ -9,5 +9,10 @@ from tests.core.api.data.proposals import test_data_proposal_list
 
 
 @pytest.mark.parametrize("test_elem", test_data_proposal_list, ids=get_elem_name)
-def test_proposal_list(auth_client: AuthClient, test_elem: ApiTestElem, app: ASGIApp):
+def test_proposal_list(
+    auth_client: AuthClient,
+    test_elem: ApiTestElem,
+    app: ASGIApp,
+    authorization_mode: str,
+):
     run_test(auth_client, test_elem, app)
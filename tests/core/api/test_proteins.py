@@ -4,6 +4,7 @@ from starlette.types import ASGIApp
 
 from tests.conftest import AuthClient
 from tests.core.api.utils.apitest import get_elem_name, run_test, ApiTestElem
+from tests.core.api.utils.permissions import mock_permissions
 
 from tests.core.api.data.proteins import (
     test_data_proteins_list,
@@ -13,3 +14,22 @@ from tests.core.api.data.proteins import (
 @pytest.mark.parametrize("test_elem", test_data_proteins_list, ids=get_elem_name)
 def test_proteins_list(auth_client: AuthClient, test_elem: ApiTestElem, app: ASGIApp):
     run_test(auth_client, test_elem, app)
+
+
+@pytest.mark.parametrize("total", ["estimate", "none"])
+def test_proteins_has_more(auth_client: AuthClient, app: ASGIApp, total: str):
+    """`hasMore` matches the exact total whether or not the total is counted"""
+    with mock_permissions([], app):
+        auth_client.login("abcd", "password")
+
+        exact = auth_client.get("/proteins?limit=1").json()
+        assert exact["total"] >= 1
+
+        # The first, last, and past the last page
+        for skip in sorted({0, exact["total"] - 1, exact["total"]}):
+            page = auth_client.get(
+                f"/proteins?limit=1&skip={skip}&total={total}"
+            ).json()
+            assert len(page["results"]) == (1 if skip < exact["total"] else 0)
+            assert page["hasMore"] == (skip + 1 < exact["total"])
+            assert page["total"] == (exact["total"] if total == "estimate" else None)
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from pyispyb.app.utils.cache import LRUCache
+from pyispyb.core.modules import mapping
+
+
+@pytest.fixture
+def map_caches(monkeypatch):
+    """Empty map data and image caches, independent of the configured sizes"""
+    monkeypatch.setattr(
+        mapping,
+        "_maps",
+        LRUCache[np.ndarray](max_bytes=1024**2, sizeof=lambda data: data.nbytes),
+    )
+    monkeypatch.setattr(
+        mapping, "_images", LRUCache[bytes](max_bytes=1024**2, sizeof=len)
+    )
@@ -0,0 +1,55 @@
+"""Write small Eiger style HDF5 master and data files for tests"""
+import os
+from typing import Any, Optional
+
+import h5py
+import numpy as np
+
+HEADER = {
+    "beam/incident_wavelength": 1.0,
+    "detector/detector_distance": 0.1,
+    "detector/x_pixel_size": 75e-6,
+    "detector/y_pixel_size": 75e-6,
+    "detector/beam_center_x": 0.0,
+    "detector/beam_center_y": 0.0,
+}
+
+
+def write_master(
+    directory: str,
+    frames: np.ndarray,
+    images_per_file: int,
+    header: Optional[dict[str, float]] = None,
+    **dataset_kwargs: Any,
+) -> str:
+    """Write `frames` across data files of `images_per_file` images
+
+    Returns the path of the master file, which links the data files under
+    `/entry/data` with their `image_nr_low` and `image_nr_high`
+    """
+    master_path = os.path.join(directory, "test_master.h5")
+    with h5py.File(master_path, "w") as master:
+        for file_number, low in enumerate(range(0, len(frames), images_per_file)):
+            block = frames[low : low + images_per_file]
+            name = f"test_data_{file_number + 1:06d}.h5"
+            with h5py.File(os.path.join(directory, name), "w") as data_file:
+                dataset = data_file.create_dataset(
+                    "/entry/data/data", data=block, **dataset_kwargs
+                )
+                dataset.attrs["image_nr_low"] = low + 1
+                dataset.attrs["image_nr_high"] = low + len(block)
+
+            master[f"/entry/data/data_{file_number + 1:06d}"] = h5py.ExternalLink(
+                name, "/entry/data/data"
+            )
+
+        instrument = {
+            **HEADER,
+            "detector/detectorSpecific/x_pixels_in_detector": frames.shape[2],
+            "detector/detectorSpecific/y_pixels_in_detector": frames.shape[1],
+            **(header or {}),
+        }
+        for path, value in instrument.items():
+            master[f"/entry/instrument/{path}"] = value
+
+    return master_path
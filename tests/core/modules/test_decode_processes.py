@@ -0,0 +1,104 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from pyispyb.app.utils import workers
+from pyispyb.app.utils.cache import LRUCache
+from pyispyb.app.utils.workers import ArrayProcessPool
+from pyispyb.core.modules import data
+from tests.core.modules.h5images import write_master
+
+
+def empty_array(rows: int) -> tuple[dict, np.ndarray]:
+    """Run in the worker process, must be importable"""
+    return {"rows": rows}, np.zeros((rows, 4), dtype=np.float32)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ArrayProcessPool(processes=1)
+    yield pool
+    if pool._executor:
+        pool._executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def shared_blocks(monkeypatch):
+    """Names of the shared memory blocks read back from the workers"""
+    names = []
+    read_shared_memory = workers._read_shared_memory
+
+    def record(name, shape, dtype):
+        names.append(name)
+        return read_shared_memory(name, shape, dtype)
+
+    monkeypatch.setattr(workers, "_read_shared_memory", record)
+    return names
+
+
+@pytest.fixture
+def master(tmp_path):
+    frames = np.arange(3 * 32 * 48, dtype=np.uint32).reshape(3, 32, 48)
+    return write_master(str(tmp_path), frames, images_per_file=2)
+
+
+def assert_unlinked(names):
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+
+
+@pytest.mark.parametrize("imageNumber", [1, 3])
+def test_decode_in_process_pool(pool, shared_blocks, master, imageNumber):
+    """Images decoded in a worker process match those decoded in process"""
+    header, image = pool.run(data._decode_image, master, imageNumber)
+    expected_header, expected = data._decode_image(master, imageNumber)
+
+    assert image.dtype == expected.dtype
+    np.testing.assert_array_equal(image, expected)
+    assert header == expected_header
+    assert image.flags.writeable
+    assert_unlinked(shared_blocks)
+
+
+def test_decode_missing_image(pool, shared_blocks, master):
+    """No shared memory is used for a missing image"""
+    assert pool.run(data._decode_image, master, 10) == (None, None)
+    assert shared_blocks == []
+
+
+def test_empty_array(pool, shared_blocks):
+    metadata, array = pool.run(empty_array, 0)
+    assert metadata == {"rows": 0}
+    assert array.shape == (0, 4)
+    assert array.dtype == np.float32
+    assert_unlinked(shared_blocks)
+
+
+def test_stats(pool):
+    calls = pool.stats()["calls"]
+    pool.run(empty_array, 2)
+    stats = pool.stats()
+    assert stats["started"]
+    assert stats["calls"] == calls + 1
+    assert stats["run_max"] >= stats["run_mean"] > 0
+
+
+def test_load_image_with_decoders(pool, master, monkeypatch):
+    monkeypatch.setattr(data, "_decoders", pool)
+    monkeypatch.setattr(
+        data, "_images", LRUCache(max_bytes=1024**2, sizeof=data._image_size)
+    )
+    monkeypatch.setattr(data, "_shared_images", None)
+    calls = pool.stats()["calls"]
+
+    header, image = data._load_image(master, 2)
+    np.testing.assert_array_equal(image, data._decode_image(master, 2)[1])
+    assert not image.flags.writeable
+    assert pool.stats()["calls"] == calls + 1
+
+    # Cached once decoded
+    assert data._load_image(master, 2)[1] is image
+    assert pool.stats()["calls"] == calls + 1
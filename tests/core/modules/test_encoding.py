@@ -0,0 +1,176 @@
+import gzip
+import io
+
+import h5py
+import hdf5plugin
+import numpy as np
+import pytest
+
+from pyispyb.app.utils.h5 import compress_chunk, read_raw_chunk
+from pyispyb.core.modules import data
+from pyispyb.core.schemas.data import DataEncoding
+from tests.core.modules.h5images import write_master
+
+
+def decompress_chunk(chunk: bytes, compression, array: np.ndarray) -> np.ndarray:
+    """Decode a chunk by writing it into a dataset using `compression`"""
+    with h5py.File(io.BytesIO(), "w") as h5file:
+        dataset = h5file.create_dataset(
+            "data",
+            shape=array.shape,
+            dtype=array.dtype,
+            chunks=array.shape,
+            **compression,
+        )
+        dataset.id.write_direct_chunk((0,) * array.ndim, chunk)
+        return dataset[()]
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return rng.poisson(5, size=(64, 64)).astype(np.uint32)
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, DataEncoding.identity),
+        ("", DataEncoding.identity),
+        ("br", DataEncoding.identity),
+        ("gzip", DataEncoding.gzip),
+        ("gzip, deflate, br, zstd", DataEncoding.zstd),
+        ("GZip", DataEncoding.gzip),
+        ("zstd;q=0, gzip", DataEncoding.gzip),
+        ("zstd; q=0.0, gzip;q=0.5", DataEncoding.gzip),
+        ("zstd;q=0.000, gzip;Q=0", DataEncoding.identity),
+        ("zstd;q=0.001", DataEncoding.zstd),
+        ("zstd;level=1;q=0", DataEncoding.identity),
+        ("zstd;q=invalid, gzip", DataEncoding.gzip),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    assert data.negotiate_encoding(None, accept_encoding) == expected
+
+
+def test_negotiate_encoding_explicit():
+    assert data.negotiate_encoding(DataEncoding.bslz4, "gzip") == DataEncoding.bslz4
+    assert data.negotiate_encoding(DataEncoding.identity, "zstd") == (
+        DataEncoding.identity
+    )
+
+
+def test_encode_data_identity(frame):
+    encoded = data.encode_data(frame, DataEncoding.identity)
+    assert isinstance(encoded, memoryview)
+    assert bytes(encoded) == frame.tobytes()
+
+    # Non contiguous arrays are copied
+    assert bytes(data.encode_data(frame[:, ::2], DataEncoding.identity)) == (
+        np.ascontiguousarray(frame[:, ::2]).tobytes()
+    )
+    assert data.encode_data(b"bytes", DataEncoding.identity) == b"bytes"
+
+
+def test_encode_data_gzip(frame):
+    encoded = data.encode_data(frame, DataEncoding.gzip)
+    assert gzip.decompress(encoded) == frame.tobytes()
+    assert gzip.decompress(data.encode_data(b"bytes", DataEncoding.gzip)) == b"bytes"
+
+
+def test_encode_data_zstd(frame):
+    encoded = data.encode_data(frame, DataEncoding.zstd)
+    # A standard zstd frame
+    assert encoded[:4] == b"\x28\xb5\x2f\xfd"
+
+    decoded = decompress_chunk(
+        encoded, hdf5plugin.Zstd(), np.frombuffer(frame.tobytes(), np.uint8)
+    )
+    assert decoded.tobytes() == frame.tobytes()
+
+
+def test_encode_data_empty():
+    assert data.encode_data(np.zeros((0, 4)), DataEncoding.gzip) == b""
+
+
+def test_encode_data_bslz4_matches_hdf5(frame, tmp_path):
+    """`bslz4` is identical to a chunk written by the HDF5 bitshuffle filter"""
+    path = tmp_path / "bslz4.h5"
+    with h5py.File(path, "w") as h5file:
+        h5file.create_dataset(
+            "data",
+            data=frame[np.newaxis],
+            chunks=(1, *frame.shape),
+            **hdf5plugin.Bitshuffle(cname="lz4"),
+        )
+
+    with h5py.File(path) as h5file:
+        chunk = read_raw_chunk(
+            h5file["data"], (0, 0, 0), hdf5plugin.Bitshuffle(cname="lz4").filter_id
+        )
+
+    encoded = data.encode_data(frame, DataEncoding.bslz4)
+    assert bytes(encoded) == chunk
+    np.testing.assert_array_equal(
+        decompress_chunk(chunk, hdf5plugin.Bitshuffle(cname="lz4"), frame), frame
+    )
+
+
+def test_compress_chunk_round_trip(frame):
+    for compression in [hdf5plugin.Bitshuffle(cname="lz4"), hdf5plugin.Zstd()]:
+        chunk = compress_chunk(frame, compression)
+        assert len(chunk) < frame.nbytes
+        np.testing.assert_array_equal(
+            decompress_chunk(chunk, compression, frame), frame
+        )
+
+
+def test_read_raw_chunk_other_filters(frame, tmp_path):
+    bitshuffle = hdf5plugin.Bitshuffle(cname="lz4")
+    path = tmp_path / "filters.h5"
+    with h5py.File(path, "w") as h5file:
+        h5file.create_dataset("none", data=frame, chunks=frame.shape)
+        h5file.create_dataset(
+            "gzip", data=frame, chunks=frame.shape, compression="gzip"
+        )
+        h5file.create_dataset(
+            "shuffled",
+            data=frame,
+            chunks=frame.shape,
+            shuffle=True,
+            **bitshuffle,
+        )
+        # A chunk stored without its filter applied
+        dataset = h5file.create_dataset(
+            "unfiltered",
+            shape=frame.shape,
+            dtype=frame.dtype,
+            chunks=frame.shape,
+            **bitshuffle,
+        )
+        dataset.id.write_direct_chunk((0, 0), frame.tobytes(), filter_mask=1)
+
+    with h5py.File(path) as h5file:
+        for name in ["none", "gzip", "shuffled", "unfiltered"]:
+            assert read_raw_chunk(h5file[name], (0, 0), bitshuffle.filter_id) is None
+
+
+def test_get_image_chunk(frame, tmp_path):
+    frames = np.stack([frame, frame + 1, frame + 2])
+    path = write_master(
+        str(tmp_path),
+        frames,
+        images_per_file=2,
+        chunks=(1, *frame.shape),
+        **hdf5plugin.Bitshuffle(cname="lz4"),
+    )
+
+    chunk, dtype, shape = data.get_image_chunk(path, 3, DataEncoding.bslz4)
+    assert dtype == np.uint32
+    assert shape == frame.shape
+    np.testing.assert_array_equal(
+        decompress_chunk(chunk, hdf5plugin.Bitshuffle(cname="lz4"), frame), frame + 2
+    )
+
+    # Not stored with zstd
+    assert data.get_image_chunk(path, 3, DataEncoding.zstd) is None
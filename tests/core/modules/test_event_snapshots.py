@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from pyispyb.app.extensions.database.utils import Paged
+from pyispyb.core.modules import events
+
+
+def test_snapshots_checked_separately(tmp_path):
+    snapshot = tmp_path / "snapshot1.png"
+    snapshot.write_bytes(b"")
+    datacollection = SimpleNamespace(
+        xtalSnapshotFullPath1=str(snapshot),
+        xtalSnapshotFullPath2=str(tmp_path / "missing.png"),
+        xtalSnapshotFullPath3=None,
+        xtalSnapshotFullPath4="",
+        imageQualityIndicatorsPlotPath=None,
+    )
+    page = Paged(
+        total=None,
+        results=[
+            {"type": "dc", "id": 1, "Item": datacollection},
+            {"type": "robot", "id": 2, "Item": SimpleNamespace()},
+        ],
+        skip=0,
+        limit=10,
+    )
+
+    paths = events.get_snapshot_paths(page)
+    assert paths == {
+        1: {
+            1: str(snapshot),
+            2: str(tmp_path / "missing.png"),
+            3: None,
+            4: None,
+            "analysis": None,
+        }
+    }
+
+    # As validated by the response model
+    validated = SimpleNamespace(
+        results=[
+            SimpleNamespace(
+                type="dc",
+                id=1,
+                Item=SimpleNamespace(metadata=SimpleNamespace(snapshots={})),
+            ),
+            SimpleNamespace(type="robot", id=2, Item=SimpleNamespace()),
+        ]
+    )
+    events.check_snapshots(validated, paths)
+    assert validated.results[0].Item.metadata.snapshots == {
+        1: True,
+        2: False,
+        3: False,
+        4: False,
+        "analysis": False,
+    }
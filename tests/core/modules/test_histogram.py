@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from pyispyb.core.modules.data import _compute_histogram
+
+
+def frames():
+    rng = np.random.default_rng(0)
+    counts = rng.poisson(20, size=(300, 200)).astype(np.uint32)
+    # A few hot pixels beyond the outlier cutoff
+    counts[::50, ::50] = 60000
+
+    wide = rng.poisson(2000, size=(300, 200)).astype(np.int32)
+
+    masked = rng.poisson(20, size=(300, 200)).astype(np.int32)
+    # Module gaps and bad pixels
+    masked[:, 100:104] = -1
+    masked[::7, ::13] = -2
+
+    floats = rng.normal(100, 10, size=(300, 200)).astype(np.float32)
+    return {"uint": counts, "int wide": wide, "int masked": masked, "float": floats}
+
+
+@pytest.fixture(params=list(frames().items()), ids=lambda item: item[0])
+def frame(request):
+    return request.param[1]
+
+
+def expected_histogram(data, sample_step):
+    """np.histogram of the pixels within the range of the clean sample"""
+    sample = data[::sample_step, ::sample_step].astype(np.float64)
+    clean = sample[sample < sample.mean() + 3 * sample.std()]
+    low, high = clean.min(), clean.max()
+    return data[(data >= low) & (data <= high)], low, high
+
+
+@pytest.mark.parametrize("sample_step", [1, 4])
+def test_compute_histogram_matches_numpy(frame, sample_step):
+    counts, edges = _compute_histogram(frame, sample_step=sample_step, block_rows=64)
+    selected, low, high = expected_histogram(frame, sample_step)
+
+    assert edges[0] == low
+    assert edges[-1] == (high + 1 if len(counts) < 300 else high)
+    expected, _ = np.histogram(selected, bins=np.array(edges))
+    np.testing.assert_array_equal(counts, expected)
+    assert counts.sum() == selected.size
+
+
+def test_compute_histogram_unit_bins():
+    data = np.array([[0, 1, 1], [2, 2, 2]], dtype=np.uint16)
+    counts, edges = _compute_histogram(data, sample_step=1)
+    np.testing.assert_array_equal(counts, [1, 2, 3])
+    assert edges == [0, 1, 2, 3]
+
+
+def test_compute_histogram_negative_masked():
+    """Masked pixels are counted in their own bins rather than shifting others"""
+    data = np.full((8, 8), 5, dtype=np.int32)
+    data[0, :4] = -1
+    data[1, :2] = 6
+
+    counts, edges = _compute_histogram(data, sample_step=1)
+    assert edges == list(range(-1, 8))
+    np.testing.assert_array_equal(counts, [4, 0, 0, 0, 0, 0, 58, 2])
+
+
+def test_compute_histogram_empty():
+    counts, edges = _compute_histogram(np.zeros((0, 4), dtype=np.uint16))
+    assert counts.size == 0
+    assert edges == []
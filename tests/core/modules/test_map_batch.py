@@ -0,0 +1,204 @@
+import json
+
+from fastapi import HTTPException
+import numpy as np
+import pytest
+
+from pyispyb.app.extensions.database.utils import Paged
+from pyispyb.core.modules import mapping
+from pyispyb.core.routes import mapping as routes
+from pyispyb.core.schemas.mapping import MapBatchMode, MapImageFormat
+from tests.core.modules.xrfmaps import Map, decode_png
+
+
+pytestmark = pytest.mark.usefixtures("map_caches")
+
+
+def make_map(mapId, steps_x, steps_y, values=None, **kwargs):
+    if values is None:
+        values = list(range(steps_x * steps_y))
+    return Map(
+        values,
+        steps_x=steps_x,
+        steps_y=steps_y,
+        dataHash=f"hash{mapId}",
+        xrfFluorescenceMappingId=mapId,
+        **kwargs,
+    )
+
+
+def test_sprite_layout():
+    """Maps are placed in a square grid of cells the size of the largest map"""
+    maps = [
+        make_map(1, 4, 2),
+        make_map(2, 2, 3),
+        make_map(3, 3, 1),
+        make_map(4, 1, 1),
+        make_map(5, 2, 2),
+    ]
+    assert mapping.get_sprite_layout(maps) == [
+        {"xrfFluorescenceMappingId": 1, "x": 0, "y": 0, "width": 4, "height": 2},
+        {"xrfFluorescenceMappingId": 2, "x": 4, "y": 0, "width": 2, "height": 3},
+        {"xrfFluorescenceMappingId": 3, "x": 8, "y": 0, "width": 3, "height": 1},
+        {"xrfFluorescenceMappingId": 4, "x": 0, "y": 3, "width": 1, "height": 1},
+        {"xrfFluorescenceMappingId": 5, "x": 4, "y": 3, "width": 2, "height": 2},
+    ]
+
+
+@pytest.mark.parametrize("count, columns", [(1, 1), (2, 2), (4, 2), (9, 3), (10, 4)])
+def test_sprite_layout_columns(count, columns):
+    maps = [make_map(mapId, 2, 1) for mapId in range(count)]
+    layout = mapping.get_sprite_layout(maps)
+    assert max(position["x"] for position in layout) == (columns - 1) * 2
+    assert len({(position["x"], position["y"]) for position in layout}) == count
+
+
+def test_sprite_layout_vertical():
+    layout = mapping.get_sprite_layout([make_map(1, 2, 3, orientation="vertical")])
+    assert (layout[0]["width"], layout[0]["height"]) == (2, 3)
+
+
+def test_map_sprite():
+    """Each map is rendered with its own colour map and range at its position"""
+    maps = [
+        make_map(1, 3, 2, colourMap="gray", min=0, max=5),
+        make_map(2, 2, 1, colourMap="viridis", min=0, max=1),
+    ]
+    sprite = decode_png(mapping.generate_map_sprite(maps))
+    assert sprite.shape == (2, 5, 4)
+
+    for map_, position in zip(maps, mapping.get_sprite_layout(maps)):
+        np.testing.assert_array_equal(
+            sprite[
+                position["y"] : position["y"] + position["height"],
+                position["x"] : position["x"] + position["width"],
+            ],
+            decode_png(mapping.generate_map_image(map_)),
+        )
+    # Unused space in the cell is transparent
+    assert not sprite[1, 3:, 3].any()
+
+
+def test_map_composite():
+    maps = [
+        make_map(1, 2, 2, [0, 10, 20, -1], min=0, max=20),
+        make_map(2, 2, 2, [4, 3, 2, -1]),
+        make_map(3, 2, 2, [-1, -1, -1, -1]),
+    ]
+    composite = decode_png(mapping.generate_map_composite(maps))
+    np.testing.assert_array_equal(
+        composite,
+        [
+            [[0, 255, 0, 255], [127, 127, 0, 255]],
+            [[255, 0, 0, 255], [0, 0, 0, 0]],
+        ],
+    )
+
+
+def test_map_composite_two_maps():
+    maps = [make_map(1, 2, 1, [0, 1]), make_map(2, 2, 1, [1, 0])]
+    composite = decode_png(mapping.generate_map_composite(maps))
+    np.testing.assert_array_equal(composite, [[[0, 255, 0, 255], [255, 0, 0, 255]]])
+
+
+def test_map_composite_too_many():
+    maps = [make_map(mapId, 2, 2) for mapId in range(4)]
+    with pytest.raises(ValueError, match="three"):
+        mapping.generate_map_composite(maps)
+
+
+def test_map_composite_shape_mismatch():
+    maps = [make_map(1, 2, 2), make_map(2, 4, 1)]
+    with pytest.raises(ValueError, match="shape"):
+        mapping.generate_map_composite(maps)
+
+
+@pytest.fixture
+def get_map_batch(monkeypatch):
+    """Call the `/mapping/batch` route, `get_maps` returns the given `maps`"""
+
+    def get_map_batch(
+        maps,
+        xrfFluorescenceMappingIds=None,
+        blSubSampleId=None,
+        mode=MapBatchMode.sprite,
+    ):
+        requested = {}
+
+        def get_maps(**kwargs):
+            requested.update(kwargs)
+            return Paged(total=None, results=maps, skip=0, limit=kwargs["limit"])
+
+        monkeypatch.setattr(routes.crud, "get_maps", get_maps)
+        response = routes.get_map_batch(
+            xrfFluorescenceMappingIds=xrfFluorescenceMappingIds,
+            blSubSampleId=blSubSampleId,
+            mode=mode,
+            format=MapImageFormat.png,
+        )
+        assert requested["withDataHash"]
+        return response
+
+    return get_map_batch
+
+
+def test_map_batch_sprite(get_map_batch):
+    maps = [make_map(1, 3, 2), make_map(2, 2, 2)]
+    response = get_map_batch(maps, blSubSampleId=1)
+    assert response.media_type == "image/png"
+    assert json.loads(response.headers["X-Sprite-Layout"]) == (
+        mapping.get_sprite_layout(maps)
+    )
+    assert response.body == mapping.generate_map_sprite(maps)
+
+
+def test_map_batch_order(get_map_batch):
+    """Maps are rendered in the order of `xrfFluorescenceMappingIds`"""
+    maps = [make_map(1, 1, 1), make_map(2, 2, 1), make_map(3, 3, 1)]
+    response = get_map_batch(maps, xrfFluorescenceMappingIds=[3, 1, 2])
+    layout = json.loads(response.headers["X-Sprite-Layout"])
+    assert [position["xrfFluorescenceMappingId"] for position in layout] == [3, 1, 2]
+    assert [position["width"] for position in layout] == [3, 1, 2]
+
+
+def test_map_batch_composite_order(get_map_batch):
+    maps = [make_map(1, 2, 1, [0, 1]), make_map(2, 2, 1, [1, 0])]
+    response = get_map_batch(
+        maps, xrfFluorescenceMappingIds=[2, 1], mode=MapBatchMode.composite
+    )
+    assert "X-Sprite-Layout" not in response.headers
+    np.testing.assert_array_equal(
+        decode_png(response.body), [[[255, 0, 0, 255], [0, 255, 0, 255]]]
+    )
+
+
+def test_map_batch_required(get_map_batch):
+    with pytest.raises(HTTPException) as e:
+        get_map_batch([make_map(1, 1, 1)])
+    assert e.value.status_code == 400
+
+
+def test_map_batch_not_found(get_map_batch):
+    with pytest.raises(HTTPException) as e:
+        get_map_batch([], blSubSampleId=1)
+    assert e.value.status_code == 404
+
+
+def test_map_batch_too_many(get_map_batch):
+    maps = [make_map(mapId, 1, 1) for mapId in range(routes.MAX_BATCH_MAPS + 1)]
+    with pytest.raises(HTTPException) as e:
+        get_map_batch(maps, blSubSampleId=1)
+    assert e.value.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "maps",
+    [
+        [make_map(mapId, 2, 2) for mapId in range(4)],
+        [make_map(1, 2, 2), make_map(2, 4, 1)],
+    ],
+)
+def test_map_batch_composite_invalid(get_map_batch, maps):
+    with pytest.raises(HTTPException) as e:
+        get_map_batch(maps, blSubSampleId=1, mode=MapBatchMode.composite)
+    assert e.value.status_code == 400
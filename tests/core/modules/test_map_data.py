@@ -0,0 +1,69 @@
+import pytest
+
+from pyispyb.core.modules import mapping
+from tests.core.modules.xrfmaps import Map
+
+
+pytestmark = pytest.mark.usefixtures("map_caches")
+
+
+def test_get_map_pixel():
+    map_ = Map(list(range(6)), steps_x=3, steps_y=2)
+    assert mapping.get_map_pixel(map_, 0, 0) == 0
+    assert mapping.get_map_pixel(map_, 2, 0) == 2
+    assert mapping.get_map_pixel(map_, 0, 1) == 3
+    assert mapping.get_map_pixel(map_, 2, 1) == 5
+
+
+def test_get_map_pixel_snaked():
+    map_ = Map(list(range(6)), steps_x=3, steps_y=2, snaked=True)
+    assert mapping.get_map_pixel(map_, 0, 1) == 5
+    assert mapping.get_map_pixel(map_, 2, 1) == 3
+
+
+@pytest.mark.parametrize(
+    "x, y", [(-1, 0), (0, -1), (3, 0), (0, 2), (3, 2), (None, 0), (0, None)]
+)
+def test_get_map_pixel_outside(x, y):
+    map_ = Map(list(range(6)), steps_x=3, steps_y=2)
+    assert mapping.get_map_pixel(map_, x, y) is None
+
+
+def test_map_data_cached_by_hash():
+    """With a database side hash a cached map does not load its data"""
+    map_ = Map(list(range(6)), steps_x=3, steps_y=2, dataHash="abc")
+    mapping.get_map_pixel(map_, 0, 0)
+    assert map_.loads == 1
+
+    # Another request for the same map, its data is deferred
+    again = Map(list(range(6)), steps_x=3, steps_y=2, dataHash="abc")
+    assert mapping.get_map_pixel(again, 1, 1) == 4
+    assert mapping.get_map_data(again) is mapping.get_map_data(map_)
+    assert again.loads == 0
+    assert mapping._maps.stats()["misses"] == 1
+
+    # The map was updated
+    changed = Map(list(range(6, 12)), steps_x=3, steps_y=2, dataHash="def")
+    assert mapping.get_map_pixel(changed, 1, 1) == 10
+    assert changed.loads == 1
+
+
+def test_map_data_cached_without_hash():
+    """Without a hash the data is loaded and hashed, but decoded once"""
+    map_ = Map(list(range(6)), steps_x=3, steps_y=2)
+    data = mapping.get_map_data(map_)
+    again = Map(list(range(6)), steps_x=3, steps_y=2)
+    assert mapping.get_map_data(again) is data
+    assert again.loads == 1
+
+    changed = Map(list(range(6, 12)), steps_x=3, steps_y=2)
+    assert mapping.get_map_data(changed)[1, 1] == 10
+
+
+def test_map_key_includes_shape():
+    map_ = Map(list(range(6)), steps_x=3, steps_y=2, dataHash="abc")
+    vertical = Map(
+        list(range(6)), steps_x=2, steps_y=3, dataHash="abc", orientation="vertical"
+    )
+    assert mapping._map_key(map_) != mapping._map_key(vertical)
+    assert mapping.get_map_data(vertical).shape == (3, 2)
@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from pyispyb.core.modules.mapping import (
+    BINARY_FORMATS,
+    decode_map_data,
+    encode_map_data,
+)
+
+FORMATS = [
+    f"{name}{compression}" for name in BINARY_FORMATS for compression in ["", "+gzip"]
+]
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    values = rng.poisson(200, size=1000)
+    values[rng.integers(0, 1000, size=10)] = -1
+    return values
+
+
+@pytest.mark.parametrize("dataFormat", FORMATS)
+def test_round_trip(values, dataFormat):
+    dtype = BINARY_FORMATS[dataFormat.partition("+")[0]]
+    decoded = decode_map_data(encode_map_data(values, dataFormat), dataFormat)
+    assert decoded.dtype == dtype
+    np.testing.assert_array_equal(decoded, values)
+
+
+@pytest.mark.parametrize("dataFormat", ["float32", "float64"])
+@pytest.mark.parametrize("compression", ["", "+gzip"])
+def test_round_trip_floats(dataFormat, compression):
+    values = np.array(
+        [0.5, -1.25, 1e-3, np.nan, np.inf], dtype=BINARY_FORMATS[dataFormat]
+    )
+    dataFormat += compression
+    decoded = decode_map_data(encode_map_data(values, dataFormat), dataFormat)
+    np.testing.assert_array_equal(decoded, values)
+
+
+def test_binary_encoding():
+    """Values are stored little endian, shuffled by byte before being gzipped"""
+    values = np.array([1, 256], dtype="<i4")
+    assert encode_map_data(values, "int32") == b"\x01\x00\x00\x00\x00\x01\x00\x00"
+    assert (
+        gzip.decompress(encode_map_data(values, "int32+gzip"))
+        == b"\x01\x00\x00\x01\x00\x00\x00\x00"
+    )
+
+
+def test_uncompressed_is_read_only(values):
+    decoded = decode_map_data(encode_map_data(values, "int32"), "int32")
+    assert not decoded.flags.writeable
+
+
+@pytest.mark.parametrize("dataFormat", FORMATS)
+def test_round_trip_empty(dataFormat):
+    encoded = encode_map_data(np.array([]), dataFormat)
+    decoded = decode_map_data(encoded, dataFormat)
+    assert decoded.shape == (0,)
+    assert decode_map_data(b"", dataFormat).shape == (0,)
+
+
+def test_json_gzip(values):
+    data = gzip.compress(json.dumps(values.tolist()).encode())
+    np.testing.assert_array_equal(decode_map_data(data, "json+gzip"), values)
+
+
+@pytest.mark.parametrize("dataFormat", ["json+gzip", "int16", "float32+zstd", ""])
+def test_encode_unsupported(values, dataFormat):
+    with pytest.raises(ValueError):
+        encode_map_data(values, dataFormat)
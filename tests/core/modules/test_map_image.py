@@ -0,0 +1,229 @@
+import io
+
+from fastapi import HTTPException
+from matplotlib import cm
+from matplotlib.colors import Normalize
+import numpy as np
+from PIL import Image
+import pytest
+
+from pyispyb.app.extensions.database.utils import Paged
+from pyispyb.core.modules import mapping
+from pyispyb.core.routes import mapping as routes
+from pyispyb.core.schemas.mapping import MapImageFormat
+from tests.core.modules.xrfmaps import Map, decode_png
+
+
+pytestmark = pytest.mark.usefixtures("map_caches")
+
+
+@pytest.mark.parametrize("colourMap", ["viridis", "gray", "inferno"])
+@pytest.mark.parametrize("vmin, vmax", [(0, 99), (10, 50), (-20.5, 200.25)])
+def test_colourise_matches_scalar_mappable(colourMap, vmin, vmax):
+    data = np.linspace(-50, 250, 1000).reshape(20, 50)
+    rgba = mapping.colourise(data, mapping.get_colourmap_lut(colourMap), vmin, vmax)
+
+    expected = cm.ScalarMappable(
+        norm=Normalize(vmin=vmin, vmax=vmax), cmap=colourMap
+    ).to_rgba(data, bytes=True)
+    np.testing.assert_array_equal(rgba, expected)
+
+
+def test_colourise_data_range():
+    """Without `vmin` and `vmax` the range of valid values is used"""
+    data = np.array([[-1, 10, 20], [30, np.nan, 40]])
+    lut = mapping.get_colourmap_lut("viridis")
+    rgba = mapping.colourise(data, lut)
+
+    np.testing.assert_array_equal(rgba, mapping.colourise(data, lut, 10, 40))
+    np.testing.assert_array_equal(rgba[0, 1], lut[0])
+    np.testing.assert_array_equal(rgba[1, 2], lut[255])
+
+
+def test_colourise_invalid_transparent():
+    data = np.array([[-1, np.nan, 5]])
+    rgba = mapping.colourise(data, mapping.get_colourmap_lut("viridis"), 0, 10)
+    np.testing.assert_array_equal(rgba[0, :2], [[255, 255, 255, 0]] * 2)
+    assert rgba[0, 2, 3] == 255
+
+
+def test_colourise_constant():
+    rgba = mapping.colourise(np.full((2, 2), 7.0), mapping.get_colourmap_lut(None))
+    np.testing.assert_array_equal(
+        rgba, np.broadcast_to(mapping.get_colourmap_lut("viridis")[0], (2, 2, 4))
+    )
+
+
+@pytest.mark.parametrize("opacity, alpha", [(1, 255), (0.5, 127), (0, 0), (2, 255)])
+def test_colourise_opacity(opacity, alpha):
+    data = np.array([[1.0, -1.0]])
+    rgba = mapping.colourise(data, mapping.get_colourmap_lut("viridis"), 0, 2, opacity)
+    assert rgba[0, 0, 3] == alpha
+    assert rgba[0, 1, 3] == 0
+
+
+@pytest.fixture
+def map_():
+    return Map(
+        list(range(12)),
+        steps_x=4,
+        steps_y=3,
+        dataHash="abc",
+        colourMap="gray",
+        min=2,
+        max=9,
+    )
+
+
+def render(map_, **kwargs):
+    data = mapping.get_map_data(map_).astype(float)
+    lut = mapping.get_colourmap_lut(kwargs.get("colourMap") or map_.colourMap)
+    return mapping.colourise(
+        data,
+        lut,
+        kwargs.get("vmin", map_.min),
+        kwargs.get("vmax", map_.max),
+        kwargs.get("opacity"),
+    )
+
+
+def test_generate_map_image_defaults(map_):
+    """The map's colour map and range are used by default"""
+    image = decode_png(mapping.generate_map_image(map_))
+    np.testing.assert_array_equal(image, render(map_))
+    assert image[0, 0, 0] == 0
+    assert image[2, 3, 0] == 255
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"colourMap": "viridis"},
+        {"vmin": 0},
+        {"vmax": 20},
+        {"vmin": 5, "vmax": 6},
+        {"opacity": 0.25},
+        {"colourMap": "inferno", "vmin": -5, "vmax": 5, "opacity": 0.5},
+    ],
+)
+def test_generate_map_image_overrides(map_, options):
+    image = decode_png(mapping.generate_map_image(map_, **options))
+    np.testing.assert_array_equal(image, render(map_, **options))
+    assert not np.array_equal(image, decode_png(mapping.generate_map_image(map_)))
+
+
+def test_generate_map_image_webp(map_):
+    webp = Image.open(io.BytesIO(mapping.generate_map_image(map_, MapImageFormat.webp)))
+    assert webp.format == "WEBP"
+    np.testing.assert_array_equal(np.asarray(webp.convert("RGBA")), render(map_))
+
+
+def test_map_image_etag(map_):
+    etag = mapping.get_map_image_etag(map_)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert mapping.get_map_image_etag(map_) == etag
+    # Explicitly passing the map's own options renders the same image
+    assert mapping.get_map_image_etag(map_, colourMap="gray", vmin=2, vmax=9) == etag
+
+    etags = {
+        etag,
+        mapping.get_map_image_etag(map_, MapImageFormat.webp),
+        mapping.get_map_image_etag(map_, colourMap="viridis"),
+        mapping.get_map_image_etag(map_, vmin=0),
+        mapping.get_map_image_etag(map_, vmax=20),
+        mapping.get_map_image_etag(map_, opacity=0.5),
+    }
+    assert len(etags) == 6
+
+    map_._metadata["dataHash"] = "def"
+    assert mapping.get_map_image_etag(map_) != etag
+
+
+@pytest.fixture
+def get_map(monkeypatch, map_):
+    """Call the `/mapping/{id}` route for `map_`"""
+    monkeypatch.setattr(
+        routes.crud,
+        "get_maps",
+        lambda **kwargs: Paged(total=1, results=[map_], skip=0, limit=1),
+    )
+
+    def get_map(if_none_match=None, **kwargs):
+        options = {
+            "format": MapImageFormat.png,
+            "colourMap": None,
+            "min": None,
+            "max": None,
+            "opacity": None,
+        }
+        options.update(kwargs)
+        return routes.get_map(
+            xrfFluorescenceMappingId=1, if_none_match=if_none_match, **options
+        )
+
+    return get_map
+
+
+def test_get_map_route(get_map, map_):
+    response = get_map()
+    assert response.status_code == 200
+    assert response.media_type == "image/png"
+    assert response.headers["ETag"] == mapping.get_map_image_etag(map_)
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    np.testing.assert_array_equal(decode_png(response.body), render(map_))
+
+
+def test_get_map_route_options(get_map, map_):
+    response = get_map(min=0, max=20, opacity=0.5)
+    assert response.headers["ETag"] == mapping.get_map_image_etag(
+        map_, vmin=0, vmax=20, opacity=0.5
+    )
+    np.testing.assert_array_equal(
+        decode_png(response.body), render(map_, vmin=0, vmax=20, opacity=0.5)
+    )
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", '"other", {etag}', "{etag},"])
+def test_get_map_route_not_modified(monkeypatch, get_map, if_none_match):
+    etag = get_map().headers["ETag"]
+
+    def generate_map_image(*args, **kwargs):
+        raise AssertionError("Image rendered for a matching If-None-Match")
+
+    monkeypatch.setattr(routes.crud, "generate_map_image", generate_map_image)
+    response = get_map(if_none_match=if_none_match.format(etag=etag))
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == etag
+
+
+@pytest.mark.parametrize("if_none_match", ['"other"', ""])
+def test_get_map_route_modified(get_map, if_none_match):
+    response = get_map(if_none_match=if_none_match)
+    assert response.status_code == 200
+    assert response.body
+
+
+def test_get_map_route_options_not_modified(get_map):
+    """An ETag for one set of options does not match another"""
+    etag = get_map().headers["ETag"]
+    assert get_map(if_none_match=etag, max=20).status_code == 200
+
+
+def test_get_map_route_not_found(monkeypatch):
+    monkeypatch.setattr(
+        routes.crud,
+        "get_maps",
+        lambda **kwargs: Paged(total=0, results=[], skip=0, limit=1),
+    )
+    with pytest.raises(HTTPException) as e:
+        routes.get_map(
+            xrfFluorescenceMappingId=1,
+            format=MapImageFormat.png,
+            colourMap=None,
+            min=None,
+            max=None,
+            opacity=None,
+            if_none_match=None,
+        )
+    assert e.value.status_code == 404
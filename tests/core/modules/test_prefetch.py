@@ -0,0 +1,78 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from pyispyb.app.globals import g
+from pyispyb.app.utils.cache import LRUCache, TTLCache
+from pyispyb.config import settings
+from pyispyb.core.modules import data
+from tests.core.modules.h5images import write_master
+
+# 64 x 64 uint32 frames, cached with 4096 bytes of header overhead
+FRAME_BYTES = 64 * 64 * 4 + 4096
+
+
+class Executor:
+    """Records prefetches without running them"""
+
+    def __init__(self):
+        self.images = []
+
+    def submit(self, fn, file_path, imageNumber):
+        self.images.append(imageNumber)
+        return Future()
+
+
+@pytest.fixture
+def prefetch(tmp_path, monkeypatch):
+    frames = np.zeros((10, 64, 64), dtype=np.uint32)
+    path = write_master(str(tmp_path), frames, images_per_file=10)
+
+    executor = Executor()
+    monkeypatch.setattr(data, "_prefetcher", executor)
+    monkeypatch.setattr(data, "_prefetching", {})
+    monkeypatch.setattr(data, "_last_images", TTLCache[int](ttl=300))
+    monkeypatch.setattr(
+        data, "_prefetch_stats", {"scheduled": 0, "skipped": 0, "hits": 0}
+    )
+    monkeypatch.setattr(settings, "image_prefetch_depth", 2)
+    g.personId = 1
+
+    def browse(cache_frames: float, cached: bool = True):
+        """View images 1 then 2 with an image cache of `cache_frames` frames"""
+        monkeypatch.setattr(
+            data,
+            "_images",
+            LRUCache(
+                max_bytes=int(cache_frames * FRAME_BYTES), sizeof=data._image_size
+            ),
+        )
+        for imageNumber in [1, 2]:
+            if cached:
+                data._load_image(path, imageNumber)
+            data._prefetch_sequential(1, path, imageNumber, len(frames))
+        return executor.images
+
+    yield browse
+    g.personId = None
+
+
+def test_prefetch_depth(prefetch):
+    assert prefetch(cache_frames=16) == [3, 4]
+    assert data._prefetch_stats["scheduled"] == 2
+
+
+def test_prefetch_limited_to_half_the_cache(prefetch):
+    assert prefetch(cache_frames=3) == [3]
+
+
+def test_prefetch_skipped_when_frames_do_not_fit(prefetch):
+    assert prefetch(cache_frames=1.5) == []
+    assert data._prefetch_stats["skipped"] == 1
+
+
+def test_prefetch_skipped_without_cached_frame(prefetch):
+    """Frames sent without being decoded (i.e. as raw chunks) are not prefetched"""
+    assert prefetch(cache_frames=16, cached=False) == []
+    assert data._prefetch_stats["skipped"] == 1
@@ -0,0 +1,181 @@
+import io
+
+from fastapi import HTTPException
+import numpy as np
+from PIL import Image
+import pytest
+
+from pyispyb.app.utils.cache import LRUCache
+from pyispyb.config import settings
+from pyispyb.core.modules import data
+from pyispyb.core.routes import data as routes
+from pyispyb.core.schemas.data import BinningMode, DataEncoding, ImageDType, TileFormat
+from tests.core.modules.h5images import write_master
+
+TILE_SIZE = 4
+
+
+@pytest.fixture
+def master(tmp_path, monkeypatch):
+    # 10 rows x 7 columns, odd in width and not a multiple of the tile size
+    image = np.arange(10 * 7, dtype=np.uint16).reshape(10, 7) * 100
+    path = write_master(str(tmp_path), image[np.newaxis], images_per_file=1)
+
+    monkeypatch.setattr(settings, "image_tile_size", TILE_SIZE)
+    monkeypatch.setattr(
+        data, "get_image_path", lambda dataCollectionId, imageNumber: path
+    )
+    for cache in ["_image_levels", "_tiles"]:
+        monkeypatch.setattr(
+            data,
+            cache,
+            LRUCache(max_bytes=1024**2, sizeof=getattr(data, cache).sizeof),
+        )
+    return path, image
+
+
+@pytest.mark.parametrize(
+    "shape, levels",
+    [
+        ((4, 4), 1),
+        ((1, 1), 1),
+        ((5, 4), 2),
+        ((8, 8), 2),
+        ((3, 9), 3),
+        ((16, 16), 3),
+        ((17, 1), 4),
+    ],
+)
+def test_get_pyramid_levels(monkeypatch, shape, levels):
+    monkeypatch.setattr(settings, "image_tile_size", TILE_SIZE)
+    assert data.get_pyramid_levels(shape) == levels
+
+
+def test_get_image_pyramid(master):
+    path, _ = master
+    assert data.get_image_pyramid(path, 1) == {
+        "width": 7,
+        "height": 10,
+        "tileSize": TILE_SIZE,
+        "levels": 3,
+    }
+
+
+@pytest.mark.parametrize("mode", list(BinningMode))
+def test_get_image_level_pads_odd_sizes(master, mode):
+    path, image = master
+    level = data.get_image_level(path, 1, 1, mode)
+
+    # The last column is padded by repeating it rather than dropped
+    padded = np.pad(image, ((0, 0), (0, 1)), mode="edge")
+    expected = data.transform_image(
+        padded, binning=2, binningMode=mode, dtype=ImageDType.native
+    )
+    assert level.shape == (5, 4)
+    np.testing.assert_array_equal(level, expected)
+    assert not level.flags.writeable
+
+    # Level 2 is built from level 1, padding its odd number of rows
+    level2 = data.get_image_level(path, 1, 2, mode)
+    assert level2.shape == (3, 2)
+    if mode == BinningMode.max:
+        assert level2[-1, -1] == image.max()
+
+
+def test_get_image_level_cached(master):
+    path, _ = master
+    level = data.get_image_level(path, 1, 2)
+    assert data.get_image_level(path, 1, 2) is level
+    # Levels 1 and 2 were built once
+    assert data._image_levels.stats()["entries"] == 2
+
+
+def tile(path, level, x, y, **kwargs):
+    kwargs = {
+        "binningMode": BinningMode.max,
+        "dtype": ImageDType.native,
+        "format": TileFormat.binary,
+        "encoding": DataEncoding.identity,
+        **kwargs,
+    }
+    return data.get_image_tile(path, 1, level, x, y, **kwargs)
+
+
+def test_get_image_tile_edges(master):
+    path, image = master
+    content, dtype, shape = tile(path, 0, 0, 0)
+    assert shape == (4, 4)
+    np.testing.assert_array_equal(
+        np.frombuffer(content, dtype).reshape(shape), image[:4, :4]
+    )
+
+    # Right and bottom edge tiles are smaller
+    content, dtype, shape = tile(path, 0, 1, 2)
+    assert shape == (2, 3)
+    np.testing.assert_array_equal(
+        np.frombuffer(content, dtype).reshape(shape), image[8:, 4:]
+    )
+
+    # The last level is a single tile
+    _, _, shape = tile(path, 2, 0, 0)
+    assert shape == (3, 2)
+
+    assert tile(path, 0, 2, 0) is None
+    assert tile(path, 0, 0, 3) is None
+
+
+def test_get_image_tile_png(master):
+    path, image = master
+    content, dtype, shape = tile(
+        path, 0, 1, 1, dtype=ImageDType.uint16, format=TileFormat.png
+    )
+    png = Image.open(io.BytesIO(content))
+    np.testing.assert_array_equal(np.array(png), image[4:8, 4:])
+
+    content, _, _ = tile(path, 0, 0, 0, dtype=ImageDType.uint8, format=TileFormat.png)
+    # Clipped to uint8
+    np.testing.assert_array_equal(
+        np.array(Image.open(io.BytesIO(content))), np.minimum(image[:4, :4], 255)
+    )
+
+
+def get_tile(**kwargs):
+    return routes.get_image_tile(
+        **{
+            "imageNumber": 1,
+            "level": 0,
+            "x": 0,
+            "y": 0,
+            "dataCollectionId": 1,
+            "binningMode": BinningMode.max,
+            "format": TileFormat.binary,
+            "dtype": ImageDType.float32,
+            "encoding": None,
+            "accept_encoding": None,
+            **kwargs,
+        }
+    )
+
+
+@pytest.mark.parametrize("dtype", [ImageDType.float32, ImageDType.native])
+def test_get_image_tile_route_png_dtype(dtype, monkeypatch):
+    # Rejected before the image is looked up
+    monkeypatch.setattr(data, "get_image_path", None)
+    with pytest.raises(HTTPException) as e:
+        get_tile(format=TileFormat.png, dtype=dtype)
+    assert e.value.status_code == 400
+
+
+def test_get_image_tile_route(master):
+    response = get_tile(format=TileFormat.png, dtype=ImageDType.uint16, level=2)
+    assert response.media_type == "image/png"
+
+    response = get_tile(x=1, y=2)
+    assert response.headers["X-Image-Width"] == "3"
+    assert response.headers["X-Image-Height"] == "2"
+    assert response.headers["X-Image-DType"] == "float32"
+
+    for kwargs in [{"level": 3}, {"x": 2}]:
+        with pytest.raises(HTTPException) as e:
+            get_tile(**kwargs)
+        assert e.value.status_code == 404
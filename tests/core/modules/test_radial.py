@@ -0,0 +1,174 @@
+import math
+
+import numpy as np
+import pytest
+
+from pyispyb.app.utils.cache import LRUCache
+from pyispyb.core.modules import data
+from pyispyb.core.modules.data import RadialGeometry
+from tests.core.modules.h5images import write_master
+
+HEADER = {
+    "wavelength": 1.0,
+    "detector_distance": 0.1,
+    "beam_cx": 100.0,
+    "beam_cy": 80.0,
+    "pixel_size_x": 75e-6,
+    "pixel_size_y": 75e-6,
+}
+SHAPE = (160, 200)
+RING_RADIUS = 60
+
+
+def ring_q(radius: float) -> float:
+    """`q` of a ring `radius` pixels from the beam centre"""
+    two_theta = math.atan(radius * HEADER["pixel_size_x"] / HEADER["detector_distance"])
+    return 4 * math.pi * math.sin(two_theta / 2) / HEADER["wavelength"]
+
+
+def ring_image(dtype=np.int32) -> np.ndarray:
+    y, x = np.indices(SHAPE)
+    radius = np.hypot(y - HEADER["beam_cy"], x - HEADER["beam_cx"])
+    return (10 + 1000 * np.exp(-((radius - RING_RADIUS) ** 2) / 2)).astype(dtype)
+
+
+def test_radial_geometry_ring():
+    geometry = RadialGeometry(HEADER, SHAPE, bins=100)
+    bin_width = geometry.q_max / geometry.bins
+
+    # The furthest pixel from the beam centre, the corner at (0, 0)
+    assert geometry.q_max == pytest.approx(ring_q(math.hypot(100, 80)))
+    np.testing.assert_allclose(np.diff(geometry.q), bin_width)
+    assert geometry.counts.sum() == SHAPE[0] * SHAPE[1]
+
+    intensity = geometry.integrate(ring_image())
+    assert geometry.q[np.nanargmax(intensity)] == pytest.approx(
+        ring_q(RING_RADIUS), abs=bin_width
+    )
+    # Background away from the ring
+    assert intensity[-1] == pytest.approx(10)
+
+
+def test_radial_geometry_constant_mean():
+    geometry = RadialGeometry(HEADER, SHAPE, bins=50)
+    intensity = geometry.integrate(np.full(SHAPE, 7, dtype=np.float32))
+    np.testing.assert_allclose(intensity, 7)
+
+
+@pytest.mark.parametrize(
+    "dtype, mask_value",
+    [(np.int32, -1), (np.int32, -2), (np.uint16, 65535), (np.float32, -1)],
+)
+def test_radial_geometry_masked(dtype, mask_value):
+    geometry = RadialGeometry(HEADER, SHAPE, bins=50)
+    image = np.full(SHAPE, 7, dtype=dtype)
+    # A module gap and the pixels nearest the beam centre
+    image[:, 150:160] = mask_value
+    image[78:83, 98:103] = mask_value
+
+    intensity = geometry.integrate(image)
+    # Bins with only masked pixels are NaN, masked pixels do not lower the others
+    assert np.isnan(intensity[0])
+    np.testing.assert_allclose(intensity[1:], 7)
+
+
+@pytest.fixture
+def master(tmp_path, monkeypatch):
+    frames = np.stack([ring_image(), ring_image() * 3])
+    path = write_master(
+        str(tmp_path),
+        frames,
+        images_per_file=2,
+        header={
+            "detector/beam_center_x": HEADER["beam_cx"],
+            "detector/beam_center_y": HEADER["beam_cy"],
+        },
+    )
+    monkeypatch.setattr(data, "_get_image_template", lambda dataCollectionId: (path, 2))
+    monkeypatch.setattr(
+        data,
+        "_radial_geometries",
+        LRUCache[RadialGeometry](
+            max_bytes=1024**2, sizeof=lambda geometry: geometry.nbytes
+        ),
+    )
+    return path
+
+
+def test_get_radial_profile(master):
+    profile = data.get_radial_profile(1, 1, bins=100)
+
+    q = np.array(profile["q"])
+    np.testing.assert_allclose(profile["resolution"], 2 * math.pi / q)
+    peak = q[np.nanargmax(np.array(profile["intensity"], dtype=float))]
+    assert peak == pytest.approx(ring_q(RING_RADIUS), abs=q[1] - q[0])
+
+
+def test_get_radial_profile_mean(master):
+    single = data.get_radial_profile(1, 2, bins=100)
+    mean = data.get_radial_profile(1, 1, 2, bins=100)
+
+    # The mean of intensity x1 and x3 is twice the first image
+    np.testing.assert_allclose(
+        mean["intensity"], np.array(single["intensity"]) * 2 / 3, rtol=1e-5
+    )
+
+
+@pytest.mark.parametrize("end", [None, 2])
+def test_get_radial_profile_resolves_once(master, monkeypatch, end):
+    """The data collection is looked up once for both the header and the images"""
+    lookups = []
+    monkeypatch.setattr(
+        data,
+        "_get_image_template",
+        lambda dataCollectionId: lookups.append(dataCollectionId) or (master, 2),
+    )
+
+    def get_image_path(dataCollectionId, imageNumber):
+        raise AssertionError("Image path resolved again")
+
+    monkeypatch.setattr(data, "get_image_path", get_image_path)
+
+    assert data.get_radial_profile(1, 1, end, bins=100)
+    assert lookups == [1]
+
+
+def test_get_radial_profile_not_found(master):
+    assert data.get_radial_profile(1, 3) is None
+    assert data.get_radial_profile(1, 1, 3) is None
+
+
+def test_get_radial_profile_reuses_geometry(master, monkeypatch):
+    created = []
+
+    class CountingGeometry(RadialGeometry):
+        def __init__(self, *args):
+            created.append(args)
+            super().__init__(*args)
+
+    monkeypatch.setattr(data, "RadialGeometry", CountingGeometry)
+
+    first = data.get_radial_profile(1, 1, bins=100)
+    # Same geometry, another image
+    data.get_radial_profile(1, 2, bins=100)
+    assert len(created) == 1
+    assert data._radial_geometries.stats()["hits"] == 1
+
+    # Another number of bins is another mapping
+    data.get_radial_profile(1, 1, bins=50)
+    assert len(created) == 2
+
+    assert data.get_radial_profile(1, 1, bins=100) == first
+    assert len(created) == 2
+
+
+def test_get_radial_profile_invalid_geometry(tmp_path, monkeypatch):
+    path = write_master(
+        str(tmp_path),
+        ring_image()[np.newaxis],
+        images_per_file=1,
+        header={"detector/detector_distance": 0.0},
+    )
+    monkeypatch.setattr(data, "_get_image_template", lambda dataCollectionId: (path, 1))
+
+    assert data.get_radial_profile(1, 1) is None
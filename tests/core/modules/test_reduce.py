@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from pyispyb.core.modules import data
+from pyispyb.core.modules.data import HDF5FormatHandler, _reduce_blocks
+from pyispyb.core.schemas.data import ReduceOperation
+from tests.core.modules.h5images import write_master
+
+
+@pytest.fixture
+def uint_frames():
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 1000, size=(6, 8, 10), dtype=np.uint16)
+    # A pixel masked in every frame, and one in a single frame
+    frames[:, 0, 0] = np.iinfo(np.uint16).max
+    frames[3, 4, 5] = np.iinfo(np.uint16).max
+    return frames
+
+
+@pytest.fixture
+def int_frames():
+    rng = np.random.default_rng(1)
+    frames = rng.integers(0, 1000, size=(6, 8, 10), dtype=np.int32)
+    frames[:, :, 9] = -1
+    frames[2, 7, 0] = -2
+    return frames
+
+
+def test_reduce_blocks_sum(uint_frames):
+    reduced = _reduce_blocks([uint_frames], ReduceOperation.sum)
+    assert reduced.dtype == np.int64
+
+    expected = uint_frames.sum(axis=0, dtype=np.int64)
+    expected[0, 0] = -1
+    expected[4, 5] = -1
+    np.testing.assert_array_equal(reduced, expected)
+
+
+def test_reduce_blocks_mean(int_frames):
+    reduced = _reduce_blocks([int_frames], ReduceOperation.mean)
+    assert reduced.dtype == np.float32
+
+    expected = int_frames.mean(axis=0).astype(np.float32)
+    expected[:, 9] = -1
+    expected[7, 0] = -1
+    np.testing.assert_allclose(reduced, expected, rtol=1e-6)
+
+
+def test_reduce_blocks_max(uint_frames, int_frames):
+    reduced = _reduce_blocks([uint_frames], ReduceOperation.max)
+    assert reduced.dtype == np.uint16
+    np.testing.assert_array_equal(reduced, uint_frames.max(axis=0))
+    assert reduced[4, 5] == np.iinfo(np.uint16).max
+
+    # Negative masked pixels are not hidden by larger values in other frames
+    reduced = _reduce_blocks([int_frames], ReduceOperation.max)
+    assert reduced.dtype == np.int32
+    assert (reduced[:, 9] == -1).all()
+    assert reduced[7, 0] == -1
+    np.testing.assert_array_equal(reduced[:7, :9], int_frames.max(axis=0)[:7, :9])
+
+
+def test_reduce_blocks_float():
+    frames = np.arange(2 * 3 * 4, dtype=np.float32).reshape(2, 3, 4) - 5
+    reduced = _reduce_blocks([frames], ReduceOperation.sum)
+    # Negative float pixels are not masked
+    np.testing.assert_array_equal(reduced, frames.sum(axis=0, dtype=np.float64))
+
+
+@pytest.mark.parametrize("operation", list(ReduceOperation))
+def test_reduce_blocks_multiple_blocks(uint_frames, operation):
+    """Blocks of any size, and single frames, reduce as one array would"""
+    blocks = [uint_frames[:2], uint_frames[2], uint_frames[3:6]]
+    np.testing.assert_array_equal(
+        _reduce_blocks(blocks, operation), _reduce_blocks([uint_frames], operation)
+    )
+
+
+def test_reduce_blocks_empty_and_missing():
+    assert _reduce_blocks([], ReduceOperation.sum) is None
+    with pytest.raises(FileNotFoundError):
+        _reduce_blocks([np.zeros((2, 2)), None], ReduceOperation.sum)
+
+
+@pytest.fixture
+def master(tmp_path, uint_frames):
+    frames = np.concatenate([uint_frames, uint_frames[::-1]])
+    return write_master(str(tmp_path), frames, images_per_file=4), frames
+
+
+def test_read_frames_across_files(master):
+    path, frames = master
+    blocks = list(HDF5FormatHandler.read_frames(path, 3, 10))
+
+    # Split at each data file boundary, images 1-4, 5-8, 9-12
+    assert [block.shape[0] for block in blocks] == [2, 4, 2]
+    np.testing.assert_array_equal(np.concatenate(blocks), frames[2:10])
+
+
+def test_read_frames_max_bytes(master):
+    path, frames = master
+    frame_bytes = frames[0].nbytes
+    blocks = list(HDF5FormatHandler.read_frames(path, 1, 12, max_bytes=3 * frame_bytes))
+
+    assert [block.shape[0] for block in blocks] == [3, 1, 3, 1, 3, 1]
+    np.testing.assert_array_equal(np.concatenate(blocks), frames)
+
+
+def test_read_frames_missing(master):
+    path, _ = master
+    with pytest.raises(FileNotFoundError):
+        list(HDF5FormatHandler.read_frames(path, 11, 13))
+
+
+def test_reduce_images(master, monkeypatch):
+    path, frames = master
+    monkeypatch.setattr(
+        data, "_get_image_template", lambda dataCollectionId: (path, 12)
+    )
+
+    reduced = data.reduce_images(1, 3, 10, ReduceOperation.sum)
+    np.testing.assert_array_equal(
+        reduced, _reduce_blocks([frames[2:10]], ReduceOperation.sum)
+    )
+    assert not reduced.flags.writeable
+
+    assert data.reduce_images(1, 3, 13, ReduceOperation.sum) is None
@@ -0,0 +1,140 @@
+from fastapi import HTTPException
+import numpy as np
+import pytest
+
+from pyispyb.core.modules import data
+from pyispyb.core.routes import data as routes
+from pyispyb.core.schemas.data import BinningMode, DataEncoding, ImageDType
+from tests.core.modules.h5images import write_master
+
+
+@pytest.fixture
+def image():
+    return np.arange(5 * 7, dtype=np.int32).reshape(5, 7)
+
+
+@pytest.mark.parametrize(
+    "mode, reduce",
+    [
+        (BinningMode.max, lambda blocks: blocks.max(axis=(1, 3))),
+        (BinningMode.sum, lambda blocks: blocks.sum(axis=(1, 3))),
+        (BinningMode.mean, lambda blocks: blocks.mean(axis=(1, 3))),
+    ],
+)
+def test_transform_image_binning(image, mode, reduce):
+    binned = data.transform_image(
+        image, binning=2, binningMode=mode, dtype=ImageDType.native
+    )
+
+    # The trailing row and column do not fill a bin and are dropped
+    assert binned.shape == (2, 3)
+    expected = reduce(image[:4, :6].reshape(2, 2, 3, 2))
+    np.testing.assert_allclose(binned, expected)
+
+
+def test_transform_image_drops_trailing_pixels():
+    image = np.ones((3, 3), dtype=np.uint16)
+    image[2, :] = 100
+    image[:, 2] = 100
+
+    binned = data.transform_image(image, binning=2, binningMode=BinningMode.max)
+    np.testing.assert_array_equal(binned, [[1]])
+
+
+def test_transform_image_native_dtype(image):
+    assert data.transform_image(image, dtype=ImageDType.native) is image
+    # Max binning keeps the detector's type, sum and mean are float
+    assert data.transform_image(image, binning=2, dtype=ImageDType.native).dtype == (
+        np.int32
+    )
+    assert (
+        data.transform_image(
+            image, binning=2, binningMode=BinningMode.sum, dtype=ImageDType.native
+        ).dtype
+        == np.float32
+    )
+
+
+@pytest.mark.parametrize("dtype", [ImageDType.uint8, ImageDType.uint16])
+def test_transform_image_clips_uint(dtype):
+    info = np.iinfo(dtype.value)
+    image = np.array([[-1, 0, 1], [info.max, info.max + 1, 2**31 - 1]], np.int64)
+
+    converted = data.transform_image(image, dtype=dtype)
+    assert converted.dtype == np.dtype(dtype.value)
+    np.testing.assert_array_equal(
+        converted, [[0, 0, 1], [info.max, info.max, info.max]]
+    )
+
+
+def test_transform_image_float(image):
+    converted = data.transform_image(image)
+    assert converted.dtype == np.float32
+    np.testing.assert_array_equal(converted, image)
+
+
+@pytest.fixture
+def master(tmp_path, monkeypatch):
+    frames = np.arange(2 * 8 * 10, dtype=np.uint16).reshape(2, 8, 10)
+    path = write_master(str(tmp_path), frames, images_per_file=2)
+    monkeypatch.setattr(
+        data, "get_image_path", lambda dataCollectionId, imageNumber: path
+    )
+    return path, frames
+
+
+def get_image(**kwargs):
+    return routes.get_image(
+        **{
+            "imageNumber": 1,
+            "dataCollectionId": 1,
+            "binning": 1,
+            "binningMode": BinningMode.max,
+            "roi": None,
+            "dtype": ImageDType.native,
+            "encoding": DataEncoding.identity,
+            "accept_encoding": None,
+            **kwargs,
+        }
+    )
+
+
+def test_load_image_roi(master):
+    path, frames = master
+    np.testing.assert_array_equal(
+        data.load_image(path, 2, roi=(2, 3, 4, 2)), frames[1, 3:5, 2:6]
+    )
+    # A region overlapping the edge is cropped to the image
+    np.testing.assert_array_equal(
+        data.load_image(path, 2, roi=(8, 6, 4, 4)), frames[1, 6:, 8:]
+    )
+
+
+def test_get_image_roi(master):
+    _, frames = master
+    response = get_image(roi="2,3,4,2")
+    assert response.headers["X-Image-Width"] == "4"
+    assert response.headers["X-Image-Height"] == "2"
+    np.testing.assert_array_equal(
+        np.frombuffer(response.body, dtype=np.uint16).reshape(2, 4),
+        frames[0, 3:5, 2:6],
+    )
+
+
+@pytest.mark.parametrize("roi", ["10,0,4,4", "0,8,4,4", "20,20,1,1", "0,0,0,4"])
+def test_get_image_roi_outside(master, roi):
+    with pytest.raises(HTTPException) as e:
+        get_image(roi=roi)
+    assert e.value.status_code == 400
+
+
+def test_load_image_roi_cached(master):
+    """Regions of cached images are cropped from the decoded image"""
+    path, frames = master
+    data.load_image(path, 1)
+    assert data._image_key(path, 1) in data._images
+
+    np.testing.assert_array_equal(
+        data.load_image(path, 1, roi=(2, 3, 4, 2)), frames[0, 3:5, 2:6]
+    )
+    assert data.load_image(path, 1, roi=(10, 0, 4, 4)).size == 0
@@ -0,0 +1,52 @@
+"""Stand in XRF maps for tests"""
+import gzip
+import io
+import json
+from types import SimpleNamespace
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+
+class Map:
+    """A `json+gzip` map which counts how often its `data` is loaded
+
+    `values` are stored in collection order, `dataHash` is set in the metadata as
+    `get_maps(withDataHash=True)` does
+    """
+
+    def __init__(
+        self,
+        values: list,
+        steps_x: int,
+        steps_y: int,
+        dataHash: Optional[str] = None,
+        xrfFluorescenceMappingId: int = 1,
+        colourMap: Optional[str] = None,
+        min: Optional[float] = None,
+        max: Optional[float] = None,
+        orientation: str = "horizontal",
+        snaked: bool = False,
+    ):
+        self._data = gzip.compress(json.dumps(values).encode())
+        self.loads = 0
+        self.xrfFluorescenceMappingId = xrfFluorescenceMappingId
+        self.dataFormat = "json+gzip"
+        self.colourMap = colourMap
+        self.min = min
+        self.max = max
+        self._metadata = {"dataHash": dataHash} if dataHash else {}
+        self.GridInfo = SimpleNamespace(
+            steps_x=steps_x, steps_y=steps_y, orientation=orientation, snaked=snaked
+        )
+
+    @property
+    def data(self) -> bytes:
+        self.loads += 1
+        return self._data
+
+
+def decode_png(image: bytes) -> np.ndarray:
+    """Decode a rendered map image to an RGBA array"""
+    return np.asarray(Image.open(io.BytesIO(image)))